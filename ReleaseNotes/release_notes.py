@@ -0,0 +1,260 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Saku Rautio"
+__email__ = "sakupetterirautio@gmail.com"
+__date__ = "2020-02-02"
+
+__license__ = "MIT"
+__version__ = "1.0.0"
+
+"""
+This module builds a static release notes site with one
+page per version tag and an index of all the pages.
+Only the pages whose commit range or template changed are rebuilt.
+"""
+
+import hashlib
+import html
+import inspect
+import json
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from atomic_file import AtomicFile
+from config import Config
+from error_code import ErrorCode
+from logger import Logger
+LOG_TAG = "ReleaseNotes"
+from version import Version, VersionResolver
+from VersionEmailer.version_emailer import HTMLEmail, ReadTemplate
+from template_cache import CompiledTemplate
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+INDEX_TEMPLATE = 'index.template.html'
+MANIFEST_FILE = '.manifest.json'
+PAGE_FILE = '{tag}.html'
+INDEX_FILE = 'index.html'
+INDEX_ITEM_FORMAT = \
+"""
+<li><a href="{page}">{tag}</a></li>
+"""
+INDEX_TEMPLATE_FIELDS = ['title', 'releases']
+MAX_WORKERS = 8
+
+def GetSettings() -> dict:
+   """
+   Get the release notes settings from the config.json.
+
+   Returns:
+      The 'Notes' section of the config.json as a dict.
+   """
+   return Config.GetConfig().get('Notes', dict())
+
+def GetPageFileName(tag: str) -> str:
+   """
+   Get the file name of the page of a tag.
+
+   Args:
+      tag (str): The tag.
+
+   Returns:
+      The file name, with path separators of the tag replaced.
+   """
+   return PAGE_FILE.format(tag=tag.replace('/', '_').replace('\\', '_'))
+
+def GetReleaseRanges() -> list:
+   """
+   Get the commit range of every version tag, from the
+   previous version tag (exclusive) to the tag (inclusive).
+
+   Returns:
+      A list of (tag, range key, revisions) tuples from the oldest to the newest version,
+      where the range key identifies the commits of the range.
+   """
+   tagCommits = Version.GetTagCommits()
+   releaseRanges = list()
+   previousCommit = None
+   for tag in VersionResolver(tagCommits.keys()).tags:
+      commit = tagCommits[tag]
+      if (previousCommit == None):
+         releaseRanges.append((tag, commit, [commit]))
+      else:
+         rangeKey = '{0}..{1}'.format(previousCommit, commit)
+         releaseRanges.append((tag, rangeKey, [rangeKey]))
+      previousCommit = commit
+   return releaseRanges
+
+def GetPageKey(rangeKey: str, pageTemplate: CompiledTemplate) -> str:
+   """
+   Get the key of a page, which changes when either the commit range
+   or the template of the page changes.
+
+   Args:
+      rangeKey (str): The range key of the page, see GetReleaseRanges.
+      pageTemplate (CompiledTemplate): The page template.
+
+   Returns:
+      The key of the page.
+   """
+   templateKey = hashlib.sha1(json.dumps([pageTemplate.segments, pageTemplate.sources]).encode('utf-8')).hexdigest()
+   return '{0} {1}'.format(rangeKey, templateKey)
+
+def LoadManifest(outputDirectory: str) -> dict:
+   """
+   Load the manifest of the already rendered pages.
+
+   Returns:
+      A dict of tags to the page keys their pages were rendered from, see GetPageKey.
+   """
+   try:
+      with open(os.path.join(outputDirectory, MANIFEST_FILE), 'r') as manifestFile:
+         return json.load(manifestFile)
+   except (IOError, ValueError):
+      return dict()
+
+def RenderPage(outputDirectory: str, pageTemplate: str, tag: str, revisions: list) -> ErrorCode:
+   """
+   Render the page of one tag.
+
+   Returns:
+      An ErrorCode object telling what the outcome of calling the function was.
+   """
+   try:
+      commits = Version.GetCommits(revisions)
+   except subprocess.CalledProcessError as err:
+      Logger.Error(LOG_TAG, 'Could not read the commits of {0}: {1}'.format(tag, err))
+      return ErrorCode.COMMAND_FAILED
+   try:
+      AtomicFile.Write(
+         os.path.join(outputDirectory, GetPageFileName(tag)),
+         HTMLEmail.RenderHtml(pageTemplate, commits, tag)
+      )
+   except IOError as err:
+      Logger.Error(LOG_TAG, 'Could not write page of {0}: {1}'.format(tag, err))
+      return ErrorCode.FILE_ERROR
+   Logger.Debug(LOG_TAG, 'Rendered page of {0}'.format(tag))
+   return ErrorCode.OK
+
+def BuildNotes(outputDirectory: str) -> ErrorCode:
+   """
+   Build the release notes site to a directory. The pages whose commit
+   range and template did not change since the last build are kept as they are.
+
+   Args:
+      outputDirectory (str): The directory to build the site to.
+
+   Returns:
+      An ErrorCode object telling what the outcome of calling the function was.
+   """
+   settings = GetSettings()
+   config = Config.GetConfig()
+   pageTemplate = ReadTemplate(settings.get('Page template file', config.get('Email').get('Email template file')))
+   indexTemplate = ReadTemplate(settings.get('Index template file', os.path.join(SCRIPT_DIR, INDEX_TEMPLATE)), INDEX_TEMPLATE_FIELDS)
+   if (pageTemplate == None or indexTemplate == None):
+      return ErrorCode.FILE_ERROR
+   try:
+      os.makedirs(outputDirectory, exist_ok=True)
+   except OSError as err:
+      Logger.Error(LOG_TAG, 'Could not create directory: {0}'.format(err))
+      return ErrorCode.FILE_ERROR
+
+   manifest = LoadManifest(outputDirectory)
+   try:
+      releaseRanges = GetReleaseRanges()
+   except subprocess.CalledProcessError as err:
+      Logger.Error(LOG_TAG, err)
+      return ErrorCode.COMMAND_FAILED
+   changedRanges = list(filter(
+      lambda releaseRange:
+         manifest.get(releaseRange[0]) != GetPageKey(releaseRange[1], pageTemplate)
+         or not os.path.exists(os.path.join(outputDirectory, GetPageFileName(releaseRange[0]))),
+      releaseRanges
+   ))
+   Logger.Info(LOG_TAG, 'Rendering {0} of {1} pages'.format(len(changedRanges), len(releaseRanges)))
+
+   result = ErrorCode.OK
+   with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+      results = list(executor.map(
+         lambda releaseRange: RenderPage(outputDirectory, pageTemplate, releaseRange[0], releaseRange[2]),
+         changedRanges
+      ))
+   for (tag, rangeKey, _), pageResult in zip(changedRanges, results):
+      if (pageResult == ErrorCode.OK):
+         manifest[tag] = GetPageKey(rangeKey, pageTemplate)
+      else:
+         result = pageResult
+
+   # Remove the pages of deleted tags
+   tags = set(map(lambda releaseRange: releaseRange[0], releaseRanges))
+   for tag in list(manifest.keys()):
+      if tag not in tags:
+         del manifest[tag]
+         pageFilePath = os.path.join(outputDirectory, GetPageFileName(tag))
+         if os.path.exists(pageFilePath):
+            os.remove(pageFilePath)
+
+   indexString = indexTemplate.Render(dict(
+      title=html.escape(settings.get('Title', 'Release notes')),
+      releases='\n'.join(map(
+         lambda releaseRange: INDEX_ITEM_FORMAT.format(
+            page=html.escape(GetPageFileName(releaseRange[0])), tag=html.escape(releaseRange[0])
+         ),
+         reversed(releaseRanges)
+      ))
+   ))
+   try:
+      AtomicFile.Write(os.path.join(outputDirectory, INDEX_FILE), indexString)
+      AtomicFile.Write(os.path.join(outputDirectory, MANIFEST_FILE), json.dumps(manifest, indent=1, sort_keys=True))
+   except IOError as err:
+      Logger.Error(LOG_TAG, 'Could not write index: {0}'.format(err))
+      return ErrorCode.FILE_ERROR
+   return result
+
+def HandleCommand(argv: list, argc: int) -> ErrorCode:
+   """
+   Handle a command given to this module
+
+   Args:
+      argv (list): The given arguments.
+      argc (int): The count of given arguments
+
+   Returns:
+      An ErrorCode object telling what the outcome of calling the function was.
+   """
+   HELP_MESSAGE = \
+   """
+   The release notes site generator.
+
+   Usage:
+   version_manager.py notes [optional] <command>
+
+   Required:
+   command  What you want the generator to do. Available commands:
+            build <outdir>  Build one page per version tag and an index
+                            to <outdir>, re-rendering only the pages
+                            whose commit range or template changed.
+
+   Optional:
+   help    Print this message.
+   """
+
+   argv = argv[1:]
+   argc = len(argv)
+
+   if (argc < 1):
+      Logger.Warning(LOG_TAG, 'No command given')
+      return ErrorCode.TOO_FEW_ARGUMENTS
+
+   if (argv[0] == 'help'):
+      print(HELP_MESSAGE)
+      return ErrorCode.OK
+   if (argv[0] == 'build'):
+      if (argc < 2):
+         Logger.Warning(LOG_TAG, 'Missing arguments')
+         return ErrorCode.TOO_FEW_ARGUMENTS
+      return BuildNotes(argv[1])
+
+   Logger.Warning(LOG_TAG, 'Unknown command: {0}'.format(argv[0]))
+   return ErrorCode.UNKNOWN_COMMAND
@@ -0,0 +1,248 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Saku Rautio"
+__email__ = "sakupetterirautio@gmail.com"
+__date__ = "2020-02-02"
+
+__license__ = "MIT"
+__version__ = "1.0.0"
+
+"""
+This module provides an on-disk outbox for release emails.
+Emails are queued as fully rendered messages, one per recipient,
+and delivered later in batches with retries.
+"""
+
+import email
+import email.policy
+import hashlib
+import json
+import os
+import smtplib
+import time
+from email.message import EmailMessage
+from enum import IntEnum, unique
+
+from atomic_file import AtomicFile, FileLock
+from config import Config
+from error_code import ErrorCode
+from logger import Logger
+from metrics import Metrics
+LOG_TAG = "Outbox"
+
+class Outbox:
+   """
+   The outbox of release emails, configured by the 'Outbox'
+   section of the 'Email' settings in the config.json.
+
+   Every queued email is stored as '<id>.eml' with its delivery
+   state in '<id>.json', where the id is derived from the
+   (tag, recipient) pair, so the same release is never
+   queued twice for the same recipient.
+   """
+   @unique
+   class State(IntEnum):
+      """
+      The delivery states of a queued email.
+      """
+      PENDING = 0
+      SENT = 1
+      FAILED = 2
+   MESSAGE_FILE = '{id}.eml'
+   STATE_FILE = '{id}.json'
+   DEFAULT_DIRECTORY = './outbox'
+   DEFAULT_BATCH_SIZE = 50
+   DEFAULT_MAX_ATTEMPTS = 8
+   DEFAULT_RETRY_DELAY = 60
+   @staticmethod
+   def GetSettings() -> dict:
+      """
+      Get the outbox settings from the config.json.
+
+      Returns:
+         The 'Outbox' section of the 'Email' settings as a dict.
+      """
+      return Config.GetConfig().get('Email').get('Outbox', dict())
+   @staticmethod
+   def GetDirectory() -> str:
+      """
+      Get the outbox directory, creating it if needed.
+
+      Returns:
+         The path to the outbox directory.
+      """
+      directory = Outbox.GetSettings().get('Directory', Outbox.DEFAULT_DIRECTORY)
+      os.makedirs(directory, exist_ok=True)
+      return directory
+   @staticmethod
+   def GetId(tag: str, recipient: str) -> str:
+      """
+      Get the id of the email of a release to a recipient.
+
+      Args:
+         tag (str): The release tag.
+         recipient (str): The email address of the recipient.
+
+      Returns:
+         The id as a hex string.
+      """
+      return hashlib.sha1('{0}\n{1}'.format(tag, recipient.lower()).encode('utf-8')).hexdigest()
+   @staticmethod
+   def LoadState(directory: str, emailId: str) -> dict:
+      """
+      Load the delivery state of a queued email.
+
+      Returns:
+         The state as a dict, or None if the email is not queued.
+      """
+      try:
+         with open(os.path.join(directory, Outbox.STATE_FILE.format(id=emailId)), 'r') as stateFile:
+            return json.load(stateFile)
+      except (IOError, ValueError):
+         return None
+   @staticmethod
+   def SaveState(directory: str, emailId: str, state: dict):
+      """
+      Save the delivery state of a queued email atomically.
+      """
+      AtomicFile.Write(os.path.join(directory, Outbox.STATE_FILE.format(id=emailId)), json.dumps(state))
+   @staticmethod
+   def Enqueue(tag: str, message: EmailMessage, recipients: list) -> ErrorCode:
+      """
+      Queue a rendered email of a release to each of the given recipients.
+      Recipients who already have the release queued or sent are skipped.
+      The outbox is locked as in Outbox.Flush, so a failed email is never
+      queued again while a flush is delivering it.
+
+      Args:
+         tag (str): The release tag.
+         message (EmailMessage): The rendered email, without recipients.
+         recipients (list): The email addresses of the recipients.
+
+      Returns:
+         An ErrorCode object telling what the outcome of calling the function was.
+      """
+      try:
+         directory = Outbox.GetDirectory()
+         with FileLock(directory):
+            for recipient in recipients:
+               emailId = Outbox.GetId(tag, recipient)
+               state = Outbox.LoadState(directory, emailId)
+               if (state != None and state['State'] != Outbox.State.FAILED):
+                  Logger.Debug(LOG_TAG, 'Already queued {0} to {1}'.format(tag, recipient))
+                  continue
+               del message['To']
+               message['To'] = recipient
+               AtomicFile.Write(os.path.join(directory, Outbox.MESSAGE_FILE.format(id=emailId)), message.as_string())
+               # The state file is written last, so a half queued email is never delivered
+               Outbox.SaveState(directory, emailId, {
+                  'Tag': tag,
+                  'Recipient': recipient,
+                  'State': Outbox.State.PENDING,
+                  'Attempts': 0,
+                  'Next attempt': 0,
+                  'Last error': ''
+               })
+               Logger.Info(LOG_TAG, 'Queued {0} to {1}'.format(tag, recipient))
+      except IOError as err:
+         Logger.Error(LOG_TAG, 'Could not queue email: {0}'.format(err))
+         return ErrorCode.FILE_ERROR
+      return ErrorCode.OK
+   @staticmethod
+   def GetDueEmails(directory: str) -> list:
+      """
+      Get the ids and states of the pending emails which are due for delivery.
+
+      Returns:
+         A list of (id, state) tuples, the oldest attempts first.
+      """
+      now = time.time()
+      dueEmails = list()
+      for fileName in os.listdir(directory):
+         if not fileName.endswith('.json'):
+            continue
+         emailId = fileName[:-len('.json')]
+         state = Outbox.LoadState(directory, emailId)
+         if (state != None and state['State'] == Outbox.State.PENDING and state['Next attempt'] <= now):
+            dueEmails.append((emailId, state))
+      dueEmails.sort(key=lambda dueEmail: dueEmail[1]['Next attempt'])
+      return dueEmails
+   @staticmethod
+   def RecordFailure(directory: str, emailId: str, state: dict, err: Exception):
+      """
+      Record a failed delivery attempt, and schedule the next attempt
+      with an exponential backoff or give up after too many attempts.
+      """
+      settings = Outbox.GetSettings()
+      state['Attempts'] = state['Attempts'] + 1
+      state['Last error'] = str(err)
+      if (state['Attempts'] >= settings.get('Max attempts', Outbox.DEFAULT_MAX_ATTEMPTS)):
+         state['State'] = Outbox.State.FAILED
+         Logger.Error(LOG_TAG, 'Giving up on {0} to {1}: {2}'.format(state['Tag'], state['Recipient'], err))
+      else:
+         retryDelay = settings.get('Retry delay seconds', Outbox.DEFAULT_RETRY_DELAY)
+         state['Next attempt'] = time.time() + retryDelay * (2 ** (state['Attempts'] - 1))
+         Logger.Warning(LOG_TAG, 'Could not send {0} to {1}: {2}'.format(state['Tag'], state['Recipient'], err))
+      Outbox.SaveState(directory, emailId, state)
+   @staticmethod
+   def Flush() -> ErrorCode:
+      """
+      Deliver the due emails in batches, one SMTP connection per batch.
+      Only one flush runs at a time; a concurrent flush or enqueue waits for it.
+
+      Returns:
+         An ErrorCode object telling what the outcome of calling the function was.
+      """
+      result = ErrorCode.OK
+      directory = Outbox.GetDirectory()
+      batchSize = Outbox.GetSettings().get('Batch size', Outbox.DEFAULT_BATCH_SIZE)
+      server = Config.GetConfig().get('Email').get('SMTP').get('Server')
+      with FileLock(directory):
+         dueEmails = Outbox.GetDueEmails(directory)
+         for batchStart in range(0, len(dueEmails), batchSize):
+            batch = dueEmails[batchStart:batchStart + batchSize]
+            try:
+               smtp = smtplib.SMTP(server)
+            except (smtplib.SMTPException, OSError) as err:
+               for emailId, state in batch:
+                  Outbox.RecordFailure(directory, emailId, state, err)
+               result = ErrorCode.SMTP_ERROR
+               continue
+            for emailId, state in batch:
+               messageFilePath = os.path.join(directory, Outbox.MESSAGE_FILE.format(id=emailId))
+               try:
+                  with open(messageFilePath, 'r') as messageFile:
+                     message = email.message_from_file(messageFile, policy=email.policy.default)
+                  smtp.send_message(message)
+               except (smtplib.SMTPException, OSError) as err:
+                  Outbox.RecordFailure(directory, emailId, state, err)
+                  result = ErrorCode.SMTP_ERROR
+                  continue
+               state['Attempts'] = state['Attempts'] + 1
+               state['State'] = Outbox.State.SENT
+               Metrics.Add('emails_sent_total')
+               Outbox.SaveState(directory, emailId, state)
+               os.remove(messageFilePath)
+               Logger.Info(LOG_TAG, 'Sent {0} to {1}'.format(state['Tag'], state['Recipient']))
+            try:
+               smtp.quit()
+            except (smtplib.SMTPException, OSError):
+               pass
+      return result
+   @staticmethod
+   def GetStatus() -> dict:
+      """
+      Count the queued emails by their delivery state.
+
+      Returns:
+         A dict of Outbox.State values to counts.
+      """
+      directory = Outbox.GetDirectory()
+      counts = dict((state, 0) for state in Outbox.State)
+      for fileName in os.listdir(directory):
+         if fileName.endswith('.json'):
+            state = Outbox.LoadState(directory, fileName[:-len('.json')])
+            if (state != None):
+               counts[Outbox.State(state['State'])] += 1
+      return counts
@@ -13,35 +13,78 @@ This module provides structures for email stuff
 and methods for using them.
 """
 
-import smtplib
+import html
+import re
 from email.message import EmailMessage
 import os
 import argparse
+import inspect
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
 
 from error_code import ErrorCode
 from git import Commit
 from date import Date
 from logger import Logger
 from config import Config
+from metrics import Metrics
+from template_cache import CompiledTemplate, TemplateCache
 LOG_TAG = "Email"
-from version import Version
+from version import GitQuery, Version
+from VersionEmailer.outbox import Outbox
 
-class HTMLEmail:
-   @staticmethod
-   def Send(templateFilePath: str, commits: list) -> ErrorCode:
-      """
-      Send an HTML email of the given commits in the style
-      of the given template file. Use the email
-      settings (subject, to, from) from the config.json.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+AUDIENCE_TAG = '{version} ({audience})'
+# The fields an email template may use
+EMAIL_TEMPLATE_FIELDS = ['title', 'version', 'author', 'changeLog']
+MAX_WORKERS = 8
 
-      Args:
-         templateFilePath (str): The path to the email template file.
-         commits (list): The list of commits to list in the email.
-      
-      Returns:
-         An ErrorCode object telling what the outcome of calling the function was.
-      """
-      COMMIT_LIST_ITEM_FORMAT = \
+def ReadTemplate(templateFilePath: str, names: list = None) -> CompiledTemplate:
+   """
+   Read and compile an email template file. A template
+   of the same content is compiled only once, see TemplateCache.
+
+   Args:
+      templateFilePath (str): The path to the email template file.
+      names (list): The placeholder names the template may use, EMAIL_TEMPLATE_FIELDS by default.
+
+   Returns:
+      The compiled template, or None if it could not be read, was empty or was invalid.
+   """
+   textTemplate = ""
+   try:
+      with open(templateFilePath, 'r') as templateFile:
+         textTemplate = templateFile.read()
+   except IOError as err:
+      Logger.Error(LOG_TAG, err)
+      return None
+
+   if (len(textTemplate) == 0):
+      Logger.Error(LOG_TAG, "Template file empty")
+      return None
+   try:
+      return TemplateCache.Get(textTemplate, TemplateCache.Syntax.FORMAT, names or EMAIL_TEMPLATE_FIELDS)
+   except ValueError as err:
+      Logger.Error(LOG_TAG, 'Invalid template file {0}: {1}'.format(templateFilePath, err))
+      return None
+
+def CreateMessage() -> EmailMessage:
+   """
+   Create an email message with the subject and the
+   sender from the config.json.
+
+   Returns:
+      The email message.
+   """
+   config = Config.GetConfig()
+   email = EmailMessage()
+   email['Subject'] = config.get('Email').get('Subject')
+   email['From'] = config.get('Email').get('From')
+   return email
+
+class HTMLEmail:
+   COMMIT_LIST_ITEM_FORMAT = \
 """
 <li>
    {title}
@@ -50,121 +93,359 @@ class HTMLEmail:
    {message}
 </li>
 """
-      config = Config.GetConfig()
-      email = EmailMessage()
-      email['Subject'] = config.get('Email').get('Subject')
-      email['To'] = config.get('Email').get('To')
-      email['From'] = config.get('Email').get('From')
+   @staticmethod
+   def RenderHtml(textTemplate: CompiledTemplate, commits: list, version: str) -> str:
+      """
+      Render the HTML document of the given commits from an
+      HTML template, escaping the commit texts.
 
-      version = ""
+      Args:
+         textTemplate (CompiledTemplate): The HTML template.
+         commits (list): The list of commits to list in the document.
+         version (str): The version the document is about.
+
+      Returns:
+         The rendered HTML document.
+      """
+      config = Config.GetConfig()
       author = ""
       if (len(commits)):
-         author = commits[0].author
-         version = commits[0].tag
+         author = html.escape(commits[0].author.name)
 
-      textTemplate = ""
-      htmlPart = ""
-      try:
-         with open(templateFilePath, 'r') as templateFile:
-            textTemplate = templateFile.read()
-      except IOError as err:
-         Logger.Error(LOG_TAG, err)
-         return ErrorCode.FILE_ERROR
-
-      if (len(textTemplate) == 0):
-         Logger.Error(LOG_TAG, "Template file empty")
-         return ErrorCode.FILE_ERROR
-
-      htmlPart = textTemplate.format(
-         title=config.get('Email').get('Subject'), version=version, author=author,
+      htmlPart = textTemplate.Render(dict(
+         title=html.escape(config.get('Email').get('Subject')), version=html.escape(version), author=author,
          changeLog='\n'.join(list(map(
             lambda x: HTMLEmail.COMMIT_LIST_ITEM_FORMAT.format(
-               title=x.title,
-               author=x.author,
+               title=html.escape(x.title),
+               author=html.escape(x.author.name),
                date=Date.ConvertDateToString(x.date),
-               message=x.message
-            )
+               message=html.escape(x.message)
+            ),
+            commits
          )))
-      )
-      email.set_content(htmlPart)
-      email.add_alternative(htmlPart, subtype='html')
-      
-      smtp = smtplib.SMTP(config.get('Email').get('SMTP').get('Server'))
-      smtp.send(email)
-      smtp.quit()
-
-      return ErrorCode.OK
-
-class TextEmail:
+      ))
+      Metrics.Add('rendered_bytes_total', len(htmlPart))
+      return htmlPart
    @staticmethod
-   def Send(templateFilePath: str, commits: list) -> ErrorCode:
+   def Render(templateFilePath: str, commits: list, version: str) -> EmailMessage:
       """
-      Send a text email of the given commits in the style
+      Render an HTML email of the given commits in the style
       of the given template file. Use the email
-      settings (subject, to, from) from the config.json.
+      settings (subject, from) from the config.json.
 
       Args:
          templateFilePath (str): The path to the email template file.
          commits (list): The list of commits to list in the email.
+         version (str): The version the email is about.
       
       Returns:
-        An ErrorCode object telling what the outcome of calling the function was.
+         The rendered email, or None if the template could not be read.
       """
-      COMMIT_LIST_ITEM_FORMAT = \
+      email = CreateMessage()
+
+      textTemplate = ReadTemplate(templateFilePath)
+      if (textTemplate == None):
+         return None
+
+      htmlPart = HTMLEmail.RenderHtml(textTemplate, commits, version)
+      email.set_content(htmlPart)
+      email.add_alternative(htmlPart, subtype='html')
+      return email
+
+class TextEmail:
+   COMMIT_LIST_ITEM_FORMAT = \
 """
    *  {title}
       {author}
       {date}
       {message}
 """
-      email = EmailMessage()
-      email['Subject'] = config.get('Email').get('Subject')
-      email['To'] = config.get('Email').get('To')
-      email['From'] = config.get('Email').get('From')
+   @staticmethod
+   def RenderText(textTemplate: CompiledTemplate, commits: list, version: str) -> str:
+      """
+      Render the text of the given commits from a text template.
+
+      Args:
+         textTemplate (CompiledTemplate): The text template.
+         commits (list): The list of commits to list in the text.
+         version (str): The version the text is about.
 
-      version = ""
+      Returns:
+         The rendered text.
+      """
+      config = Config.GetConfig()
       author = ""
       if (len(commits)):
-         author = commits[0].author
-         version = commits[0].tag
+         author = commits[0].author.name
 
-      if not os.path.exists(templateFilePath):
-         return ErrorCode.FILE_ERROR
-      textTemplate = ""
-      textPart = ""
-      try:
-         with open(templateFilePath, 'r') as templateFile:
-            textTemplate = templateFile.read()
-      except IOError as err:
-         Logger.Error(LOG_TAG, err)
-         return ErrorCode.FILE_ERROR
-
-      if (len(textTemplate) == 0):
-         Logger.Error(LOG_TAG, "Template file empty")
-         return ErrorCode.FILE_ERROR
-
-      textPart = textTemplate.format(
+      textPart = textTemplate.Render(dict(
          title=config.get('Email').get('Subject'), version=version, author=author,
          changeLog='\n'.join(list(map(
             lambda x: TextEmail.COMMIT_LIST_ITEM_FORMAT.format(
                title=x.title,
-               author=x.author,
+               author=x.author.name,
                date=Date.ConvertDateToString(x.date),
                message=x.message
-            )
+            ),
+            commits
          )))
-      )
-      email.set_content(textPart)
+      ))
+      Metrics.Add('rendered_bytes_total', len(textPart))
+      return textPart
+   @staticmethod
+   def Render(templateFilePath: str, commits: list, version: str) -> EmailMessage:
+      """
+      Render a text email of the given commits in the style
+      of the given template file. Use the email
+      settings (subject, from) from the config.json.
+
+      Args:
+         templateFilePath (str): The path to the email template file.
+         commits (list): The list of commits to list in the email.
+         version (str): The version the email is about.
       
+      Returns:
+        The rendered email, or None if the template could not be read.
+      """
+      email = CreateMessage()
+
+      textTemplate = ReadTemplate(templateFilePath)
+      if (textTemplate == None):
+         return None
+
+      email.set_content(TextEmail.RenderText(textTemplate, commits, version))
+      return email
+
+class Audience:
+   """
+   An audience profile from the 'Audiences' section of the
+   'Email' settings in the config.json, e.g.
+
+      "Audiences": {
+         "Backend": {
+            "To": ["backend@domain.net"],
+            "Email template file": "./VersionEmailer/template.html",
+            "Email as HTML": true,
+            "Filters": {
+               "Paths": ["src/server"],
+               "Types": ["feat", "fix"],
+               "Authors": []
+            }
+         }
+      }
+
+   A commit is for the audience if it passes every non-empty filter:
+   it changed one of the paths, its title starts with one of the
+   conventional commit types ('feat: ...', 'fix(api)!: ...'), and
+   it was authored by one of the authors (names or emails).
+   The template and the HTML setting default to the 'Email' settings.
+
+   Attributes:
+      name (str): The name of the audience.
+      recipients (list): The email addresses of the audience.
+      templateFilePath (str): The path to the email template file.
+      asHtml (bool): Whether the email is HTML.
+      paths (tuple): The path filter, or an empty tuple.
+      types (set): The commit type filter, or an empty set.
+      authors (set): The lower case author filter, or an empty set.
+   """
+   COMMIT_TYPE_PATTERN = re.compile(r'^(\w+)(?:\([^)]*\))?!?:')
+   def __init__(self, name: str, settings: dict):
+      emailSettings = Config.GetConfig().get('Email')
+      filters = settings.get('Filters', dict())
+      self.name = name
+      self.recipients = settings.get('To', list())
+      self.templateFilePath = settings.get('Email template file', emailSettings.get('Email template file'))
+      self.asHtml = settings.get('Email as HTML', emailSettings.get('Email as HTML'))
+      self.paths = tuple(map(lambda path: path.strip('/'), filters.get('Paths', list())))
+      self.types = set(map(str.lower, filters.get('Types', list())))
+      self.authors = set(map(str.lower, filters.get('Authors', list())))
+   def NeedsPaths(self) -> bool:
+      """
+      Check whether the changed paths of the commits are needed for filtering.
+      """
+      return len(self.paths) > 0
+   def MatchesPath(self, path: str) -> bool:
+      """
+      Check whether a path is in the path filter.
+      """
+      return any(map(lambda prefix: prefix == '' or path == prefix or path.startswith(prefix + '/'), self.paths))
+   def Matches(self, commit: Commit) -> bool:
+      """
+      Check whether a commit is for the audience.
+      Commits whose paths were not read pass the path filter.
+      """
+      if (len(self.types)):
+         match = Audience.COMMIT_TYPE_PATTERN.match(commit.title)
+         if (match == None or match.group(1).lower() not in self.types):
+            return False
+      if (len(self.authors)):
+         if (commit.author.name.lower() not in self.authors and commit.author.email.lower() not in self.authors):
+            return False
+      if (len(self.paths) and commit.paths != None):
+         if not any(map(self.MatchesPath, commit.paths)):
+            return False
+      return True
+   def Filter(self, commits: list) -> list:
+      """
+      Get the commits for the audience. The commits are shared
+      with the other audiences, not copied.
+
+      Returns:
+         A list of the matching commits, in the same order.
+      """
+      return list(filter(self.Matches, commits))
+
+def GetAudiences() -> list:
+   """
+   Get the audience profiles in the config.json.
+
+   Returns:
+      A list of Audience objects, empty if there are no audiences.
+   """
+   audiences = Config.GetConfig().get('Email').get('Audiences', dict())
+   return list(map(lambda item: Audience(item[0], item[1]), audiences.items()))
+
+def QueueAudienceEmails(audiences: list, commits: list, version: str) -> ErrorCode:
+   """
+   Render an email of the given commits for each audience and
+   queue it in the outbox to the recipients of the audience.
+   The commits are parsed once and filtered for each audience,
+   each template is read once, and the emails are rendered in parallel.
+   An audience with no commits of its own gets no email.
+
+   Args:
+      audiences (list): The Audience objects.
+      commits (list): The list of commits of the release.
+      version (str): The version the emails are about.
+
+   Returns:
+      An ErrorCode object telling what the outcome of calling the function was.
+   """
+   templates = dict()
+   for audience in audiences:
+      if (audience.templateFilePath not in templates):
+         templates[audience.templateFilePath] = ReadTemplate(audience.templateFilePath)
+      if (templates[audience.templateFilePath] == None):
+         return ErrorCode.FILE_ERROR
+
+   def Render(audience: Audience) -> EmailMessage:
+      audienceCommits = audience.Filter(commits)
+      if (len(audienceCommits) == 0):
+         Logger.Info(LOG_TAG, 'No changes for the audience {0}'.format(audience.name))
+         return None
+      email = CreateMessage()
+      textTemplate = templates[audience.templateFilePath]
+      if (audience.asHtml):
+         htmlPart = HTMLEmail.RenderHtml(textTemplate, audienceCommits, version)
+         email.set_content(htmlPart)
+         email.add_alternative(htmlPart, subtype='html')
+      else:
+         email.set_content(TextEmail.RenderText(textTemplate, audienceCommits, version))
+      return email
+
+   with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+      emails = list(executor.map(Render, audiences))
+
+   result = ErrorCode.OK
+   queued = False
+   for audience, email in zip(audiences, emails):
+      if (email == None):
+         continue
+      # The audience is part of the tag, so that a recipient in many audiences gets each email
+      audienceResult = Outbox.Enqueue(AUDIENCE_TAG.format(version=version, audience=audience.name), email, audience.recipients)
+      if (audienceResult == ErrorCode.OK):
+         queued = True
+      else:
+         result = audienceResult
+   if (queued and Outbox.GetSettings().get('Deliver in background', True)):
+      StartBackgroundFlush()
+   return result
+
+def StartBackgroundFlush():
+   """
+   Start delivering the outbox in a detached background process,
+   so that the caller does not wait for the mail server.
+   """
+   versionManagerPath = os.path.join(os.path.dirname(SCRIPT_DIR), 'version_manager.py')
+   options = dict()
+   if (os.name == 'nt'):
+      options['creationflags'] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+   else:
+      options['start_new_session'] = True
+   subprocess.Popen(
+      [sys.executable, versionManagerPath, 'email', 'flush'],
+      stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+      **options
+   )
+
+def HandleSendCommand(argv: list, argc: int) -> ErrorCode:
+   """
+   Render the release email and queue it in the outbox
+   to every recipient in the config.json, or the emails
+   of the audiences if there are audiences in the config.json.
+   With the arguments 'log <log file> <version>', the commits are read from
+   a log file made with 'version get export' instead of Git.
+
+   Returns:
+      An ErrorCode object telling what the outcome of calling the function was.
+   """
+   audiences = GetAudiences()
+   if (argc > 0 and argv[0] == 'log'):
+      if (argc < 3):
+         Logger.Warning(LOG_TAG, 'Missing arguments')
+         return ErrorCode.TOO_FEW_ARGUMENTS
       try:
-         smtp = smtplib.SMTP(config.get('Email').get('SMTP').get('Server'))
-         smtp.send(email)
-         smtp.quit()
-      except Exception as err:
-         Logger.Error(LOG_TAG, err)
-         return ErrorCode.SMTP_ERROR
+         commits = list(Version.ReadCommitLogFile(argv[1]))
+      except (IOError, ValueError, IndexError) as err:
+         Logger.Error(LOG_TAG, 'Could not read log file: {0}'.format(err))
+         return ErrorCode.FILE_ERROR
+      version = argv[2]
+   else:
+      withPaths = any(map(lambda audience: audience.NeedsPaths(), audiences))
+      facts = GitQuery.Resolve([GitQuery.Fact.COMMITS, GitQuery.Fact.CURRENT_TAG], 'HEAD', 'HEAD~1', withPaths)
+      commits = facts[GitQuery.Fact.COMMITS]
+      version = facts[GitQuery.Fact.CURRENT_TAG]
+   if (len(audiences)):
+      return QueueAudienceEmails(audiences, commits, version)
+   return QueueReleaseEmail(commits, version)
 
-      return ErrorCode.OK
+def QueueReleaseEmail(commits: list, version: str) -> ErrorCode:
+   """
+   Render the release email of the given commits and queue it in
+   the outbox to every recipient in the config.json.
+
+   Args:
+      commits (list): The list of commits to list in the email.
+      version (str): The version the email is about.
+
+   Returns:
+      An ErrorCode object telling what the outcome of calling the function was.
+   """
+   config = Config.GetConfig()
+   templateFilePath = config.get('Email').get('Email template file')
+   if (config.get('Email').get('Email as HTML')):
+      email = HTMLEmail.Render(templateFilePath, commits, version)
+   else:
+      email = TextEmail.Render(templateFilePath, commits, version)
+   if (email == None):
+      return ErrorCode.FILE_ERROR
+
+   result = Outbox.Enqueue(version, email, config.get('Email').get('To'))
+   if (result == ErrorCode.OK and Outbox.GetSettings().get('Deliver in background', True)):
+      StartBackgroundFlush()
+   return result
+
+def HandleStatusCommand() -> ErrorCode:
+   """
+   Print how many emails there are in the outbox in each delivery state.
+
+   Returns:
+      An ErrorCode object telling what the outcome of calling the function was.
+   """
+   for state, count in Outbox.GetStatus().items():
+      print('{0}: {1}'.format(state.name, count))
+   return ErrorCode.OK
 
 def HandleCommand(argv: list, argc: int) -> ErrorCode:
    """
@@ -181,14 +462,20 @@ def HandleCommand(argv: list, argc: int) -> ErrorCode:
 
    HELP_MESSAGE = \
    """
-   The version file generator.
+   The version emailer.
 
    Usage:
    version_manager.py email [optional] <command>
+   version_manager.py email send log <log file> <version>
 
    Required:
    command  What you want the emailer to do. Available commands:
-            send  Send an email based on the config.json.
+            send    Queue an email based on the config.json to the outbox,
+                    or one email per audience if there are audiences.
+                    With 'log', the commits are read from a log file made
+                    with 'version get export' instead of Git.
+            flush   Deliver the due emails in the outbox.
+            status  Print the delivery states of the emails in the outbox.
 
    Optional:
    help    Print this message.
@@ -205,11 +492,13 @@ def HandleCommand(argv: list, argc: int) -> ErrorCode:
       print(HELP_MESSAGE)
       return ErrorCode.OK
    if (argv[0] == 'send'):
-      templateFilePath = config.get('Email').get('Email template file')
-      commits = Version.GetCommitsBetweenIds('HEAD', 'HEAD~1')
-      if (config.get('Email').get('Email as HTML')):
-         result = HTMLEmail.Send(templateFilePath, commits)
-      else:
-         result = TextEmail.Send(templateFilePath, commits)
+      result = HandleSendCommand(argv[1:], argc - 1)
+   elif (argv[0] == 'flush'):
+      result = Outbox.Flush()
+   elif (argv[0] == 'status'):
+      result = HandleStatusCommand()
+   else:
+      Logger.Warning(LOG_TAG, 'Unknown command: {0}'.format(argv[0]))
+      result = ErrorCode.UNKNOWN_COMMAND
 
    return result
@@ -18,95 +18,338 @@ argument based on the template file 'version_file.template'.
 Example tag: 1.2.1-rc.3
 """
 
-from string import Template
+from concurrent.futures import ThreadPoolExecutor
 import numpy
 import os
 import inspect
 import argparse
+import hashlib
+import json
+import subprocess
 
+from atomic_file import AtomicFile, FileLock
+from date import Date
 from error_code import ErrorCode
-from version import Version
+from version import GitQuery, Version, VersionResolver
+from VersionFileGenerator.version_manifest import TagRecord, VersionManifest
 from logger import Logger
+from metrics import Metrics
+from template_cache import CompiledTemplate, TemplateCache
 LOG_TAG = "VersionFileGenerator"
 
-def GenerateVersionFileFromVersion(version: Version, templateFilePath: str, versionFilePath: str) -> ErrorCode:
-    """Generates a version file from a version object.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+STABLE_HEADER_TEMPLATE = 'version_file_stable_header.template'
+VOLATILE_SOURCE_TEMPLATE = 'version_file_volatile_source.template'
+MAX_WORKERS = 8
+# The fields a version file template may use
+TEMPLATE_FIELDS = ['major', 'minor', 'bug', 'stage', 'stageRev', 'hash', 'buildDate', 'header']
+
+def ReadVersionFileTemplate(templateFilePath: str) -> CompiledTemplate:
+    """Reads and compiles a version file template. A template
+    of the same content is compiled only once, see TemplateCache.
+    
+    Args:
+        templateFilePath (str): Path to the template file for a version file.
+    
+    Returns:
+        The compiled template, or None if the template could not be read or is invalid.
+    """
+    try:
+        with open(templateFilePath, 'r') as templateFile:
+            return TemplateCache.Get(templateFile.read(), TemplateCache.Syntax.DOLLAR, TEMPLATE_FIELDS)
+    except IOError as err:
+        Logger.Error(LOG_TAG, 'Could not read version file template file: {0}'.format(err))
+    except ValueError as err:
+        Logger.Error(LOG_TAG, 'Invalid version file template file {0}: {1}'.format(templateFilePath, err))
+    return None
+
+def RenderVersionFile(version: Version, template: CompiledTemplate, extraFields: dict = None) -> str:
+    """Renders the contents of a version file from a compiled template.
     
     Args:
         version (Version):
             An instance of the Version class, which is an object representation of the version tag string.
-        templateFilePath (str): Path to the template file for a version file.
+        template (CompiledTemplate): The compiled template for the version file.
+        extraFields (dict):
+            Additional template fields, e.g. the commit hash or the build date.
+    
+    Returns:
+        The contents of the version file.
+    """
+    fields = dict(
+        major=version.major, minor=version.minor,
+        bug=version.bug, stage=version.stage.value, stageRev=version.stageRev)
+    if (extraFields != None):
+        fields.update(extraFields)
+    versionFileString = template.Render(fields)
+    Metrics.Add('rendered_bytes_total', len(versionFileString))
+    return versionFileString
+
+def WriteVersionFile(versionFilePath: str, versionFileString: str) -> ErrorCode:
+    """Writes a rendered version file atomically.
+
+    The version file is only rewritten when its content changes,
+    so that build tools do not see a new timestamp on it for nothing.
+    
+    Args:
         versionFilePath (str):
             The path to the version source file which is to be generaated.
+        versionFileString (str): The rendered contents of the version file.
     
     Returns:
         An ErrorCode object telling what the outcome of calling the function was.
     """
-    result = ErrorCode.UNKNOWN_ERROR
-    
     # Create path to file
     versionFileDirectory = os.path.dirname(versionFilePath)
-    if not os.path.exists(versionFileDirectory):
+    if versionFileDirectory and not os.path.exists(versionFileDirectory):
         try:
-            os.makedirs(versionFileDirectory)
+            os.makedirs(versionFileDirectory, exist_ok=True)
         except OSError as err:
             Logger.Error(LOG_TAG, 'Could not create directory for file: {0}'.format(err))
-            result = ErrorCode.FILE_ERROR
-            return result
-   
-    # Create version file
-    versionFile = None
+            return ErrorCode.FILE_ERROR
+
+    # Leave an up to date version file untouched
+    if os.path.exists(versionFilePath):
+        try:
+            with open(versionFilePath, 'r') as versionFile:
+                if (versionFile.read() == versionFileString):
+                    Logger.Debug(LOG_TAG, 'Version file up to date: {0}'.format(versionFilePath))
+                    return ErrorCode.OK
+        except IOError as err:
+            Logger.Warning(LOG_TAG, 'Could not read existing version file: {0}'.format(err))
+
+    # Write the version file, so that readers never see a half written file
     try:
-        versionFile = open(versionFilePath, 'w+')
+        AtomicFile.Write(versionFilePath, versionFileString)
     except IOError as err:
-        versionFile.close()
-        Logger.Error(LOG_TAG, 'Could not open version file: {0}'.format(err))
-        result = ErrorCode.FILE_ERROR
-        return result
-    if (versionFile == None):
-        Logger.Error(LOG_TAG, 'Some weird shit happened with the version file')
-        return result
+        Logger.Error(LOG_TAG, 'Could not write to version file: {0}'.format(err))
+        return ErrorCode.FILE_ERROR
 
-    with versionFile:
-        versionFileTemplateString = None
-        templateFile = None
+    return ErrorCode.OK
 
-        # Open template file
-        try:
-            templateFile = open(templateFilePath, 'r')
-        except IOError as err:
-            templateFile.close()
-            Logger.Error(LOG_TAG, 'Could not open version file template file: {0}'.format(err))
-            result = ErrorCode.FILE_ERROR
-            return result
-        if (templateFile == None):
-            Logger.Error(LOG_TAG, 'Some weird shit happened with the version file template')
+def GenerateVersionFileFromVersion(version: Version, templateFilePath: str, versionFilePath: str, extraFields: dict = None) -> ErrorCode:
+    """Generates a version file from a version object.
+    
+    Args:
+        version (Version):
+            An instance of the Version class, which is an object representation of the version tag string.
+        templateFilePath (str): Path to the template file for a version file.
+        versionFilePath (str):
+            The path to the version source file which is to be generaated.
+        extraFields (dict):
+            Additional template fields, e.g. the commit hash or the build date.
+    
+    Returns:
+        An ErrorCode object telling what the outcome of calling the function was.
+    """
+    template = ReadVersionFileTemplate(templateFilePath)
+    if (template == None):
+        return ErrorCode.FILE_ERROR
+    return WriteVersionFile(versionFilePath, RenderVersionFile(version, template, extraFields))
+
+def GenerateVersionFiles(version: Version, outputs: list, extraFields: dict = None) -> ErrorCode:
+    """Generates many version files from a version object in one pass.
+
+    Every distinct template is read and compiled only once, and the
+    version files are rendered and written in parallel.
+    
+    Args:
+        version (Version):
+            An instance of the Version class, which is an object representation of the version tag string.
+        outputs (list): A list of (template file path, version file path) pairs.
+        extraFields (dict):
+            Additional template fields, e.g. the commit hash or the build date.
+    
+    Returns:
+        An ErrorCode object telling what the outcome of calling the function was.
+    """
+    templateFilePaths = list(dict.fromkeys(templateFilePath for templateFilePath, _ in outputs))
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        templates = dict(zip(templateFilePaths, executor.map(ReadVersionFileTemplate, templateFilePaths)))
+        if (None in templates.values()):
+            return ErrorCode.FILE_ERROR
+        results = list(executor.map(
+            lambda output: WriteVersionFile(output[1], RenderVersionFile(version, templates[output[0]], extraFields)),
+            outputs
+        ))
+    for result in results:
+        if (result != ErrorCode.OK):
             return result
+    return ErrorCode.OK
+
+def ReadOutputManifest(manifestFilePath: str) -> list:
+    """Reads the template and output pairs from a manifest file.
+
+    The manifest is a JSON file of the form
+    {"Outputs": [{"Template": "<template>", "Output": "<output>"}, ...]}.
+    Relative paths are relative to the directory of the manifest file.
+    
+    Args:
+        manifestFilePath (str): Path to the manifest file.
+    
+    Returns:
+        A list of (template file path, version file path) pairs, or None if the manifest could not be read.
+    """
+    try:
+        with open(manifestFilePath, 'r') as manifestFile:
+            manifest = json.load(manifestFile)
+        manifestDirectory = os.path.dirname(os.path.abspath(manifestFilePath))
+        return [
+            (os.path.join(manifestDirectory, output['Template']), os.path.join(manifestDirectory, output['Output']))
+            for output in manifest['Outputs']
+        ]
+    except (IOError, ValueError, KeyError, TypeError) as err:
+        Logger.Error(LOG_TAG, 'Could not read manifest file: {0}'.format(err))
+    return None
+
+def GetVersionFields() -> tuple:
+    """Resolves the version and the extra template fields from Git.
 
-        # Read the template file contents to str object
+    Returns:
+        A tuple of the current Version and a dict of the extra template fields.
+    """
+    facts = GitQuery.Resolve([GitQuery.Fact.CURRENT_TAG, GitQuery.Fact.CURRENT_HASH])
+    version = Version.GenerateVersionFromString(facts[GitQuery.Fact.CURRENT_TAG])
+    extraFields = dict(
+        hash=facts[GitQuery.Fact.CURRENT_HASH],
+        buildDate=Date.NowAsString())
+    return (version, extraFields)
+
+def GetInputsKey(outputs: list, staticFields: dict) -> str:
+    """Computes a key of everything a generate invocation depends on,
+    without running the Git queries or reading the templates.
+
+    Args:
+        outputs (list): A list of (template file path, version file path) pairs.
+        staticFields (dict): The extra template fields which do not come from Git.
+
+    Returns:
+        The key as a hex string, or None if a template file is missing.
+    """
+    inputsKey = hashlib.sha1()
+    if (Version.snapshot != None):
+        # The Git state comes from the snapshot, without a repository to fingerprint
+        inputsKey.update(Version.snapshot['key'].encode('utf-8'))
+    else:
+        gitDirectory, commonDirectory = Version.GetGitDirectories()
+        inputsKey.update(Version.GetRefsFingerprint(gitDirectory, commonDirectory).encode('utf-8'))
+    inputsKey.update(json.dumps(staticFields, sort_keys=True).encode('utf-8'))
+    for templateFilePath, versionFilePath in outputs:
         try:
-            versionFileTemplateString = Template(templateFile.read())
-        except IOError as err:
+            stat = os.stat(templateFilePath)
+        except OSError as err:
             Logger.Error(LOG_TAG, 'Could not read version file template file: {0}'.format(err))
-        finally:
-            templateFile.close()
-        if (versionFileTemplateString == None):
-            Logger.Error(LOG_TAG, 'Some weird shit happened with the version file template')
-            return result
+            return None
+        inputsKey.update('{0}:{1}:{2}:{3}\n'.format(
+            os.path.abspath(templateFilePath), stat.st_mtime_ns, stat.st_size,
+            os.path.abspath(versionFilePath)).encode('utf-8'))
+    return inputsKey.hexdigest()
 
-        # Write the version file
-        versionFileString = versionFileTemplateString.safe_substitute(
-            major=version.major, minor=version.minor,
-            bug=version.bug, stage=version.stage.value, stageRev=version.stageRev)
-        try:
-            versionFile.write(versionFileString)
-        except IOError as err:
-            Logger.Error(LOG_TAG, 'Could not write to version file: {0}'.format(err))
-            result = ErrorCode.FILE_ERROR
-            return result
-   
-    result = ErrorCode.OK   
-    return result
+def GetOutputStamp(inputsKey: str, versionFilePath: str) -> str:
+    """Gets the stamp which marks a version file as generated from the given inputs.
+
+    Args:
+        inputsKey (str): The key of the inputs, from GetInputsKey.
+        versionFilePath (str): The path to the generated version file.
+
+    Returns:
+        The stamp, or None if the version file does not exist.
+    """
+    try:
+        stat = os.stat(versionFilePath)
+    except OSError:
+        return None
+    return '{0} {1} {2}'.format(inputsKey, stat.st_mtime_ns, stat.st_size)
+
+def GenerateVersionFilesShared(outputs: list, staticFields: dict = None) -> ErrorCode:
+    """Generates version files while holding a lock on every output.
+
+    Concurrent invocations on the same outputs, e.g. from a parallel make,
+    wait for each other instead of racing on the files. When the outputs
+    were already generated from identical inputs, the waiting invocation
+    reuses them and skips the Git queries and the rendering.
+
+    Args:
+        outputs (list): A list of (template file path, version file path) pairs.
+        staticFields (dict): Extra template fields which do not come from Git.
+
+    Returns:
+        An ErrorCode object telling what the outcome of calling the function was.
+    """
+    if (staticFields == None):
+        staticFields = dict()
+    inputsKey = GetInputsKey(outputs, staticFields)
+    if (inputsKey == None):
+        return ErrorCode.FILE_ERROR
+
+    # Lock in a fixed order, so that concurrent invocations cannot deadlock
+    versionFilePaths = sorted(set(os.path.abspath(versionFilePath) for _, versionFilePath in outputs))
+    locks = list(map(FileLock, versionFilePaths))
+    try:
+        for lock in locks:
+            lock.Acquire()
+
+        upToDate = all(
+            lock.ReadContent() == GetOutputStamp(inputsKey, versionFilePath)
+            for lock, versionFilePath in zip(locks, versionFilePaths)
+        )
+        if (upToDate):
+            Logger.Debug(LOG_TAG, 'Version files already generated from identical inputs')
+            return ErrorCode.OK
+
+        version, extraFields = GetVersionFields()
+        extraFields.update(staticFields)
+        result = GenerateVersionFiles(version, outputs, extraFields)
+        if (result == ErrorCode.OK):
+            for lock, versionFilePath in zip(locks, versionFilePaths):
+                lock.WriteContent(GetOutputStamp(inputsKey, versionFilePath))
+        return result
+    except IOError as err:
+        Logger.Error(LOG_TAG, 'Could not lock version file: {0}'.format(err))
+        return ErrorCode.FILE_ERROR
+    finally:
+        for lock in reversed(locks):
+            lock.Release()
+
+def GenerateBinaryManifest(manifestFilePath: str) -> ErrorCode:
+    """Generates a binary version manifest of the current version
+    and every version tag, for reading with VersionManifestReader.
+    
+    Args:
+        manifestFilePath (str): The manifest file to generate.
+    
+    Returns:
+        An error code from the ErrorCode class.
+    """
+    try:
+        facts = GitQuery.Resolve([GitQuery.Fact.CURRENT_TAG, GitQuery.Fact.CURRENT_HASH])
+        tagCommits = Version.GetTagCommits()
+    except subprocess.CalledProcessError as err:
+        Logger.Error(LOG_TAG, 'Could not read the Git version: {0}'.format(err))
+        return ErrorCode.COMMAND_FAILED
+    records = list()
+    for tag in VersionResolver(tagCommits.keys()).tags:
+        version = Version.GenerateVersionFromString(tag)
+        record = TagRecord()
+        record.tag = tag
+        record.major = version.major
+        record.minor = version.minor
+        record.bug = version.bug
+        record.stage = int(version.stage)
+        record.stageRev = version.stageRev
+        record.hash = tagCommits[tag]
+        records.append(record)
+    manifest = VersionManifest.Build(
+        records, facts[GitQuery.Fact.CURRENT_TAG], facts[GitQuery.Fact.CURRENT_HASH], int(Date.Now().timestamp())
+    )
+    try:
+        with AtomicFile.Open(manifestFilePath, 'wb') as manifestFile:
+            manifestFile.write(manifest)
+    except IOError as err:
+        Logger.Error(LOG_TAG, 'Could not write version manifest: {0}'.format(err))
+        return ErrorCode.FILE_ERROR
+    Logger.Info(LOG_TAG, 'Wrote {0} tags to {1}'.format(len(records), manifestFilePath))
+    return ErrorCode.OK
 
 def HandleCommand(argv: list, argc: int) -> ErrorCode:
     """
@@ -125,14 +368,24 @@ def HandleCommand(argv: list, argc: int) -> ErrorCode:
     The version file generator.
 
     Usage:
-    version_manager.py generate [optional] <template> <output>
+    version_manager.py generate [optional] <template> <output> [<template> <output> ...]
+    version_manager.py generate split <header> <source>
+    version_manager.py generate manifest <manifest>
+    version_manager.py generate binary <output>
 
     Required:
-        template   Push existing tag to origin.
-        output     Get information regarding the Git repo.
+        template   The template file for the generated file.
+        output     The file to generate.
 
     Optional:
-    help    Print this message.
+    help        Print this message.
+    split       Generate a stable header and a volatile source file
+                from the bundled split templates, so that a new commit
+                only recompiles the source file.
+    manifest    Generate every template and output pair listed in
+                a JSON manifest file.
+    binary      Generate a binary version manifest of the current
+                version and every version tag, see version_manifest.py.
     """
 
     argv = argv[1:]
@@ -146,13 +399,40 @@ def HandleCommand(argv: list, argc: int) -> ErrorCode:
         print(HELP_MESSAGE)
         return ErrorCode.OK
     
+    if (argv[0] == 'split'):
+        if (argc < 3):
+            Logger.Warning(LOG_TAG, 'Missing arguments')
+            return ErrorCode.TOO_FEW_ARGUMENTS
+        headerFilePath = argv[1]
+        sourceFilePath = argv[2]
+        outputs = [
+            (os.path.join(SCRIPT_DIR, STABLE_HEADER_TEMPLATE), headerFilePath),
+            (os.path.join(SCRIPT_DIR, VOLATILE_SOURCE_TEMPLATE), sourceFilePath)
+        ]
+        staticFields = dict(header=os.path.basename(headerFilePath))
+        return GenerateVersionFilesShared(outputs, staticFields)
+
+    if (argv[0] == 'manifest'):
+        if (argc < 2):
+            Logger.Warning(LOG_TAG, 'Missing arguments')
+            return ErrorCode.TOO_FEW_ARGUMENTS
+        outputs = ReadOutputManifest(argv[1])
+        if (outputs == None):
+            return ErrorCode.FILE_ERROR
+        return GenerateVersionFilesShared(outputs)
+
+    if (argv[0] == 'binary'):
+        if (argc < 2):
+            Logger.Warning(LOG_TAG, 'Missing arguments')
+            return ErrorCode.TOO_FEW_ARGUMENTS
+        return GenerateBinaryManifest(argv[1])
+
     if (argc < 2):
         Logger.Warning(LOG_TAG, 'Missing arguments')
         return ErrorCode.TOO_FEW_ARGUMENTS
-    
-    gitTagString = Version.GetCurrentTag()
-    version = Version.GenerateVersionFromString(gitTagString)
-    templateFilePath = argv[0]
-    outputFilePath = argv[1]
+    if (argc % 2):
+        Logger.Error(LOG_TAG, 'Unpaired argument, every template needs an output: {0}'.format(argv[-1]))
+        return ErrorCode.INVALID_ARGUMENT
 
-    return GenerateVersionFileFromVersion(version, templateFilePath, outputFilePath)
+    outputs = list(zip(argv[0::2], argv[1::2]))
+    return GenerateVersionFilesShared(outputs)
@@ -0,0 +1,224 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Saku Rautio"
+__email__ = "sakupetterirautio@gmail.com"
+__date__ = "2020-02-02"
+
+__license__ = "MIT"
+__version__ = "1.0.0"
+
+"""
+This module writes and reads the binary version manifest, a compact
+file of the current version, the current commit and every version tag,
+for tools which need the versions without running Git or parsing text.
+
+The module only uses the standard library, so downstream
+tools can copy it and read manifests on their own.
+
+Layout (little-endian):
+    header          VersionManifest.HEADER
+    records         VersionManifest.RECORD per version tag, from the oldest to the newest version
+    name index      uint32 record indices, sorted by the tag names as UTF-8 bytes
+    string table    the UTF-8 tag names, referred to by offset and length
+"""
+
+import mmap
+import struct
+
+class TagRecord:
+    """
+    One version tag of the manifest.
+
+    Attributes:
+        tag (str): The tag.
+        major (int): The major version number, -1 if missing.
+        minor (int): The minor version number, -1 if missing.
+        bug (int): The bug version number, -1 if missing.
+        stage (int): The stage as a Version.Stage value.
+        stageRev (int): The stage revision, -1 if missing.
+        hash (str): The hash of the commit of the tag.
+    """
+    def __init__(self):
+        self.tag = ""
+        self.major = -1
+        self.minor = -1
+        self.bug = -1
+        self.stage = -1
+        self.stageRev = -1
+        self.hash = ""
+
+class VersionManifest:
+    """
+    Build the binary version manifest.
+    """
+    MAGIC = b'VMMF'
+    FORMAT_VERSION = 1
+    # Magic, format version, record size, record count, offsets of the records,
+    # the name index and the string table, size of the string table, index of
+    # the current tag's record (-1 if none), length and bytes of the current
+    # hash, and the build time in Unix seconds
+    HEADER = struct.Struct('<4sHHIIIIIiB3x32sq')
+    # Offset and length of the tag name in the string table, stage, hash length,
+    # major, minor, bug, stage revision and the commit hash (SHA-1 or SHA-256)
+    RECORD = struct.Struct('<IHbBiiii32s')
+    INDEX_ENTRY = struct.Struct('<I')
+    @staticmethod
+    def Build(records: list, currentTag: str, currentHash: str, buildTime: int) -> bytes:
+        """
+        Build a manifest.
+
+        Args:
+            records (list): The TagRecord objects, from the oldest to the newest version.
+            currentTag (str): The current tag, which has to be one of the records, or None.
+            currentHash (str): The hash of the current commit.
+            buildTime (int): The time of the build in Unix seconds.
+
+        Returns:
+            The manifest.
+        """
+        strings = bytearray()
+        packedRecords = bytearray()
+        names = list()
+        currentRecord = -1
+        for index, record in enumerate(records):
+            name = record.tag.encode('utf-8')
+            commitHash = bytes.fromhex(record.hash)
+            packedRecords += VersionManifest.RECORD.pack(
+                len(strings), len(name), record.stage, len(commitHash),
+                record.major, record.minor, record.bug, record.stageRev, commitHash
+            )
+            names.append((name, index))
+            strings += name
+            if (record.tag == currentTag):
+                currentRecord = index
+        nameIndex = b''.join(map(lambda name: VersionManifest.INDEX_ENTRY.pack(name[1]), sorted(names)))
+
+        recordsOffset = VersionManifest.HEADER.size
+        nameIndexOffset = recordsOffset + len(packedRecords)
+        stringsOffset = nameIndexOffset + len(nameIndex)
+        currentHashBytes = bytes.fromhex(currentHash)
+        header = VersionManifest.HEADER.pack(
+            VersionManifest.MAGIC, VersionManifest.FORMAT_VERSION, VersionManifest.RECORD.size, len(records),
+            recordsOffset, nameIndexOffset, stringsOffset, len(strings),
+            currentRecord, len(currentHashBytes), currentHashBytes, buildTime
+        )
+        return header + bytes(packedRecords) + nameIndex + bytes(strings)
+
+class VersionManifestReader:
+    """
+    Read a binary version manifest through a memory map. Nothing is parsed
+    up front: every lookup unpacks only the records it touches.
+
+    Use as a context manager:
+        with VersionManifestReader('version.vmf') as manifest:
+            print(manifest.GetCurrentTag(), manifest.FindTag('1.2.0').hash)
+    """
+    def __init__(self, manifestFilePath: str):
+        """
+        Raises:
+            OSError: If the manifest could not be opened.
+            ValueError: If the file is not a manifest of a supported format version.
+        """
+        with open(manifestFilePath, 'rb') as manifestFile:
+            self.map = mmap.mmap(manifestFile.fileno(), 0, access=mmap.ACCESS_READ)
+        if (len(self.map) < VersionManifest.HEADER.size):
+            self.Close()
+            raise ValueError('Not a version manifest')
+        (
+            magic, formatVersion, self.recordSize, self.recordCount,
+            self.recordsOffset, self.nameIndexOffset, self.stringsOffset, _,
+            self.currentRecord, currentHashLength, currentHash, self.buildTime
+        ) = VersionManifest.HEADER.unpack_from(self.map, 0)
+        if (magic != VersionManifest.MAGIC or formatVersion != VersionManifest.FORMAT_VERSION):
+            self.Close()
+            raise ValueError('Not a version manifest of format version {0}'.format(VersionManifest.FORMAT_VERSION))
+        self.currentHash = currentHash[:currentHashLength].hex()
+    def __enter__(self):
+        return self
+    def __exit__(self, excType, excValue, traceback):
+        self.Close()
+    def __len__(self):
+        return self.recordCount
+    def Close(self):
+        """
+        Unmap the manifest.
+        """
+        if (self.map != None):
+            self.map.close()
+            self.map = None
+    def GetName(self, index: int) -> bytes:
+        """
+        Get the UTF-8 tag name of a record without unpacking the rest of it.
+        """
+        nameOffset, nameLength = struct.unpack_from('<IH', self.map, self.recordsOffset + index * self.recordSize)
+        start = self.stringsOffset + nameOffset
+        return self.map[start:start + nameLength]
+    def GetRecord(self, index: int) -> TagRecord:
+        """
+        Get a record by its position in the version order, in O(1).
+
+        Args:
+            index (int): The position, 0 for the oldest version and -1 for the newest.
+
+        Returns:
+            The record.
+
+        Raises:
+            IndexError: If there is no such record.
+        """
+        if (index < 0):
+            index += self.recordCount
+        if (index < 0 or index >= self.recordCount):
+            raise IndexError('No record {0} in the manifest'.format(index))
+        (
+            nameOffset, nameLength, stage, hashLength, major, minor, bug, stageRev, commitHash
+        ) = VersionManifest.RECORD.unpack_from(self.map, self.recordsOffset + index * self.recordSize)
+        record = TagRecord()
+        start = self.stringsOffset + nameOffset
+        record.tag = self.map[start:start + nameLength].decode('utf-8')
+        record.major = major
+        record.minor = minor
+        record.bug = bug
+        record.stage = stage
+        record.stageRev = stageRev
+        record.hash = commitHash[:hashLength].hex()
+        return record
+    def FindTag(self, tag: str) -> TagRecord:
+        """
+        Find the record of a tag by binary search over the name index, in O(log n).
+
+        Args:
+            tag (str): The tag.
+
+        Returns:
+            The record, or None if the tag is not in the manifest.
+        """
+        name = tag.encode('utf-8')
+        low = 0
+        high = self.recordCount
+        while (low < high):
+            middle = (low + high) // 2
+            index = VersionManifest.INDEX_ENTRY.unpack_from(
+                self.map, self.nameIndexOffset + middle * VersionManifest.INDEX_ENTRY.size
+            )[0]
+            middleName = self.GetName(index)
+            if (middleName == name):
+                return self.GetRecord(index)
+            if (middleName < name):
+                low = middle + 1
+            else:
+                high = middle
+        return None
+    def GetCurrentTag(self) -> str:
+        """
+        Get the current tag, or None if the manifest has no current tag.
+        """
+        if (self.currentRecord < 0):
+            return None
+        return self.GetRecord(self.currentRecord).tag
+    def GetCurrentHash(self) -> str:
+        """
+        Get the hash of the current commit.
+        """
+        return self.currentHash
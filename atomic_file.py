@@ -0,0 +1,159 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Saku Rautio"
+__email__ = "sakupetterirautio@gmail.com"
+__date__ = "2020-02-02"
+
+__license__ = "MIT"
+__version__ = "1.0.0"
+
+"""
+This module provides helpers for writing files safely
+when several processes work on the same files at once.
+"""
+
+import contextlib
+import os
+import tempfile
+import time
+
+try:
+   import fcntl
+except ImportError:
+   fcntl = None
+   import msvcrt
+
+# Read once, as reading the umask means briefly changing it
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+class AtomicFile:
+   """
+   Write files so that readers never see a partially written file.
+   """
+   @staticmethod
+   @contextlib.contextmanager
+   def Open(filePath: str, openMode: str = 'w'):
+      """
+      Open a temporary file next to the target file for writing, and
+      move it over the target file when the block ends without errors.
+      For writing files in pieces, e.g. streaming the rest of a file after new content.
+
+      Use as a context manager:
+         with AtomicFile.Open(path) as outputFile:
+            outputFile.write(...)
+
+      Args:
+         filePath (str): The path to the file to write.
+         openMode (str): The mode to open the temporary file in, 'w' or 'wb'.
+
+      Raises:
+         OSError: If the file could not be written.
+      """
+      directory = os.path.dirname(os.path.abspath(filePath))
+      try:
+         mode = os.stat(filePath).st_mode & 0o777
+      except OSError:
+         mode = 0o666 & ~UMASK
+      fileDescriptor, temporaryFilePath = tempfile.mkstemp(
+         prefix='.' + os.path.basename(filePath) + '.', suffix='.tmp', dir=directory
+      )
+      try:
+         with os.fdopen(fileDescriptor, openMode) as temporaryFile:
+            yield temporaryFile
+            temporaryFile.flush()
+            os.fsync(temporaryFile.fileno())
+         os.chmod(temporaryFilePath, mode)
+         os.replace(temporaryFilePath, filePath)
+      except:
+         if (os.path.exists(temporaryFilePath)):
+            os.remove(temporaryFilePath)
+         raise
+   @staticmethod
+   def Write(filePath: str, content: str):
+      """
+      Write the given content to a temporary file next to
+      the target file and then move it over the target file.
+
+      Args:
+         filePath (str): The path to the file to write.
+         content (str): The content to write to the file.
+
+      Raises:
+         OSError: If the file could not be written.
+      """
+      with AtomicFile.Open(filePath) as temporaryFile:
+         temporaryFile.write(content)
+
+class FileLock:
+   """
+   An exclusive, cross-process lock on a file, held
+   through a '<file>.lock' file next to it.
+   The lock file can also hold a small piece of text,
+   e.g. a key of the inputs which produced the locked file.
+
+   Use as a context manager:
+      with FileLock(path) as lock:
+         ...
+   """
+   LOCK_FILE = '{path}.lock'
+   WINDOWS_RETRY_INTERVAL = 0.1
+   def __init__(self, filePath: str):
+      self.lockFilePath = FileLock.LOCK_FILE.format(path=filePath)
+      self.lockFile = None
+   def __enter__(self):
+      self.Acquire()
+      return self
+   def __exit__(self, excType, excValue, traceback):
+      self.Release()
+   def Acquire(self):
+      """
+      Block until the lock is held by this process.
+      """
+      directory = os.path.dirname(os.path.abspath(self.lockFilePath))
+      os.makedirs(directory, exist_ok=True)
+      self.lockFile = open(self.lockFilePath, 'a+')
+      if (fcntl != None):
+         fcntl.flock(self.lockFile.fileno(), fcntl.LOCK_EX)
+         return
+      while True:
+         try:
+            self.lockFile.seek(0)
+            msvcrt.locking(self.lockFile.fileno(), msvcrt.LK_NBLCK, 1)
+            return
+         except OSError:
+            time.sleep(FileLock.WINDOWS_RETRY_INTERVAL)
+   def Release(self):
+      """
+      Release the lock.
+      """
+      if (self.lockFile == None):
+         return
+      if (fcntl != None):
+         fcntl.flock(self.lockFile.fileno(), fcntl.LOCK_UN)
+      else:
+         self.lockFile.seek(0)
+         msvcrt.locking(self.lockFile.fileno(), msvcrt.LK_UNLCK, 1)
+      self.lockFile.close()
+      self.lockFile = None
+   def ReadContent(self) -> str:
+      """
+      Read the text stored in the lock file.
+
+      Returns:
+         The stored text.
+      """
+      self.lockFile.seek(0)
+      return self.lockFile.read()
+   def WriteContent(self, content: str):
+      """
+      Replace the text stored in the lock file.
+
+      Args:
+         content (str): The text to store.
+      """
+      self.lockFile.seek(0)
+      self.lockFile.truncate()
+      self.lockFile.write(content)
+      self.lockFile.flush()
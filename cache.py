@@ -0,0 +1,170 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Saku Rautio"
+__email__ = "sakupetterirautio@gmail.com"
+__date__ = "2020-02-02"
+
+__license__ = "MIT"
+__version__ = "1.0.0"
+
+"""
+This module provides a small on-disk cache for Git state,
+stored inside the repository's Git directory so that it
+follows the repository and never shows up as a change.
+"""
+
+import json
+import os
+
+from atomic_file import AtomicFile
+from error_code import ErrorCode
+from git import Git
+from logger import Logger
+LOG_TAG = "Cache"
+
+class Cache:
+   """
+   Load and save JSON cache files in the
+   '<Git common directory>/version_manager' directory.
+   """
+   CACHE_DIRECTORY = 'version_manager'
+   CACHE_FILE = '{name}.json'
+   # The environment variables which make Git look for the repository elsewhere
+   GIT_DIRECTORY_VARIABLES = ['GIT_DIR', 'GIT_COMMON_DIR', 'GIT_CEILING_DIRECTORIES', 'GIT_DISCOVERY_ACROSS_FILESYSTEM']
+   directory = None
+   gitDirectories = None
+   @staticmethod
+   def FindGitDirectories(workDirectory: str) -> tuple:
+      """
+      Find the Git directory and the common Git directory of a repository
+      the way Git does, by looking for a '.git' directory or a '.git' file
+      of a worktree or a submodule in the work directory and its parents.
+
+      Args:
+         workDirectory (str): The directory to start looking from.
+
+      Returns:
+         A tuple of the absolute Git directory and the absolute common Git
+         directory, or None if no repository was found.
+      """
+      directory = os.path.abspath(workDirectory)
+      while True:
+         dotGitPath = os.path.join(directory, '.git')
+         gitDirectory = None
+         if os.path.isdir(dotGitPath):
+            gitDirectory = dotGitPath
+         elif os.path.isfile(dotGitPath):
+            try:
+               with open(dotGitPath, 'r') as dotGitFile:
+                  content = dotGitFile.read().strip()
+            except IOError:
+               return None
+            if not content.startswith('gitdir:'):
+               return None
+            gitDirectory = os.path.join(directory, content[len('gitdir:'):].strip())
+         if (gitDirectory != None):
+            if not os.path.isfile(os.path.join(gitDirectory, 'HEAD')):
+               return None
+            commonDirectory = gitDirectory
+            try:
+               # A worktree keeps the path to the common directory in 'commondir'
+               with open(os.path.join(gitDirectory, 'commondir'), 'r') as commonDirectoryFile:
+                  commonDirectory = os.path.join(gitDirectory, commonDirectoryFile.read().strip())
+            except FileNotFoundError:
+               pass
+            except IOError:
+               return None
+            return (os.path.abspath(gitDirectory), os.path.abspath(commonDirectory))
+         parentDirectory = os.path.dirname(directory)
+         if (parentDirectory == directory):
+            return None
+         directory = parentDirectory
+   @staticmethod
+   def GetGitDirectories() -> tuple:
+      """
+      Get the Git directory of the current repository and the common
+      Git directory which holds its refs (they differ for worktrees).
+      They are found by reading the file system, and Git is only run if
+      the environment overrides the lookup or nothing was found.
+      The directories are resolved once per process.
+
+      Returns:
+         A tuple of the absolute Git directory and the absolute common Git directory.
+
+      Raises:
+         subprocess.CalledProcessError: If there is no repository.
+      """
+      if (Cache.gitDirectories == None):
+         gitDirectories = None
+         if not any(map(lambda variable: variable in os.environ, Cache.GIT_DIRECTORY_VARIABLES)):
+            gitDirectories = Cache.FindGitDirectories(os.getcwd())
+         if (gitDirectories == None):
+            output = Git.Run(['rev-parse', '--absolute-git-dir', '--git-common-dir'])
+            gitDirectory, commonDirectory = str(output).replace('\r','').split('\n')[:2]
+            gitDirectories = (gitDirectory, os.path.abspath(commonDirectory))
+         Cache.gitDirectories = gitDirectories
+      return Cache.gitDirectories
+   @staticmethod
+   def GetDirectory(create: bool = True) -> str:
+      """
+      Get the cache directory of the current repository.
+
+      Args:
+         create (bool): Whether to create the directory if it does not exist.
+
+      Returns:
+         The path to the cache directory.
+      """
+      if (Cache.directory == None):
+         Cache.directory = os.path.join(Cache.GetGitDirectories()[1], Cache.CACHE_DIRECTORY)
+      if (create):
+         os.makedirs(Cache.directory, exist_ok=True)
+      return Cache.directory
+   @staticmethod
+   def GetPath(name: str, create: bool = True) -> str:
+      """
+      Get the path to a cache file.
+
+      Args:
+         name (str): The name of the cache file, without the extension.
+         create (bool): Whether to create the cache directory if it does not exist.
+
+      Returns:
+         The path to the cache file.
+      """
+      return os.path.join(Cache.GetDirectory(create), Cache.CACHE_FILE.format(name=name))
+   @staticmethod
+   def Load(name: str):
+      """
+      Load the data of a cache file.
+
+      Args:
+         name (str): The name of the cache file, without the extension.
+
+      Returns:
+         The cached data, or None if there is no usable cache file.
+      """
+      try:
+         with open(Cache.GetPath(name, False), 'r') as cacheFile:
+            return json.load(cacheFile)
+      except (IOError, ValueError):
+         return None
+   @staticmethod
+   def Save(name: str, data) -> ErrorCode:
+      """
+      Save data to a cache file atomically.
+
+      Args:
+         name (str): The name of the cache file, without the extension.
+         data: JSON serializable data to cache.
+
+      Returns:
+         An error code from the ErrorCode class.
+      """
+      try:
+         AtomicFile.Write(Cache.GetPath(name), json.dumps(data))
+      except (IOError, TypeError, ValueError) as err:
+         Logger.Warning(LOG_TAG, 'Could not save cache {0}: {1}'.format(name, err))
+         return ErrorCode.FILE_ERROR
+      return ErrorCode.OK
@@ -0,0 +1,217 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Saku Rautio"
+__email__ = "sakupetterirautio@gmail.com"
+__date__ = "2020-02-02"
+
+__license__ = "MIT"
+__version__ = "1.0.0"
+
+"""
+This module keeps a CHANGELOG.md up to date incrementally.
+The last recorded tag is kept in a marker in the header of the
+file, so an update only reads the header, renders the section of
+the new release and streams the rest of the file as it is.
+"""
+
+import re
+import shutil
+import subprocess
+
+from atomic_file import AtomicFile
+from date import Date
+from error_code import ErrorCode
+from logger import Logger
+LOG_TAG = "Changelog"
+from version import Version, VersionResolver
+
+DEFAULT_CHANGELOG_FILE = 'CHANGELOG.md'
+TITLE = '# Changelog\n'
+MARKER_FORMAT = '<!-- version_manager last tag: {tag} -->\n'
+MARKER_PATTERN = re.compile(r'^<!-- version_manager last tag: (.*) -->$')
+# The marker has to be within this many lines from the start of the file
+MAX_HEADER_LINES = 20
+SECTION_FORMAT = \
+"""
+## {tag} ({date})
+
+{changes}
+"""
+CHANGE_FORMAT = '* {title} ({author}, {hash})'
+SECTION_DATE_FORMAT = '%Y-%m-%d'
+
+def ReadHeader(changelogFile) -> tuple:
+   """
+   Read the header of a changelog up to and including its marker.
+
+   Args:
+      changelogFile: The changelog opened in binary mode.
+
+   Returns:
+      A tuple of the header as a string and the last recorded tag,
+      or (None, None) if there is no marker in the header.
+      The file is left positioned right after the marker.
+   """
+   lines = list()
+   for _ in range(MAX_HEADER_LINES):
+      line = changelogFile.readline()
+      if (len(line) == 0):
+         break
+      lines.append(line.decode('utf-8'))
+      match = MARKER_PATTERN.match(lines[-1].rstrip('\r\n'))
+      if (match != None):
+         return (''.join(lines[:-1]), match.group(1))
+   return (None, None)
+
+def RenderSection(tag: str, commits: list) -> str:
+   """
+   Render the changelog section of a release.
+
+   Args:
+      tag (str): The tag of the release.
+      commits (list): The commits of the release, the newest first.
+
+   Returns:
+      The section as Markdown.
+   """
+   date = commits[0].date if len(commits) else Date.Now()
+   return SECTION_FORMAT.format(
+      tag=tag, date=date.strftime(SECTION_DATE_FORMAT),
+      changes='\n'.join(map(
+         lambda commit: CHANGE_FORMAT.format(title=commit.title, author=commit.author.name, hash=commit.hash[:7]),
+         commits
+      ))
+   )
+
+def RenderSections(currentTag: str, commits: list, revisions: list) -> str:
+   """
+   Render a changelog section for every release of the commits, the newest
+   first. The commits are grouped by the oldest version tag containing them,
+   walking only the revisions of the commits.
+
+   Args:
+      currentTag (str): The current tag, for the commits which are in no version tag.
+      commits (list): The commits, the newest first.
+      revisions (list): The revisions the commits were selected with.
+
+   Returns:
+      The sections as Markdown.
+   """
+   releases = dict()
+   for commit in Version.AssignReleaseTags(commits, revisions):
+      releases.setdefault(commit.tag or currentTag, list()).append(commit)
+   versionTags = VersionResolver(list(releases.keys())).tags
+   # Tags which are not versions, e.g. a current tag like 'nightly', are the newest
+   tags = list(filter(lambda tag: tag not in versionTags, releases.keys())) + list(reversed(versionTags))
+   return ''.join(map(lambda tag: RenderSection(tag, releases[tag]), tags))
+
+def UpdateChangelog(changelogFilePath: str) -> ErrorCode:
+   """
+   Add the sections of the tags since the tag recorded in the changelog's
+   marker to the top of a changelog. A missing changelog is created with
+   a section for every tag. A changelog without a marker, e.g. one written
+   by hand, gets the marker and a section for every tag on top of its
+   old content, which is kept as it is.
+
+   Args:
+      changelogFilePath (str): The path to the changelog.
+
+   Returns:
+      An ErrorCode object telling what the outcome of calling the function was.
+   """
+   try:
+      currentTag = Version.GetCurrentTag()
+   except subprocess.CalledProcessError as err:
+      Logger.Error(LOG_TAG, 'No tag to add: {0}'.format(err))
+      return ErrorCode.COMMAND_FAILED
+   try:
+      changelogFile = open(changelogFilePath, 'rb')
+   except FileNotFoundError:
+      changelogFile = None
+   except IOError as err:
+      Logger.Error(LOG_TAG, 'Could not read changelog: {0}'.format(err))
+      return ErrorCode.FILE_ERROR
+
+   try:
+      header, lastTag = (None, None)
+      if (changelogFile != None):
+         header, lastTag = ReadHeader(changelogFile)
+         if (header == None):
+            Logger.Warning(LOG_TAG, 'No marker in {0}, adding it on top of the old content'.format(changelogFilePath))
+      if (lastTag == currentTag):
+         Logger.Info(LOG_TAG, 'Changelog already has {0}'.format(currentTag))
+         return ErrorCode.OK
+      if (lastTag == None):
+         revisions = [currentTag]
+      else:
+         revisions = ['{0}..{1}'.format(lastTag, currentTag)]
+      commits = Version.GetCommits(revisions)
+      sections = RenderSections(currentTag, commits, revisions)
+
+      with AtomicFile.Open(changelogFilePath, 'wb') as outputFile:
+         outputFile.write((header or TITLE).encode('utf-8'))
+         outputFile.write(MARKER_FORMAT.format(tag=currentTag).encode('utf-8'))
+         outputFile.write(sections.encode('utf-8'))
+         if (changelogFile != None):
+            if (header == None):
+               # Without a marker all of the old content is kept, after the new sections
+               outputFile.write(b'\n')
+               changelogFile.seek(0)
+            # The older sections are copied as bytes, without reading them as text
+            shutil.copyfileobj(changelogFile, outputFile)
+   except IOError as err:
+      Logger.Error(LOG_TAG, 'Could not write changelog: {0}'.format(err))
+      return ErrorCode.FILE_ERROR
+   except subprocess.CalledProcessError as err:
+      Logger.Error(LOG_TAG, err)
+      return ErrorCode.COMMAND_FAILED
+   finally:
+      if (changelogFile != None):
+         changelogFile.close()
+   Logger.Info(LOG_TAG, 'Added up to {0} with {1} commits to {2}'.format(currentTag, len(commits), changelogFilePath))
+   return ErrorCode.OK
+
+def HandleCommand(argv: list, argc: int) -> ErrorCode:
+   """
+   Handle a command given to this module
+
+   Args:
+      argv (list): The given arguments.
+      argc (int): The count of given arguments
+
+   Returns:
+      An ErrorCode object telling what the outcome of calling the function was.
+   """
+   HELP_MESSAGE = \
+   """
+   The changelog maintainer.
+
+   Usage:
+   version_manager.py changelog [optional] <command>
+
+   Required:
+   command  What you want the maintainer to do. Available commands:
+            update [file]  Add a section for every tag since the last tag
+                           in the changelog (CHANGELOG.md by default),
+                           up to the current tag.
+
+   Optional:
+   help    Print this message.
+   """
+
+   argv = argv[1:]
+   argc = len(argv)
+
+   if (argc < 1):
+      Logger.Warning(LOG_TAG, 'No command given')
+      return ErrorCode.TOO_FEW_ARGUMENTS
+
+   if (argv[0] == 'help'):
+      print(HELP_MESSAGE)
+      return ErrorCode.OK
+   if (argv[0] == 'update'):
+      return UpdateChangelog(argv[1] if argc > 1 else DEFAULT_CHANGELOG_FILE)
+
+   Logger.Warning(LOG_TAG, 'Unknown command: {0}'.format(argv[0]))
+   return ErrorCode.UNKNOWN_COMMAND
@@ -0,0 +1,201 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Saku Rautio"
+__email__ = "sakupetterirautio@gmail.com"
+__date__ = "2020-02-02"
+
+__license__ = "MIT"
+__version__ = "1.0.0"
+
+"""
+This module keeps an inverted index of the issue keys and the
+commit trailers in the history, e.g. which commits reference
+'ISSUE-1234' or who co-authored a release, so the questions are
+answered from the index instead of a 'git log --grep' each.
+"""
+
+import re
+import subprocess
+
+from cache import Cache
+from config import Config
+from error_code import ErrorCode
+from git import Git
+from logger import Logger
+LOG_TAG = "CommitIndex"
+from version import Version
+
+class CommitIndex:
+   """
+   The index of the history of HEAD, stored in the repository cache.
+   It is updated with only the new commits while HEAD moves forward,
+   and rebuilt when HEAD is rewritten or the issue pattern changes.
+
+   The index is a dict of:
+      'head': The commit the index is up to date with.
+      'pattern': The issue pattern the index was built with.
+      'issues': The issue keys to the hashes of the commits referencing them.
+      'trailers': The lower case trailer keys to dicts of their values
+                  to the hashes of the commits which have the trailer.
+   """
+   CACHE_NAME = 'commit_index'
+   DEFAULT_ISSUE_PATTERN = r'\b[A-Z][A-Z0-9]+-[0-9]+\b'
+   @staticmethod
+   def GetIssuePattern() -> str:
+      """
+      Get the issue key pattern from the 'Index' section of the config.json.
+
+      Returns:
+         The pattern as a regular expression string.
+      """
+      return Config.GetConfig().get('Index', dict()).get('Issue pattern', CommitIndex.DEFAULT_ISSUE_PATTERN)
+   @staticmethod
+   def AddCommits(index: dict, commits: list):
+      """
+      Add the issue keys and the trailers of commits to an index.
+
+      Args:
+         index (dict): The index to add to.
+         commits (list): The parsed commits.
+      """
+      issuePattern = re.compile(index['pattern'])
+      issues = index['issues']
+      trailers = index['trailers']
+      for commit in commits:
+         for issue in set(issuePattern.findall(commit.title + '\n' + commit.message)):
+            issues.setdefault(issue, list()).append(commit.hash)
+         for key, value in commit.trailers:
+            trailers.setdefault(key.lower(), dict()).setdefault(value, list()).append(commit.hash)
+   @staticmethod
+   def Update() -> dict:
+      """
+      Bring the index up to date with HEAD and save it.
+
+      Returns:
+         The index.
+
+      Raises:
+         subprocess.CalledProcessError: If a Git command failed.
+      """
+      head = Version.GetCurrentHash()
+      pattern = CommitIndex.GetIssuePattern()
+      index = Cache.Load(CommitIndex.CACHE_NAME)
+      if (index != None and index.get('pattern') == pattern):
+         if (index.get('head') == head):
+            return index
+         if (Git.RunProcess(['merge-base', '--is-ancestor', index['head'], head]).returncode == 0):
+            revisions = ['{0}..{1}'.format(index['head'], head)]
+         else:
+            index = None
+      else:
+         index = None
+      if (index == None):
+         index = {'head': None, 'pattern': pattern, 'issues': dict(), 'trailers': dict()}
+         revisions = [head]
+      commits = Version.GetCommits(revisions)
+      Logger.Debug(LOG_TAG, 'Indexing {0} commits'.format(len(commits)))
+      # Oldest first, so the hashes of every key stay from the oldest to the newest
+      CommitIndex.AddCommits(index, reversed(commits))
+      index['head'] = head
+      Cache.Save(CommitIndex.CACHE_NAME, index)
+      return index
+   @staticmethod
+   def GetRangeHashes(newer: str, older: str) -> set:
+      """
+      Get the hashes of the commits in a range, without parsing the commits.
+
+      Returns:
+         A set of commit hashes.
+      """
+      output = Git.Run(['rev-list', '{0}..{1}'.format(older, newer), '--'])
+      return set(output.split())
+
+def HandleUpdateCommand(argv: list, argc: int) -> ErrorCode:
+   index = CommitIndex.Update()
+   print('Indexed {0} issue keys and {1} trailer keys'.format(len(index['issues']), len(index['trailers'])))
+   return ErrorCode.OK
+
+def HandleIssueCommand(argv: list, argc: int) -> ErrorCode:
+   index = CommitIndex.Update()
+   result = ErrorCode.OK
+   for issue in argv:
+      hashes = index['issues'].get(issue, list())
+      if (len(hashes) == 0):
+         result = ErrorCode.NOT_FOUND
+      print('{0}: {1}'.format(issue, ' '.join(reversed(hashes))))
+   return result
+
+def HandleTrailerCommand(argv: list, argc: int) -> ErrorCode:
+   index = CommitIndex.Update()
+   values = index['trailers'].get(argv[0].lower(), dict())
+   rangeHashes = None
+   if (argc > 1):
+      # With only <from>, the range is up to HEAD
+      rangeHashes = CommitIndex.GetRangeHashes(argv[2] if argc > 2 else 'HEAD', argv[1])
+   for value, hashes in sorted(values.items()):
+      if (rangeHashes != None):
+         hashes = list(filter(lambda commitHash: commitHash in rangeHashes, hashes))
+      if (len(hashes)):
+         print('{0} ({1} commits)'.format(value, len(hashes)))
+   return ErrorCode.OK
+
+def HandleCommand(argv: list, argc: int) -> ErrorCode:
+   """
+   Handle a command given to this module
+
+   Args:
+      argv (list): The given arguments.
+      argc (int): The count of given arguments
+
+   Returns:
+      An ErrorCode object telling what the outcome of calling the function was.
+   """
+   HELP_MESSAGE = \
+   """
+   The issue and trailer index of the commits.
+
+   Usage:
+   version_manager.py index [optional] <command> [args]
+
+   Required:
+   command  What you want to look up. Available commands:
+            issue <key> [key...]           Print the commits which reference
+                                           the issue keys, the newest first.
+            trailer <key> [<from> [<to>]]  Print the values of a trailer, e.g.
+                                           'Co-authored-by', in all of the history
+                                           or in the commits between two versions,
+                                           <to> being HEAD by default.
+            update                         Bring the index up to date.
+
+   Optional:
+   help    Print this message.
+   """
+
+   argv = argv[1:]
+   argc = len(argv)
+
+   if (argc < 1):
+      Logger.Warning(LOG_TAG, 'No command given')
+      return ErrorCode.TOO_FEW_ARGUMENTS
+   if (argv[0] == 'help'):
+      print(HELP_MESSAGE)
+      return ErrorCode.OK
+
+   commandSwitcher = {
+      'issue': HandleIssueCommand,
+      'trailer': HandleTrailerCommand,
+      'update': HandleUpdateCommand
+   }
+   chosenCommand = commandSwitcher.get(argv[0], None)
+   if (chosenCommand == None):
+      Logger.Warning(LOG_TAG, 'Unknown command: {0}'.format(argv[0]))
+      return ErrorCode.UNKNOWN_COMMAND
+   if (argv[0] != 'update' and argc < 2):
+      Logger.Warning(LOG_TAG, 'Missing arguments')
+      return ErrorCode.TOO_FEW_ARGUMENTS
+   try:
+      return chosenCommand(argv[1:], argc - 1)
+   except subprocess.CalledProcessError as err:
+      Logger.Error(LOG_TAG, err)
+      return ErrorCode.COMMAND_FAILED
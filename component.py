@@ -0,0 +1,290 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Saku Rautio"
+__email__ = "sakupetterirautio@gmail.com"
+__date__ = "2020-02-02"
+
+__license__ = "MIT"
+__version__ = "1.0.0"
+
+"""
+This module versions the components of a monorepo separately.
+Every component has its own tags, e.g. 'core/1.2.3', and its own
+paths, and the versions of all the components are resolved in one
+walk of the history instead of one walk per component.
+"""
+
+import subprocess
+
+from config import Config
+from error_code import ErrorCode
+from git import Git
+from logger import Logger
+LOG_TAG = "Component"
+from version import Version
+
+class ComponentVersion:
+   """
+   The version state of one component.
+
+   Attributes:
+      name (str): The name of the component.
+      tag (str): The nearest tag of the component reachable from HEAD, or None.
+      version (Version): The version of the tag, or None.
+      commits (list): The hashes of the commits which changed the paths
+                      of the component since the tag, the newest first.
+      nextVersion (str): The version to tag next, or None if nothing changed.
+   """
+   def __init__(self, name: str):
+      self.name = name
+      self.tag = None
+      self.version = None
+      self.commits = list()
+      self.nextVersion = None
+
+class Component:
+   """
+   Resolve the versions of the components set in the 'Components'
+   section of the config.json, e.g.
+
+      "Components": {
+         "Tag prefix": "{component}/",
+         "Paths": {
+            "core": ["src/core", "include/core"],
+            "app": ["src/app"]
+         }
+      }
+   """
+   DEFAULT_TAG_PREFIX = '{component}/'
+   # Every record of the walk starts with the hash and the parent
+   # hashes of the commit, followed by the paths it changed
+   WALK_RECORD_START = '\x1e'
+   WALK_FORMAT = '%x1e%H %P'
+   @staticmethod
+   def GetSettings() -> dict:
+      """
+      Get the component settings from the config.json.
+
+      Returns:
+         The 'Components' section of the config.json as a dict.
+      """
+      return Config.GetConfig().get('Components', dict())
+   @staticmethod
+   def ParseTag(tag: str, prefixesToComponents: dict) -> tuple:
+      """
+      Split a tag into its component and version.
+
+      Args:
+         tag (str): The tag, e.g. 'core/1.2.3'.
+         prefixesToComponents (dict): The tag prefixes of the components to their names.
+
+      Returns:
+         A tuple of the component name and the Version, or None if the tag is not a component version.
+      """
+      # Try the longest prefix first, so that 'core/' never shadows 'core/api/'
+      for end in range(len(tag) - 1, 0, -1):
+         name = prefixesToComponents.get(tag[:end])
+         if (name == None):
+            continue
+         try:
+            return (name, Version.GenerateVersionFromString(tag[end:]))
+         except ValueError:
+            return None
+      return None
+   @staticmethod
+   def GetComponentTags(components: list) -> dict:
+      """
+      Get the component tags of every tagged commit.
+
+      Args:
+         components (list): The names of the components.
+
+      Returns:
+         A dict of commit hashes to dicts of component names to the newest (tag, Version) on the commit.
+      """
+      prefix = Component.GetSettings().get('Tag prefix', Component.DEFAULT_TAG_PREFIX)
+      prefixesToComponents = dict((prefix.format(component=name), name) for name in components)
+      commitTags = dict()
+      for tag, commit in Version.GetTagCommits().items():
+         parsed = Component.ParseTag(tag, prefixesToComponents)
+         if (parsed == None):
+            continue
+         name, version = parsed
+         tagsOfCommit = commitTags.setdefault(commit, dict())
+         if (name not in tagsOfCommit or tagsOfCommit[name][1].GetSortKey() < version.GetSortKey()):
+            tagsOfCommit[name] = (tag, version)
+      return commitTags
+   @staticmethod
+   def GetNextVersion(version: Version) -> str:
+      """
+      Get the version which follows a version: the next stage
+      revision of a pre-release, or else the next bug version.
+
+      Args:
+         version (Version): The current version.
+
+      Returns:
+         The next version as a string, e.g. '1.2.4' or '1.2.3-rc.2'.
+      """
+      stageStrings = dict((stage, string) for string, stage in Version.StageStringsToStages.items())
+      numbers = [max(version.major, 0), max(version.minor, 0), max(version.bug, 0)]
+      if (version.stage in (Version.Stage.UNKNOWN, Version.Stage.RELEASE)):
+         numbers[2] += 1
+         stageRev = 0
+      else:
+         stageRev = max(version.stageRev, 0) + 1
+      versionString = '.'.join(map(str, numbers))
+      if (version.stage != Version.Stage.UNKNOWN):
+         versionString += '-{0}.{1}'.format(stageStrings[version.stage], stageRev)
+      return versionString
+   @staticmethod
+   def ReadWalk(stream):
+      """
+      Parse the output of 'git log --name-only' with Component.WALK_FORMAT.
+
+      Args:
+         stream: The text output stream of the walk.
+
+      Yields:
+         A tuple of the commit hash, its parent hashes and the paths it changed, per commit.
+      """
+      record = None
+      for line in stream:
+         line = line.rstrip('\n')
+         if line.startswith(Component.WALK_RECORD_START):
+            if (record != None):
+               yield record
+            hashes = line[len(Component.WALK_RECORD_START):].split(' ')
+            record = (hashes[0], list(filter(None, hashes[1:])), list())
+         elif (len(line) and record != None):
+            record[2].append(line)
+      if (record != None):
+         yield record
+   @staticmethod
+   def Resolve(revision: str = 'HEAD') -> dict:
+      """
+      Resolve the current version, the commits since the
+      current version and the next version of every component.
+
+      The history is walked once, the children before their parents.
+      The first tag of a component met in the walk is its nearest tag,
+      and the commits reachable from it are marked for the component
+      while the walk reaches them, so a commit is counted for the component
+      only if it changed the component's paths and is not in the tag.
+      The walk stops as soon as all the remaining history is in the tags
+      of all the components.
+
+      Args:
+         revision (str): The revision to resolve the versions at.
+
+      Returns:
+         A dict of component names to ComponentVersion objects.
+
+      Raises:
+         subprocess.CalledProcessError: If the Git walk failed.
+      """
+      paths = Component.GetSettings().get('Paths', dict())
+      componentVersions = dict((name, ComponentVersion(name)) for name in paths)
+      allComponents = frozenset(paths.keys())
+      noComponents = frozenset()
+      # Look up the changed paths by their directories instead of comparing to every component
+      prefixesToComponents = dict()
+      for name, componentPaths in paths.items():
+         for path in componentPaths:
+            prefixesToComponents.setdefault(path.strip('/'), set()).add(name)
+      def GetChangedComponents(changedPaths: list) -> set:
+         changed = set()
+         for changedPath in changedPaths:
+            parts = changedPath.split('/')
+            for end in range(len(parts), 0, -1):
+               changed.update(prefixesToComponents.get('/'.join(parts[:end]), noComponents))
+         return changed
+
+      commitTags = Component.GetComponentTags(list(paths.keys()))
+      # The components whose nearest tag contains the commit, for the commits still to be walked
+      pending = dict()
+      taggedCount = 0
+      process = Git.StartProcess(
+         ['-c', 'core.quotePath=off', 'log', '--topo-order', '--name-only',
+          '--format=' + Component.WALK_FORMAT, revision, '--'],
+         stdout=subprocess.PIPE, universal_newlines=True, encoding='utf-8'
+      )
+      try:
+         for commit, parents, changedPaths in Component.ReadWalk(process.stdout):
+            inTags = pending.pop(commit, noComponents)
+            for name, (tag, version) in commitTags.get(commit, dict()).items():
+               componentVersion = componentVersions[name]
+               if (componentVersion.tag == None):
+                  componentVersion.tag = tag
+                  componentVersion.version = version
+                  inTags = inTags | {name}
+                  taggedCount += 1
+            for name in GetChangedComponents(changedPaths) - inTags:
+               componentVersions[name].commits.append(commit)
+            for parent in parents:
+               parentInTags = pending.get(parent)
+               if (parentInTags == None or parentInTags <= inTags):
+                  pending[parent] = inTags
+               elif not (inTags <= parentInTags):
+                  pending[parent] = parentInTags | inTags
+            if (taggedCount == len(allComponents) and all(map(lambda x: x == allComponents, pending.values()))):
+               break
+      finally:
+         process.stdout.close()
+         if (process.poll() == None):
+            process.kill()
+         returnCode = process.wait()
+      if (returnCode > 0):
+         raise subprocess.CalledProcessError(returnCode, process.args)
+
+      for componentVersion in componentVersions.values():
+         if (componentVersion.version != None and len(componentVersion.commits)):
+            componentVersion.nextVersion = Component.GetNextVersion(componentVersion.version)
+      return componentVersions
+
+def HandleCommand(argv: list, argc: int) -> ErrorCode:
+   """
+   Handle a command given to this module
+
+   Args:
+      argv (list): The given arguments.
+      argc (int): The count of given arguments
+
+   Returns:
+      An ErrorCode object telling what the outcome of calling the function was.
+   """
+   HELP_MESSAGE = \
+   """
+   The monorepo component versions.
+
+   Usage:
+   version_manager.py components [optional] [revision]
+
+   Prints the nearest tag, the count of commits since the tag
+   and the next version of every component in the config.json,
+   at the given revision (HEAD by default).
+
+   Optional:
+   help    Print this message.
+   """
+
+   argv = argv[1:]
+   argc = len(argv)
+
+   if (argc > 0 and argv[0] == 'help'):
+      print(HELP_MESSAGE)
+      return ErrorCode.OK
+
+   try:
+      componentVersions = Component.Resolve(argv[0] if argc > 0 else 'HEAD')
+   except subprocess.CalledProcessError as err:
+      Logger.Error(LOG_TAG, err)
+      return ErrorCode.COMMAND_FAILED
+   if (len(componentVersions) == 0):
+      Logger.Warning(LOG_TAG, 'No components in the config.json')
+   for name, componentVersion in sorted(componentVersions.items()):
+      print('{0}: {1}, {2} commits since, next {3}'.format(
+         name, componentVersion.tag, len(componentVersion.commits), componentVersion.nextVersion
+      ))
+   return ErrorCode.OK
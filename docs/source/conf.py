@@ -15,6 +15,7 @@ import sys
 sys.path.insert(0, os.path.abspath('../..'))
 sys.path.insert(0, os.path.abspath('../../VersionEmailer'))
 sys.path.insert(0, os.path.abspath('../../VersionFileGenerator'))
+sys.path.insert(0, os.path.abspath('../../ReleaseNotes'))
 
 
 # -- Project information -----------------------------------------------------
@@ -28,4 +28,6 @@ class ErrorCode(IntEnum):
     FILE_ERROR = auto()
     COMMAND_FAILED = auto()
     SMTP_ERROR = auto()
+    INVALID_ARGUMENT = auto()
+    NOT_FOUND = auto()
     UNKNOWN_ERROR = 666
@@ -8,6 +8,109 @@ __date__ = "2020-02-02"
 __license__ = "MIT"
 __version__ = "1.0.0"
 
+import subprocess
+import time
+
+from metrics import Metrics
+
+class GitUnavailableError(subprocess.CalledProcessError):
+   """
+   Raised instead of running a Git command while Git is disabled,
+   e.g. when answering from a snapshot. It is a CalledProcessError,
+   so the callers report it as they report a failed Git command.
+   """
+   def __init__(self, args: list, reason: str):
+      super().__init__(-1, ['git'] + args)
+      self.reason = reason
+   def __str__(self):
+      return "Not running 'git {0}' {1}, this needs Git".format(' '.join(self.cmd[1:]), self.reason)
+
+class Git:
+   """
+   Run Git commands. Every Git subprocess goes through here,
+   so that the run metrics can count them and their time.
+   """
+   # Why Git is not to be run, or None if it is
+   disabledReason = None
+   @staticmethod
+   def Disable(reason: str):
+      """
+      Refuse to run Git from now on, raising a GitUnavailableError instead.
+
+      Args:
+         reason (str): Why Git is not run, e.g. 'with a snapshot'.
+      """
+      Git.disabledReason = reason
+   @staticmethod
+   def CheckEnabled(args: list):
+      """
+      Raises:
+         GitUnavailableError: If Git is disabled.
+      """
+      if (Git.disabledReason != None):
+         raise GitUnavailableError(args, Git.disabledReason)
+   @staticmethod
+   def Run(args: list) -> str:
+      """
+      Run a Git command and return its output.
+
+      Args:
+         args (list): The arguments to Git, without the 'git' itself.
+
+      Returns:
+         The decoded standard output of the command.
+
+      Raises:
+         subprocess.CalledProcessError: If the command failed.
+         GitUnavailableError: If Git is disabled.
+      """
+      Git.CheckEnabled(args)
+      startTime = time.perf_counter()
+      try:
+         return subprocess.check_output(['git'] + args).decode('utf-8')
+      finally:
+         Metrics.Add('git_commands_total')
+         Metrics.Add('git_seconds_total', time.perf_counter() - startTime)
+   @staticmethod
+   def RunProcess(args: list) -> subprocess.CompletedProcess:
+      """
+      Run a Git command which may fail, capturing its output.
+
+      Args:
+         args (list): The arguments to Git, without the 'git' itself.
+
+      Returns:
+         The completed process, with the return code, stdout and stderr as bytes.
+
+      Raises:
+         GitUnavailableError: If Git is disabled.
+      """
+      Git.CheckEnabled(args)
+      startTime = time.perf_counter()
+      try:
+         return subprocess.run(['git'] + args, capture_output=True)
+      finally:
+         Metrics.Add('git_commands_total')
+         Metrics.Add('git_seconds_total', time.perf_counter() - startTime)
+   @staticmethod
+   def StartProcess(args: list, **options) -> subprocess.Popen:
+      """
+      Start a long-lived Git process.
+
+      Args:
+         args (list): The arguments to Git, without the 'git' itself.
+         options: Keyword arguments to subprocess.Popen.
+
+      Returns:
+         The started process.
+
+      Raises:
+         GitUnavailableError: If Git is disabled.
+      """
+      Git.CheckEnabled(args)
+      Metrics.Add('git_commands_total')
+      return subprocess.Popen(['git'] + args, **options)
+
 class User:
    """
    The class representation of a Git user.
@@ -30,6 +133,11 @@ class Commit:
       date (datetime.datetime): The timestamp of the commit.
       title (str): The title of the commit.
       message (str): The message of the commit.
+      tag (str): The oldest version tag which contains the commit,
+                 or None if unknown or not released yet.
+                 See Version.AssignReleaseTags.
+      paths (list): The paths the commit changed, or None if they were not read.
+      trailers (list): The (key, value) trailers of the message, e.g. ('Fixes', 'ISSUE-12').
    """
    def __init__(self):
       self.hash = ""
@@ -37,3 +145,6 @@ class Commit:
       self.date = None
       self.title = ""
       self.message = ""
+      self.tag = None
+      self.paths = None
+      self.trailers = list()
@@ -0,0 +1,210 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Saku Rautio"
+__email__ = "sakupetterirautio@gmail.com"
+__date__ = "2020-02-02"
+
+__license__ = "MIT"
+__version__ = "1.0.0"
+
+"""
+This module installs Git hooks which prepare the version state in the
+background whenever a commit, checkout, merge or tag changes it, so
+the 'generate' and 'version get' calls of a build only read the
+prepared state instead of running Git.
+"""
+
+import inspect
+import os
+import stat
+import subprocess
+import sys
+
+from atomic_file import AtomicFile, FileLock
+from cache import Cache
+from config import Config
+from error_code import ErrorCode
+from git import Git
+from logger import Logger
+LOG_TAG = "Hooks"
+from version import Version
+import VersionFileGenerator.version_file_generator as versionFileGenerator
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+HOOK_NAMES = ['post-commit', 'post-checkout', 'post-merge', 'reference-transaction']
+# Marks the hooks installed by this module, so that other hooks are never overwritten or removed
+HOOK_MARKER = '# Installed by version_manager.py hooks install'
+# Only the committed transactions which change tags are of interest, the
+# rest of the ref updates, e.g. of a commit, are handled by the other hooks.
+# Git waits for the hook, so the update itself is run in the background.
+HOOK_CONDITIONS = {
+   'post-checkout': '[ "$3" = 1 ] || exit 0\n',
+   'reference-transaction': '[ "$1" = committed ] || exit 0\ngrep " refs/tags/" > /dev/null || exit 0\n'
+}
+HOOK_SCRIPT = \
+"""#!/bin/sh
+{marker}
+{condition}"{python}" "{versionManager}" hooks run {hook} < /dev/null > /dev/null 2>&1 &
+"""
+LOCK_NAME = 'hooks'
+
+class Hooks:
+   """
+   Install, uninstall and run the version manager's Git hooks.
+   """
+   @staticmethod
+   def GetHooksDirectory() -> str:
+      """
+      Get the hooks directory of the current repository, respecting 'core.hooksPath'.
+
+      Returns:
+         The absolute path to the hooks directory.
+      """
+      output = Git.Run(['rev-parse', '--git-path', 'hooks'])
+      return os.path.abspath(str(output).replace('\r','').replace('\n',''))
+   @staticmethod
+   def IsInstalledHook(hookFilePath: str) -> bool:
+      """
+      Check whether a hook file was installed by this module.
+      """
+      try:
+         with open(hookFilePath, 'r') as hookFile:
+            return HOOK_MARKER in hookFile.read()
+      except (IOError, UnicodeDecodeError):
+         return False
+   @staticmethod
+   def Install() -> ErrorCode:
+      """
+      Install the hooks. A hook which already exists and was not
+      installed by this module is left as it is.
+
+      Returns:
+         An ErrorCode object telling what the outcome of calling the function was.
+      """
+      result = ErrorCode.OK
+      hooksDirectory = Hooks.GetHooksDirectory()
+      versionManagerPath = os.path.join(SCRIPT_DIR, 'version_manager.py')
+      for hook in HOOK_NAMES:
+         hookFilePath = os.path.join(hooksDirectory, hook)
+         if (os.path.exists(hookFilePath) and not Hooks.IsInstalledHook(hookFilePath)):
+            Logger.Warning(LOG_TAG, 'Not overwriting the existing hook {0}'.format(hookFilePath))
+            result = ErrorCode.FILE_ERROR
+            continue
+         try:
+            os.makedirs(hooksDirectory, exist_ok=True)
+            AtomicFile.Write(hookFilePath, HOOK_SCRIPT.format(
+               marker=HOOK_MARKER, condition=HOOK_CONDITIONS.get(hook, ''),
+               # Git runs the hooks with sh on every platform
+               python=sys.executable.replace('\\', '/'), versionManager=versionManagerPath.replace('\\', '/'),
+               hook=hook
+            ))
+            os.chmod(hookFilePath, os.stat(hookFilePath).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+         except IOError as err:
+            Logger.Error(LOG_TAG, 'Could not install hook {0}: {1}'.format(hookFilePath, err))
+            result = ErrorCode.FILE_ERROR
+            continue
+         Logger.Info(LOG_TAG, 'Installed hook {0}'.format(hookFilePath))
+      return result
+   @staticmethod
+   def Uninstall() -> ErrorCode:
+      """
+      Remove the hooks installed by this module.
+
+      Returns:
+         An ErrorCode object telling what the outcome of calling the function was.
+      """
+      result = ErrorCode.OK
+      hooksDirectory = Hooks.GetHooksDirectory()
+      for hook in HOOK_NAMES:
+         hookFilePath = os.path.join(hooksDirectory, hook)
+         if not Hooks.IsInstalledHook(hookFilePath):
+            continue
+         try:
+            os.remove(hookFilePath)
+         except OSError as err:
+            Logger.Error(LOG_TAG, 'Could not remove hook {0}: {1}'.format(hookFilePath, err))
+            result = ErrorCode.FILE_ERROR
+            continue
+         Logger.Info(LOG_TAG, 'Removed hook {0}'.format(hookFilePath))
+      return result
+   @staticmethod
+   def Run(hook: str) -> ErrorCode:
+      """
+      Prepare the version state after a hook: the current and the previous
+      tag and hash, the release map of the tags, and the version files of
+      the output manifest in the 'Hooks' section of the config.json.
+      The runs of hooks fired in a quick succession, e.g. by a rebase,
+      wait for each other, and find the state already up to date if
+      nothing changed in between.
+
+      Args:
+         hook (str): The name of the hook which was run.
+
+      Returns:
+         An ErrorCode object telling what the outcome of calling the function was.
+      """
+      Logger.Debug(LOG_TAG, 'Preparing the version state after {0}'.format(hook))
+      with FileLock(os.path.join(Cache.GetDirectory(), LOCK_NAME)):
+         Version.PrepareState()
+         Version.GetReleaseTags()
+         manifestFilePath = Config.GetConfig().get('Hooks', dict()).get('Output manifest', '')
+         if (len(manifestFilePath) == 0):
+            return ErrorCode.OK
+         outputs = versionFileGenerator.ReadOutputManifest(manifestFilePath)
+         if (outputs == None):
+            return ErrorCode.FILE_ERROR
+         return versionFileGenerator.GenerateVersionFilesShared(outputs)
+
+def HandleCommand(argv: list, argc: int) -> ErrorCode:
+   """
+   Handle a command given to this module
+
+   Args:
+      argv (list): The given arguments.
+      argc (int): The count of given arguments
+
+   Returns:
+      An ErrorCode object telling what the outcome of calling the function was.
+   """
+   HELP_MESSAGE = \
+   """
+   The Git hooks which prepare the version state in the background.
+
+   Usage:
+   version_manager.py hooks [optional] <command>
+
+   Required:
+   command  What you want to do with the hooks. Available commands:
+            install      Install the post-commit, post-checkout, post-merge
+                         and reference-transaction hooks.
+            uninstall    Remove the installed hooks.
+            run <hook>   Prepare the version state, as the hooks do.
+
+   Optional:
+   help    Print this message.
+   """
+
+   argv = argv[1:]
+   argc = len(argv)
+
+   if (argc < 1):
+      Logger.Warning(LOG_TAG, 'No command given')
+      return ErrorCode.TOO_FEW_ARGUMENTS
+   if (argv[0] == 'help'):
+      print(HELP_MESSAGE)
+      return ErrorCode.OK
+
+   try:
+      if (argv[0] == 'install'):
+         return Hooks.Install()
+      if (argv[0] == 'uninstall'):
+         return Hooks.Uninstall()
+      if (argv[0] == 'run'):
+         return Hooks.Run(argv[1] if argc > 1 else 'manual')
+   except subprocess.CalledProcessError as err:
+      Logger.Error(LOG_TAG, err)
+      return ErrorCode.COMMAND_FAILED
+
+   Logger.Warning(LOG_TAG, 'Unknown command: {0}'.format(argv[0]))
+   return ErrorCode.UNKNOWN_COMMAND
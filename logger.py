@@ -8,10 +8,14 @@ __date__ = "2020-02-02"
 __license__ = "MIT"
 __version__ = "1.0.0"
 
+import gzip
 import os
+import shutil
+import threading
 from datetime import datetime
 from enum import IntEnum, auto, unique
 
+from atomic_file import FileLock
 from config import Config
 from date import Date
 
@@ -20,8 +24,13 @@ class Logger:
    Provide an API for a logger for the program,
    which prints out logged messages to the terminal
    and saves the logged messages to a log file (if enabled in the 'config.json' and the file path is set).
+   The log file is rotated by size and age as set in the 'Rotation' section of the 'Log' settings.
    """
-   LOG_FILE = 'version_manager_{timestamp}.log'
+   LOG_FILE = 'version_manager.log'
+   SEGMENT_FILE = '{path}.{timestamp}-{microseconds:06d}'
+   DEFAULT_MAX_FILE_SIZE = 1024 * 1024
+   DEFAULT_MAX_FILE_AGE = 24
+   DEFAULT_RETAINED_FILES = 10
    LOG_MESSAGE_FORMAT = '[{level}:{timestamp}:{tag}]: {message}'
    @unique
    class LogLevel(IntEnum):
@@ -48,35 +57,131 @@ class Logger:
    }
    time = None
    logLevel = LogLevel.DEBUG
+   # The age of the log file is checked on the first message of a run
+   checkRotation = True
    @staticmethod
    def Init():
       Logger.time = Date.Now()
+      Logger.checkRotation = True
       config = Config.GetConfig()
       Logger.logLevel = Logger.StringsToLogLevels.get(
          config['Log']['Log level'], Logger.LogLevel.DEBUG
       )
    @staticmethod
+   def GetLogFilePath() -> str:
+      """
+      Get the path to the shared log file from the config.json.
+
+      Returns:
+         The path to the log file.
+      """
+      config = Config.GetConfig()
+      return os.path.join(config['Log']['File path'], config['Log'].get('File name', Logger.LOG_FILE))
+   @staticmethod
+   def GetRotationSettings() -> dict:
+      """
+      Get the log rotation settings from the config.json.
+
+      Returns:
+         The 'Rotation' section of the 'Log' settings as a dict.
+      """
+      return Config.GetConfig()['Log'].get('Rotation', dict())
+   @staticmethod
+   def NeedsRotation(logFilePath: str) -> bool:
+      """
+      Check whether the log file has grown too big or too old.
+
+      Args:
+         logFilePath (str): The path to the log file.
+
+      Returns:
+         True if the log file should be rotated.
+      """
+      settings = Logger.GetRotationSettings()
+      try:
+         if (os.path.getsize(logFilePath) >= settings.get('Max file size bytes', Logger.DEFAULT_MAX_FILE_SIZE)):
+            return True
+         # The age of the file is the timestamp of its first message
+         with open(logFilePath, 'r') as logFile:
+            firstTimestamp = logFile.readline().split(':', 2)[1]
+         age = Date.Now() - Date.ConvertStringToDate(firstTimestamp)
+         return age.total_seconds() >= settings.get('Max file age hours', Logger.DEFAULT_MAX_FILE_AGE) * 3600
+      except (OSError, IndexError, ValueError):
+         return False
+   @staticmethod
+   def Rotate(logFilePath: str):
+      """
+      Move the log file aside as a rotated segment, if it still needs
+      rotation once no other process is rotating it. The segment is
+      compressed and old segments are removed on a background thread.
+
+      Args:
+         logFilePath (str): The path to the log file.
+      """
+      with FileLock(logFilePath):
+         if not Logger.NeedsRotation(logFilePath):
+            return
+         now = Date.Now()
+         segmentPath = Logger.SEGMENT_FILE.format(
+            path=logFilePath, timestamp=Date.ConvertDateToString(now), microseconds=now.microsecond
+         )
+         os.replace(logFilePath, segmentPath)
+      worker = threading.Thread(target=Logger.CompressAndPrune, args=(logFilePath, segmentPath))
+      worker.start()
+   @staticmethod
+   def CompressAndPrune(logFilePath: str, segmentPath: str):
+      """
+      Compress a rotated segment, if enabled, and remove the
+      oldest segments beyond the retained count.
+
+      Args:
+         logFilePath (str): The path to the log file.
+         segmentPath (str): The path to the rotated segment.
+      """
+      settings = Logger.GetRotationSettings()
+      try:
+         if (settings.get('Compress', True)):
+            with open(segmentPath, 'rb') as segmentFile, gzip.open(segmentPath + '.gz', 'wb') as compressedFile:
+               shutil.copyfileobj(segmentFile, compressedFile)
+            os.remove(segmentPath)
+         directory = os.path.dirname(os.path.abspath(logFilePath))
+         prefix = os.path.basename(logFilePath) + '.'
+         # The timestamps in the segment names sort from the oldest to the newest
+         segments = sorted(
+            fileName for fileName in os.listdir(directory)
+            if fileName.startswith(prefix) and not fileName.endswith('.lock')
+         )
+         retained = settings.get('Retained files', Logger.DEFAULT_RETAINED_FILES)
+         for fileName in segments[:max(len(segments) - retained, 0)]:
+            os.remove(os.path.join(directory, fileName))
+      except OSError as err:
+         print(err)
+   @staticmethod
    def LogToFile(message: str):
       """
       Log a given message to the log file path
       specified in the config.json.
+      The log file is shared by all the runs, and rotated
+      when it grows too big or too old.
 
       Args:
          message (str): The message to log to file.
 
       """
-      logFileName = Logger.LOG_FILE.format(timestamp=Logger.time)
-      config = Config.GetConfig()
-      logFilePath = config['Log']['File path']
-      logFilePath = os.path.join(logFilePath, logFileName)
-      fileOpenType = 'w+'
-      if (os.path.exists(logFileName)):
-         fileOpenType = 'a+'
+      logFilePath = Logger.GetLogFilePath()
       try:
-         os.makedirs(os.path.dirname(logFilePath))
-         logFile = open(logFilePath, fileOpenType)
-         logFile.write(message + '\n')
-         logFile.close
+         logFileDirectory = os.path.dirname(logFilePath)
+         if logFileDirectory:
+            os.makedirs(logFileDirectory, exist_ok=True)
+         if (Logger.checkRotation):
+            Logger.checkRotation = False
+            if Logger.NeedsRotation(logFilePath):
+               Logger.Rotate(logFilePath)
+         with open(logFilePath, 'a') as logFile:
+            logFile.write(message + '\n')
+            size = logFile.tell()
+         if (size >= Logger.GetRotationSettings().get('Max file size bytes', Logger.DEFAULT_MAX_FILE_SIZE)):
+            Logger.Rotate(logFilePath)
       except IOError as err:
          print(err)
    @staticmethod
@@ -116,7 +221,7 @@ class Logger:
          message=message
       )
       config = Config.GetConfig()
-      if (config['Log']['File logging enabled'] and Logger.logLevel >= Logger.LogLevel.WARNING):
+      if (config['Log']['File logging enabled'] and Logger.logLevel <= Logger.LogLevel.WARNING):
          Logger.LogToFile(logMessage)
       print(logMessage)
    @staticmethod
@@ -136,7 +241,7 @@ class Logger:
          message=message
       )
       config = Config.GetConfig()
-      if (config['Log']['File logging enabled'] and Logger.logLevel >= Logger.LogLevel.INFO):
+      if (config['Log']['File logging enabled'] and Logger.logLevel <= Logger.LogLevel.INFO):
          Logger.LogToFile(logMessage)
       print(logMessage)
    @staticmethod
@@ -156,6 +261,6 @@ class Logger:
          message=message
       )
       config = Config.GetConfig()
-      if (config['Log']['File logging enabled'] and Logger.logLevel >= Logger.LogLevel.DEBUG):
+      if (config['Log']['File logging enabled'] and Logger.logLevel <= Logger.LogLevel.DEBUG):
          Logger.LogToFile(logMessage)
       print(logMessage)
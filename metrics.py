@@ -0,0 +1,155 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Saku Rautio"
+__email__ = "sakupetterirautio@gmail.com"
+__date__ = "2020-02-02"
+
+__license__ = "MIT"
+__version__ = "1.0.0"
+
+"""
+This module collects metrics of a run of the program and
+exports them to a Prometheus node exporter textfile.
+"""
+
+import json
+import threading
+import time
+
+from atomic_file import AtomicFile, FileLock
+from config import Config
+from error_code import ErrorCode
+from logger import Logger
+LOG_TAG = "Metrics"
+
+class Metrics:
+   """
+   Collect the metrics of the current run, and add them to
+   the cumulative metrics in the textfile set in the 'Metrics'
+   section of the config.json when the run ends.
+
+   The cumulative values are kept as JSON in the textfile's
+   lock file, so concurrent runs never lose each other's counts.
+   """
+   PREFIX = 'version_manager_'
+   DURATION_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0]
+   # The counters which are collected during a run, and their help texts
+   RUN_COUNTERS = {
+      'git_commands_total': 'Git subprocesses started.',
+      'git_seconds_total': 'Time spent waiting for Git subprocesses.',
+      'commits_parsed_total': 'Commits parsed from Git output.',
+      'rendered_bytes_total': 'Bytes rendered from templates.',
+      'emails_sent_total': 'Emails delivered to the mail server.'
+   }
+   RUNS_HELP = 'Runs of the version manager by command and exit code.'
+   DURATION_HELP = 'Wall time of the runs of the version manager by command.'
+   LAST_RUN_HELP = 'Unix time of the last run of the version manager by command.'
+   counters = dict()
+   lock = threading.Lock()
+   @staticmethod
+   def Add(name: str, value: float = 1):
+      """
+      Add to a counter of the current run.
+
+      Args:
+         name (str): The name of the counter, one of Metrics.RUN_COUNTERS.
+         value (float): The amount to add.
+      """
+      with Metrics.lock:
+         Metrics.counters[name] = Metrics.counters.get(name, 0) + value
+   @staticmethod
+   def FormatLabels(labels: dict) -> str:
+      """
+      Format labels in the Prometheus text format, e.g. '{command="generate"}'.
+      """
+      return '{' + ','.join(
+         '{0}="{1}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+         for name, value in sorted(labels.items())
+      ) + '}'
+   @staticmethod
+   def Update(state: dict, command: str, result: ErrorCode, wallTime: float):
+      """
+      Add the metrics of the current run to the cumulative metrics.
+      """
+      commandLabels = Metrics.FormatLabels({'command': command})
+      runLabels = Metrics.FormatLabels({'command': command, 'code': result.name})
+      counters = state.setdefault('counters', dict())
+      runs = counters.setdefault('runs_total', dict())
+      runs[runLabels] = runs.get(runLabels, 0) + 1
+      for name in Metrics.RUN_COUNTERS:
+         values = counters.setdefault(name, dict())
+         values[commandLabels] = values.get(commandLabels, 0) + Metrics.counters.get(name, 0)
+      histogram = state.setdefault('duration', dict()).setdefault(
+         commandLabels, {'buckets': [0] * len(Metrics.DURATION_BUCKETS), 'sum': 0, 'count': 0}
+      )
+      for index, bound in enumerate(Metrics.DURATION_BUCKETS):
+         if (wallTime <= bound):
+            histogram['buckets'][index] += 1
+      histogram['sum'] += wallTime
+      histogram['count'] += 1
+      state.setdefault('last_run', dict())[commandLabels] = time.time()
+   @staticmethod
+   def Render(state: dict) -> str:
+      """
+      Render the cumulative metrics in the Prometheus text format.
+      """
+      lines = list()
+      def AddMetric(name: str, metricType: str, helpText: str):
+         lines.append('# HELP {0}{1} {2}'.format(Metrics.PREFIX, name, helpText))
+         lines.append('# TYPE {0}{1} {2}'.format(Metrics.PREFIX, name, metricType))
+      counters = state.get('counters', dict())
+      AddMetric('runs_total', 'counter', Metrics.RUNS_HELP)
+      for labels, value in sorted(counters.get('runs_total', dict()).items()):
+         lines.append('{0}runs_total{1} {2}'.format(Metrics.PREFIX, labels, value))
+      for name, helpText in Metrics.RUN_COUNTERS.items():
+         AddMetric(name, 'counter', helpText)
+         for labels, value in sorted(counters.get(name, dict()).items()):
+            lines.append('{0}{1}{2} {3}'.format(Metrics.PREFIX, name, labels, value))
+      AddMetric('run_duration_seconds', 'histogram', Metrics.DURATION_HELP)
+      for labels, histogram in sorted(state.get('duration', dict()).items()):
+         bounds = list(map(str, Metrics.DURATION_BUCKETS)) + ['+Inf']
+         for bound, count in zip(bounds, histogram['buckets'] + [histogram['count']]):
+            bucketLabels = labels[:-1] + ',le="' + bound + '"}'
+            lines.append('{0}run_duration_seconds_bucket{1} {2}'.format(Metrics.PREFIX, bucketLabels, count))
+         lines.append('{0}run_duration_seconds_sum{1} {2}'.format(Metrics.PREFIX, labels, histogram['sum']))
+         lines.append('{0}run_duration_seconds_count{1} {2}'.format(Metrics.PREFIX, labels, histogram['count']))
+      AddMetric('last_run_timestamp_seconds', 'gauge', Metrics.LAST_RUN_HELP)
+      for labels, value in sorted(state.get('last_run', dict()).items()):
+         lines.append('{0}last_run_timestamp_seconds{1} {2}'.format(Metrics.PREFIX, labels, value))
+      return '\n'.join(lines) + '\n'
+   @staticmethod
+   def Write(command: str, result: ErrorCode, wallTime: float) -> ErrorCode:
+      """
+      Add the metrics of the current run to the textfile,
+      if the metrics are enabled in the config.json.
+
+      Args:
+         command (str): The command of the run.
+         result (ErrorCode): The exit code of the run.
+         wallTime (float): The wall time of the run in seconds.
+
+      Returns:
+         An error code from the ErrorCode class.
+      """
+      settings = Config.GetConfig().get('Metrics', dict())
+      if not settings.get('Enabled', False):
+         return ErrorCode.OK
+      textfilePath = settings.get('Textfile path')
+      if (not isinstance(textfilePath, str) or len(textfilePath) == 0):
+         Logger.Error(LOG_TAG, 'Metrics are enabled, but no "Textfile path" is set in the config.json')
+         return ErrorCode.INVALID_ARGUMENT
+      try:
+         with FileLock(textfilePath) as lock:
+            try:
+               state = json.loads(lock.ReadContent())
+            except ValueError:
+               state = dict()
+            Metrics.Update(state, command, result, wallTime)
+            Metrics.counters.clear()
+            AtomicFile.Write(textfilePath, Metrics.Render(state))
+            lock.WriteContent(json.dumps(state))
+      except IOError as err:
+         Logger.Error(LOG_TAG, 'Could not write metrics: {0}'.format(err))
+         return ErrorCode.FILE_ERROR
+      return ErrorCode.OK
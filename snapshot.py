@@ -0,0 +1,223 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Saku Rautio"
+__email__ = "sakupetterirautio@gmail.com"
+__date__ = "2020-02-02"
+
+__license__ = "MIT"
+__version__ = "1.0.0"
+
+"""
+This module exports the resolved version state of a repository into a
+snapshot file, and loads a snapshot for the other commands to answer
+from. A CI pipeline exports the snapshot in its first stage, and the
+later stages pass '--snapshot <file>' to skip Git and get the same
+answers as the first stage.
+"""
+
+import hashlib
+import json
+import subprocess
+
+from atomic_file import AtomicFile
+from date import Date
+from error_code import ErrorCode
+from git import Commit, Git, User
+from logger import Logger
+LOG_TAG = "Snapshot"
+from version import Version
+
+class Snapshot:
+   """
+   The snapshot file is a JSON object of:
+      'format': SNAPSHOT_FORMAT, to tell snapshots from other files.
+      'formatVersion': The version of the format.
+      'created': The time of the export.
+      'state': The 'currentTag', 'previousTag', 'currentHash' and 'previousHash'.
+      'version': The fields of the current version.
+      'tags': The tag names to the hashes of their commits.
+      'ranges': The exported commit ranges, each a dict of the 'newer' and
+                'older' commit ids as given and as hashes, the Version.RangeMode
+                name of the range as 'mode', whether the commits have their
+                changed paths as 'withPaths', and the 'commits'.
+   """
+   SNAPSHOT_FORMAT = 'version_manager snapshot'
+   FORMAT_VERSION = 1
+   DEFAULT_RANGE = ('HEAD', 'HEAD~1')
+   @staticmethod
+   def CommitToDict(commit: Commit) -> dict:
+      """
+      Convert a commit into its form in the snapshot.
+      """
+      return {
+         'hash': commit.hash,
+         'author': {'name': commit.author.name, 'email': commit.author.email},
+         'date': commit.date.strftime(Date.GIT_STRING_FORMAT),
+         'title': commit.title,
+         'message': commit.message,
+         'paths': commit.paths
+      }
+   @staticmethod
+   def DictToCommit(commitDict: dict) -> Commit:
+      """
+      Convert a commit of the snapshot back into a commit.
+      """
+      commit = Commit()
+      commit.hash = commitDict['hash']
+      user = User()
+      user.name = commitDict['author']['name']
+      user.email = commitDict['author']['email']
+      commit.author = user
+      commit.date = Date.ConvertGitStringToDate(commitDict['date'])
+      commit.title = commitDict['title']
+      commit.message = commitDict['message']
+      commit.trailers = Version.ParseTrailers(commit.message)
+      commit.paths = commitDict['paths']
+      return commit
+   @staticmethod
+   def Export(snapshotFilePath: str, ranges: list) -> ErrorCode:
+      """
+      Resolve the version state and write it to a snapshot file.
+
+      Args:
+         snapshotFilePath (str): The path to the snapshot file.
+         ranges (list): The (newer, older) commit id pairs of the commit ranges to export.
+
+      Returns:
+         An ErrorCode object telling what the outcome of calling the function was.
+      """
+      try:
+         state = dict(Version.PrepareState())
+         state.pop('fingerprint', None)
+         snapshot = {
+            'format': Snapshot.SNAPSHOT_FORMAT,
+            'formatVersion': Snapshot.FORMAT_VERSION,
+            'created': Date.NowAsString(),
+            'state': state,
+            'version': None,
+            'tags': Version.GetTagCommits(),
+            'ranges': list()
+         }
+         if ('currentTag' in state):
+            version = Version.GenerateVersionFromString(state['currentTag'])
+            snapshot['version'] = {
+               'major': version.major, 'minor': version.minor, 'bug': version.bug,
+               'stage': version.stage.name, 'stageRev': version.stageRev
+            }
+         for newer, older in ranges:
+            hashes = Git.Run(['rev-parse', newer + '^{commit}', older + '^{commit}']).split()
+            snapshot['ranges'].append({
+               'newer': newer, 'older': older, 'newerHash': hashes[0], 'olderHash': hashes[1],
+               'mode': Version.RangeMode.SYMMETRIC.name, 'withPaths': True,
+               'commits': list(map(Snapshot.CommitToDict, Version.GetCommitsBetweenIds(newer, older, True)))
+            })
+      except subprocess.CalledProcessError as err:
+         Logger.Error(LOG_TAG, err)
+         return ErrorCode.COMMAND_FAILED
+      except ValueError as err:
+         Logger.Error(LOG_TAG, 'Not a version tag: {0}'.format(err))
+         return ErrorCode.INVALID_ARGUMENT
+      try:
+         AtomicFile.Write(snapshotFilePath, json.dumps(snapshot, indent=3))
+      except IOError as err:
+         Logger.Error(LOG_TAG, 'Could not write snapshot: {0}'.format(err))
+         return ErrorCode.FILE_ERROR
+      Logger.Info(LOG_TAG, 'Exported the snapshot of {0} to {1}'.format(state.get('currentTag'), snapshotFilePath))
+      return ErrorCode.OK
+   @staticmethod
+   def Load(snapshotFilePath: str) -> ErrorCode:
+      """
+      Load a snapshot file, so that the version state is read from it instead of Git.
+      Git is disabled, so what is not in the snapshot, e.g. a commit range
+      which was not exported, fails with a GitUnavailableError.
+
+      Args:
+         snapshotFilePath (str): The path to the snapshot file.
+
+      Returns:
+         An ErrorCode object telling what the outcome of calling the function was.
+      """
+      try:
+         with open(snapshotFilePath, 'rb') as snapshotFile:
+            content = snapshotFile.read()
+         snapshot = json.loads(content.decode('utf-8'))
+         if (snapshot.get('format') != Snapshot.SNAPSHOT_FORMAT or snapshot.get('formatVersion') != Snapshot.FORMAT_VERSION):
+            Logger.Error(LOG_TAG, 'Not a snapshot of format version {0}: {1}'.format(Snapshot.FORMAT_VERSION, snapshotFilePath))
+            return ErrorCode.FILE_ERROR
+         ranges = dict()
+         for commitRange in snapshot['ranges']:
+            commits = list(map(Snapshot.DictToCommit, commitRange['commits']))
+            # A range is found by the commit ids it was exported with, or by their hashes,
+            # and the commits with their paths also answer a query without the paths
+            mode = commitRange.get('mode', Version.RangeMode.SYMMETRIC.name)
+            for withPaths in set([False, bool(commitRange.get('withPaths', True))]):
+               ranges[(commitRange['newer'], commitRange['older'], mode, withPaths)] = commits
+               ranges[(commitRange['newerHash'], commitRange['olderHash'], mode, withPaths)] = commits
+      except (IOError, ValueError, KeyError, TypeError, AttributeError) as err:
+         Logger.Error(LOG_TAG, 'Could not read snapshot: {0}'.format(err))
+         return ErrorCode.FILE_ERROR
+      Version.snapshot = {
+         'state': snapshot['state'], 'tags': snapshot['tags'], 'ranges': ranges,
+         # Stands for the Git state in the keys of generated outputs
+         'key': hashlib.sha1(content).hexdigest()
+      }
+      Git.Disable('with a snapshot')
+      Logger.Debug(LOG_TAG, 'Answering from the snapshot {0} of {1}'.format(snapshotFilePath, snapshot['created']))
+      return ErrorCode.OK
+
+def HandleCommand(argv: list, argc: int) -> ErrorCode:
+   """
+   Handle a command given to this module
+
+   Args:
+      argv (list): The given arguments.
+      argc (int): The count of given arguments
+
+   Returns:
+      An ErrorCode object telling what the outcome of calling the function was.
+   """
+   HELP_MESSAGE = \
+   """
+   The snapshots of the version state, for sharing it between the stages of a pipeline.
+
+   Usage:
+   version_manager.py snapshot [optional] <command> [args]
+   version_manager.py --snapshot <file> <command> [args]
+
+   Required:
+   command  What you want to do with a snapshot. Available commands:
+            export <file> [<newer> <older> ...]   Write the current and previous tag
+                                                  and hash, the tags and the commits
+                                                  of the ranges (HEAD~1...HEAD by
+                                                  default) to a snapshot file.
+
+   Optional:
+   help    Print this message.
+   --snapshot <file>   Given with any command, answer the version
+                       state from the snapshot file instead of Git.
+                       A command which needs more than the snapshot
+                       fails instead of running Git.
+   """
+
+   argv = argv[1:]
+   argc = len(argv)
+
+   if (argc < 1):
+      Logger.Warning(LOG_TAG, 'No command given')
+      return ErrorCode.TOO_FEW_ARGUMENTS
+   if (argv[0] == 'help'):
+      print(HELP_MESSAGE)
+      return ErrorCode.OK
+   if (argv[0] == 'export'):
+      if (argc < 2):
+         Logger.Warning(LOG_TAG, 'Missing arguments')
+         return ErrorCode.TOO_FEW_ARGUMENTS
+      if (argc % 2):
+         Logger.Error(LOG_TAG, 'Unpaired argument, every range needs a newer and an older commit: {0}'.format(argv[-1]))
+         return ErrorCode.INVALID_ARGUMENT
+      ranges = list(zip(argv[2::2], argv[3::2])) or [Snapshot.DEFAULT_RANGE]
+      return Snapshot.Export(argv[1], ranges)
+
+   Logger.Warning(LOG_TAG, 'Unknown command: {0}'.format(argv[0]))
+   return ErrorCode.UNKNOWN_COMMAND
@@ -0,0 +1,232 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Saku Rautio"
+__email__ = "sakupetterirautio@gmail.com"
+__date__ = "2020-02-02"
+
+__license__ = "MIT"
+__version__ = "1.0.0"
+
+"""
+This module compiles the templates of the version file generator
+('${major}') and the emailer ('{title}') into literal segments and
+placeholders once, so rendering only joins the segments and the values.
+The compiled templates are cached in memory and in the repository
+cache, keyed by the hash of the template content.
+"""
+
+import glob
+import hashlib
+import os
+import string
+import subprocess
+import threading
+from enum import IntEnum, unique
+
+from cache import Cache
+from logger import Logger
+LOG_TAG = "TemplateCache"
+
+class CompiledTemplate:
+   """
+   A template compiled into alternating literal segments and placeholders.
+
+   Attributes:
+      segments (list): The literal segments and the placeholder names, with the
+                       literals at the even and the names at the odd positions.
+      sources (list): The original text of each placeholder, rendered for a missing value.
+   """
+   def __init__(self, segments: list, sources: list):
+      self.segments = segments
+      self.sources = sources
+   def GetNames(self) -> set:
+      """
+      Get the placeholder names of the template.
+      """
+      return set(self.segments[1::2])
+   def Render(self, values: dict) -> str:
+      """
+      Render the template. A placeholder without a value is left as it is.
+
+      Args:
+         values (dict): The placeholder names to their values.
+
+      Returns:
+         The rendered text.
+      """
+      parts = list(self.segments)
+      for position in range(1, len(parts), 2):
+         name = parts[position]
+         parts[position] = str(values[name]) if name in values else self.sources[position // 2]
+      return ''.join(parts)
+
+class TemplateCache:
+   """
+   Compile templates once per process, and once per template content
+   across processes through the repository cache.
+   """
+   @unique
+   class Syntax(IntEnum):
+      """The placeholder syntaxes of the templates.
+      """
+      DOLLAR = 0,
+      FORMAT = 1
+   CACHE_NAME = 'template_{key}'
+   # The most compiled templates kept in the repository cache, the least recently used are removed
+   MAX_CACHED_TEMPLATES = 64
+   compiled = dict()
+   lock = threading.Lock()
+   # Cleared when there is no repository to cache in
+   diskCacheEnabled = True
+   @staticmethod
+   def CompileDollar(text: str) -> CompiledTemplate:
+      """
+      Compile a template with string.Template placeholders, '$name' and '${name}'.
+      '$$' is a literal '$', and a '$' which starts no placeholder is kept as it is.
+      """
+      segments = list()
+      sources = list()
+      literal = list()
+      end = 0
+      for match in string.Template.pattern.finditer(text):
+         literal.append(text[end:match.start()])
+         end = match.end()
+         if (match.group('escaped') != None):
+            literal.append(string.Template.delimiter)
+            continue
+         name = match.group('named') or match.group('braced')
+         if (name == None):
+            literal.append(match.group(0))
+            continue
+         segments.append(''.join(literal))
+         segments.append(name)
+         sources.append(match.group(0))
+         literal = list()
+      literal.append(text[end:])
+      segments.append(''.join(literal))
+      return CompiledTemplate(segments, sources)
+   @staticmethod
+   def CompileFormat(text: str) -> CompiledTemplate:
+      """
+      Compile a template with str.format placeholders, '{name}'.
+      '{{' and '}}' are literal braces.
+
+      Raises:
+         ValueError: If the template has positional, indexed or formatted placeholders.
+      """
+      segments = list()
+      sources = list()
+      literal = list()
+      for literalText, name, formatSpec, conversion in string.Formatter().parse(text):
+         literal.append(literalText)
+         if (name == None):
+            continue
+         if (not name.isidentifier() or formatSpec or conversion):
+            raise ValueError('Unsupported placeholder {{{0}}}'.format(name))
+         segments.append(''.join(literal))
+         segments.append(name)
+         sources.append('{' + name + '}')
+         literal = list()
+      segments.append(''.join(literal))
+      return CompiledTemplate(segments, sources)
+   @staticmethod
+   def Get(text: str, syntax, names: list) -> CompiledTemplate:
+      """
+      Get a compiled template, compiling it only if no
+      template of the same content was compiled before.
+      A '$' template may use other placeholders than the given names,
+      e.g. the '${CMAKE_CURRENT_LIST_DIR}' of a CMake file, which are
+      rendered as they are, like string.Template.safe_substitute does.
+
+      Args:
+         text (str): The template.
+         syntax (TemplateCache.Syntax): The placeholder syntax of the template.
+         names (list): The placeholder names the template may use.
+
+      Returns:
+         The compiled template.
+
+      Raises:
+         ValueError: If the template is invalid, or a '{}' template uses an unknown placeholder.
+      """
+      key = hashlib.sha256('{0}\n{1}'.format(int(syntax), text).encode('utf-8')).hexdigest()
+      with TemplateCache.lock:
+         template = TemplateCache.compiled.get(key)
+      if (template == None):
+         template = TemplateCache.LoadCompiled(key)
+      if (template == None):
+         if (syntax == TemplateCache.Syntax.DOLLAR):
+            template = TemplateCache.CompileDollar(text)
+         else:
+            template = TemplateCache.CompileFormat(text)
+         TemplateCache.SaveCompiled(key, template)
+      with TemplateCache.lock:
+         TemplateCache.compiled[key] = template
+
+      unknownNames = template.GetNames() - set(names)
+      if (len(unknownNames) and syntax == TemplateCache.Syntax.DOLLAR):
+         Logger.Debug(LOG_TAG, 'Leaving placeholders as they are: {0}'.format(', '.join(sorted(unknownNames))))
+      elif (len(unknownNames)):
+         raise ValueError('Unknown placeholders: {0}'.format(', '.join(sorted(unknownNames))))
+      return template
+   @staticmethod
+   def LoadCompiled(key: str) -> CompiledTemplate:
+      """
+      Load a compiled template from the repository cache.
+
+      Returns:
+         The compiled template, or None if it is not cached or there is no repository.
+      """
+      if not TemplateCache.diskCacheEnabled:
+         return None
+      try:
+         cached = Cache.Load(TemplateCache.CACHE_NAME.format(key=key))
+      except (subprocess.CalledProcessError, OSError):
+         TemplateCache.diskCacheEnabled = False
+         return None
+      if (cached == None):
+         return None
+      try:
+         # Marks the template as recently used, see RemoveUnused
+         os.utime(Cache.GetPath(TemplateCache.CACHE_NAME.format(key=key)))
+      except OSError:
+         pass
+      return CompiledTemplate(cached['segments'], cached['sources'])
+   @staticmethod
+   def SaveCompiled(key: str, template: CompiledTemplate):
+      """
+      Save a compiled template to the repository cache, if there is a repository.
+      """
+      if not TemplateCache.diskCacheEnabled:
+         return
+      try:
+         Cache.Save(TemplateCache.CACHE_NAME.format(key=key), {
+            'segments': template.segments,
+            'sources': template.sources
+         })
+      except (subprocess.CalledProcessError, OSError) as err:
+         TemplateCache.diskCacheEnabled = False
+         Logger.Debug(LOG_TAG, 'Not caching the template: {0}'.format(err))
+         return
+      TemplateCache.RemoveUnused()
+   @staticmethod
+   def RemoveUnused():
+      """
+      Remove the least recently used compiled templates from the repository
+      cache, so that it keeps at most MAX_CACHED_TEMPLATES of them however
+      many template contents were ever compiled.
+      """
+      pattern = Cache.GetPath(TemplateCache.CACHE_NAME.format(key='*'))
+      cachedFilePaths = list()
+      for cachedFilePath in glob.glob(pattern):
+         try:
+            cachedFilePaths.append((os.path.getmtime(cachedFilePath), cachedFilePath))
+         except OSError:
+            continue
+      cachedFilePaths.sort(reverse=True)
+      for _, cachedFilePath in cachedFilePaths[TemplateCache.MAX_CACHED_TEMPLATES:]:
+         try:
+            os.remove(cachedFilePath)
+         except OSError as err:
+            Logger.Debug(LOG_TAG, 'Could not remove the cached template {0}: {1}'.format(cachedFilePath, err))
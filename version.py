@@ -18,16 +18,28 @@ argument based on the template file 'version_file.template'.
 Example tag: 1.2.1-rc.3
 """
 
+import base64
+import hashlib
+import mmap
+import os
+import re
 import subprocess
+import threading
+import zlib
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from enum import IntEnum, unique
 from string import Template
 
 import numpy
 
+from cache import Cache
 from date import Date
 from error_code import ErrorCode
-from git import Commit, User
+from git import Commit, Git, GitUnavailableError, User
 from logger import Logger
+from metrics import Metrics
 
 LOG_TAG = "Version"
 
@@ -51,6 +63,59 @@ class Version:
         RELEASE_CANDIDATE = 2,
         ALPHA = 3,
         BETA = 4
+    @unique
+    class TagPushStatus(IntEnum):
+        """The outcomes of pushing a single tag.
+        """
+        PUSHED = 0,
+        UP_TO_DATE = 1,
+        REJECTED = 2,
+        FAILED = 3
+    @unique
+    class RangeMode(IntEnum):
+        """The commits selected by a range from an older to a newer commit.
+        """
+        # 'newer...older', the commits of either side which are not in both
+        SYMMETRIC = 0,
+        # 'older..newer', the commits of the newer side which are not in the older
+        EXCLUSIVE = 1,
+        # 'older..newer' along the first parents only, e.g. the merges to a mainline
+        FIRST_PARENT = 2
+    RangeModeStringsToRangeModes = {
+        'symmetric': RangeMode.SYMMETRIC,
+        'exclusive': RangeMode.EXCLUSIVE,
+        'first-parent': RangeMode.FIRST_PARENT
+    }
+    PushFlagsToTagPushStatuses = {
+        ' ': TagPushStatus.PUSHED,
+        '+': TagPushStatus.PUSHED,
+        '*': TagPushStatus.PUSHED,
+        '=': TagPushStatus.UP_TO_DATE,
+        '!': TagPushStatus.REJECTED
+    }
+    REMOTE_TAGS_CACHE = 'remote_tags_{remote}'
+    RELEASE_TAGS_CACHE = 'release_tags'
+    # The Git state prepared in the background by the hooks, see hooks.py
+    PREPARED_STATE_CACHE = 'prepared_state'
+    preparedState = None
+    preparedLock = threading.Lock()
+    # The version state loaded from a snapshot file, see snapshot.py, which is answered from instead of Git
+    snapshot = None
+    # The remote which the missing history of a shallow clone is fetched from
+    shallowRemote = 'origin'
+    isShallow = None
+    tagsFetched = False
+    availableRevisions = set()
+    shallowLock = threading.Lock()
+    # Hash, author name, author email, author date, title and message of a
+    # commit, separated by ASCII unit separators and ended by a record separator
+    LOG_FIELD_SEPARATOR = '\x1f'
+    LOG_RECORD_SEPARATOR = '\x1e'
+    LOG_FORMAT = '%H%x1f%an%x1f%ae%x1f%ad%x1f%s%x1f%b%x1e'
+    # The same fields with the changed paths of 'git log --name-only' as the last field.
+    # The record separator comes first, as Git prints the paths after the format.
+    LOG_PATHS_FORMAT = '%x1e%H%x1f%an%x1f%ae%x1f%ad%x1f%s%x1f%b%x1f'
+    TRAILER_PATTERN = re.compile(r'^([A-Za-z0-9][A-Za-z0-9-]*):\s*(.*)$')
     StageStringsToStages = {
         'dev': Stage.DEVELOPMENT,
         'rel': Stage.RELEASE,
@@ -58,6 +123,16 @@ class Version:
         'alpha': Stage.ALPHA,
         'beta': Stage.BETA
     }
+    # The order of the stages from the earliest to the latest in a release cycle.
+    # A version without a stage counts as a release.
+    StagesToPrecedences = {
+        Stage.DEVELOPMENT: 0,
+        Stage.ALPHA: 1,
+        Stage.BETA: 2,
+        Stage.RELEASE_CANDIDATE: 3,
+        Stage.RELEASE: 4,
+        Stage.UNKNOWN: 4
+    }
     def __init__(self):
         self.major = -1
         self.minor = -1
@@ -72,6 +147,230 @@ class Version:
         asDict['stage'] = self.stage
         asDict['stageRev'] = self.stageRev
         return '{0}'.format(asDict)
+    def GetSortKey(self) -> tuple:
+        """
+        Get a key which sorts versions from the oldest to the newest.
+        Missing numbers count as zero.
+
+        Returns:
+            The sort key.
+        """
+        return (
+            max(self.major, 0), max(self.minor, 0), max(self.bug, 0),
+            Version.StagesToPrecedences[self.stage], max(self.stageRev, 0)
+        )
+    @staticmethod
+    def GetTags() -> list:
+        """
+        Get all the tags of the repository.
+
+        Returns:
+            A list of tag names.
+        """
+        if (Version.snapshot != None):
+            return list(Version.snapshot['tags'])
+        output = Git.Run(['tag', '--list'])
+        return list(filter(None, str(output).replace('\r','').split('\n')))
+    @staticmethod
+    def GetTagCommits() -> dict:
+        """
+        Get the commits the tags of the repository point to,
+        peeling annotated tags to their commits.
+
+        Returns:
+            A dict of tag names to commit hashes.
+        """
+        if (Version.snapshot != None):
+            return dict(Version.snapshot['tags'])
+        output = Git.Run(['for-each-ref', 'refs/tags', '--format=%(refname:strip=2)%09%(objectname)%09%(*objectname)'])
+        tagCommits = dict()
+        for line in output.splitlines():
+            tag, objectName, peeledName = line.split('\t')
+            tagCommits[tag] = peeledName or objectName
+        return tagCommits
+    @staticmethod
+    def BuildReleaseTags(tagCommits: dict, revisions: list = None) -> dict:
+        """
+        Map every commit reachable from the version tags to the oldest
+        version tag which contains it, in one topological walk of the history.
+        The walk visits the children before their parents, and every commit
+        hands the oldest version containing it down to its parents.
+
+        Args:
+            tagCommits (dict): The tag names to the commits they point to.
+            revisions (list): The revisions to walk, all of the tags by default.
+
+        Returns:
+            A dict of commit hashes to tag names.
+
+        Raises:
+            subprocess.CalledProcessError: If the Git walk failed.
+        """
+        tags = VersionResolver(tagCommits.keys()).tags
+        unreleased = len(tags)
+        commitsToRanks = dict()
+        for rank, tag in enumerate(tags):
+            commit = tagCommits[tag]
+            commitsToRanks[commit] = min(commitsToRanks.get(commit, unreleased), rank)
+        releaseTags = dict()
+        if (len(tags) == 0):
+            return releaseTags
+        process = Git.StartProcess(
+            ['rev-list', '--topo-order', '--parents'] + (revisions or ['--tags']),
+            stdout=subprocess.PIPE, universal_newlines=True
+        )
+        try:
+            for line in process.stdout:
+                hashes = line.split()
+                commit = hashes[0]
+                rank = commitsToRanks.pop(commit, unreleased)
+                if (rank == unreleased):
+                    continue
+                releaseTags[commit] = tags[rank]
+                for parent in hashes[1:]:
+                    if (commitsToRanks.get(parent, unreleased) > rank):
+                        commitsToRanks[parent] = rank
+        finally:
+            process.stdout.close()
+            returnCode = process.wait()
+        if (returnCode):
+            raise subprocess.CalledProcessError(returnCode, process.args)
+        return releaseTags
+    @staticmethod
+    def GetReleaseTags() -> dict:
+        """
+        Get the map of commits to the oldest version tags containing them.
+        The map is cached in the repository, and rebuilt when the tags change.
+
+        Returns:
+            A dict of commit hashes to tag names.
+        """
+        tagCommits = Version.GetTagCommits()
+        fingerprint = hashlib.sha1(
+            '\n'.join(sorted('{0} {1}'.format(tag, commit) for tag, commit in tagCommits.items())).encode('utf-8')
+        ).hexdigest()
+        cached = Cache.Load(Version.RELEASE_TAGS_CACHE)
+        if (cached != None and cached.get('fingerprint') == fingerprint):
+            tags = cached['tags']
+            return dict((commit, tags[index]) for commit, index in cached['commits'].items())
+        releaseTags = Version.BuildReleaseTags(tagCommits)
+        # Store each tag name once, and the commits as indices to them
+        tags = sorted(set(releaseTags.values()))
+        tagIndices = dict((tag, index) for index, tag in enumerate(tags))
+        Cache.Save(Version.RELEASE_TAGS_CACHE, {
+            'fingerprint': fingerprint,
+            'tags': tags,
+            'commits': dict((commit, tagIndices[tag]) for commit, tag in releaseTags.items())
+        })
+        return releaseTags
+    @staticmethod
+    def AssignReleaseTags(commits: list, revisions: list = None) -> list:
+        """
+        Set the tag of each commit to the oldest version tag containing it.
+        Given the revisions the commits were selected with, only the version
+        tags among the commits are considered, and only those revisions are
+        walked instead of all of the history.
+
+        Args:
+            commits (list): The commits.
+            revisions (list): The revisions the commits were selected with, e.g. ['1.0.0..1.1.0'].
+
+        Returns:
+            The same commits.
+        """
+        if (revisions == None):
+            releaseTags = Version.GetReleaseTags()
+        else:
+            hashes = set(commit.hash for commit in commits)
+            releaseTags = Version.BuildReleaseTags(
+                dict((tag, commit) for tag, commit in Version.GetTagCommits().items() if commit in hashes),
+                revisions
+            )
+        for commit in commits:
+            commit.tag = releaseTags.get(commit.hash)
+        return commits
+    @staticmethod
+    def IsRevisionAvailable(revision: str, needsTag: bool) -> bool:
+        """
+        Check whether a revision, and optionally its nearest tag, is in the local history.
+        """
+        if (Git.RunProcess(['rev-parse', '--verify', '--quiet', revision + '^{commit}']).returncode):
+            return False
+        return not (needsTag and Git.RunProcess(['describe', revision, '--abbrev=0', '--tags']).returncode)
+    @staticmethod
+    def IsShallowRepository() -> bool:
+        """
+        Check whether the repository is a shallow clone, by the 'shallow'
+        file which lists its boundary commits, without running Git.
+        """
+        return os.path.exists(os.path.join(Cache.GetGitDirectories()[1], 'shallow'))
+    @staticmethod
+    def GetDeepenRefspecs(remote: str) -> list:
+        """
+        Get the refs to deepen on the remote: the branch which the current
+        branch tracks. A server only has to allow fetching its refs, not
+        fetching commits by their hashes.
+
+        Args:
+            remote (str): The remote to fetch from.
+
+        Returns:
+            A list of the tracked ref, or an empty list to fetch the refs
+            configured for the remote, e.g. when HEAD is detached.
+        """
+        try:
+            with open(os.path.join(Cache.GetGitDirectories()[0], 'HEAD'), 'r') as headFile:
+                head = headFile.read().strip()
+        except IOError:
+            return list()
+        if not head.startswith('ref:'):
+            return list()
+        output = Git.RunProcess(
+            ['for-each-ref', '--format=%(upstream:remotename)%09%(upstream:remoteref)', head.split(':', 1)[1].strip()]
+        )
+        upstream = output.stdout.decode('utf-8').strip().split('\t')
+        if (output.returncode or len(upstream) != 2 or upstream[0] != remote or len(upstream[1]) == 0):
+            return list()
+        return [upstream[1]]
+    @staticmethod
+    def EnsureHistory(revision: str, needsTag: bool = False, remote: str = None):
+        """
+        Make sure that a revision, and optionally its nearest tag, is in the
+        local history of a shallow clone, e.g. one made with '--depth 1' in CI.
+        Instead of fetching the whole history, the tag refs are fetched with
+        one commit each, and then the history of the tracked branch is deepened
+        by 1, 2, 4... commits until the revision and its nearest tag are reachable.
+        Does nothing in a complete clone.
+
+        Args:
+            revision (str): The revision which has to be available, e.g. 'HEAD~1'.
+            needsTag (bool): Whether the nearest tag of the revision has to be reachable too.
+            remote (str): The remote to fetch from, Version.shallowRemote by default.
+        """
+        if (Version.isShallow == False or (revision, needsTag) in Version.availableRevisions):
+            return
+        remote = remote or Version.shallowRemote
+        with Version.shallowLock:
+            if (Version.isShallow == None):
+                Version.isShallow = Version.IsShallowRepository()
+            if (Version.isShallow and not Version.IsRevisionAvailable(revision, needsTag)):
+                if (needsTag and not Version.tagsFetched):
+                    Logger.Info(LOG_TAG, 'Shallow clone, fetching the tags from {0}'.format(remote))
+                    Git.RunProcess(['fetch', '--no-tags', '--depth=1', remote, '+refs/tags/*:refs/tags/*'])
+                    Version.tagsFetched = True
+                refspecs = Version.GetDeepenRefspecs(remote)
+                deepenBy = 1
+                while not Version.IsRevisionAvailable(revision, needsTag):
+                    if not Version.IsShallowRepository():
+                        Logger.Warning(LOG_TAG, 'The whole history is fetched, {0} is still not available'.format(revision))
+                        break
+                    Logger.Info(LOG_TAG, 'Shallow clone, deepening the history by {0} commits'.format(deepenBy))
+                    output = Git.RunProcess(['fetch', '--no-tags', '--deepen={0}'.format(deepenBy), remote] + refspecs)
+                    if (output.returncode):
+                        Logger.Error(LOG_TAG, output.stderr)
+                        break
+                    deepenBy *= 2
+            Version.availableRevisions.add((revision, needsTag))
     @staticmethod
     def GetCurrentTag() -> str:
         """
@@ -80,7 +379,11 @@ class Version:
         Returns:
             The current tag.
         """
-        output = subprocess.check_output(['git', 'describe', 'HEAD', '--abbrev=0', '--tags']).decode('utf-8')
+        prepared = Version.GetPreparedState().get('currentTag')
+        if (prepared != None):
+            return prepared
+        Version.EnsureHistory('HEAD', True)
+        output = Git.Run(['describe', 'HEAD', '--abbrev=0', '--tags'])
         return str(output).replace('\r','').replace('\n','')
     @staticmethod
     def GetPreviousTag() -> str:
@@ -90,7 +393,11 @@ class Version:
         Returns:
             The previous tag.
         """
-        output = subprocess.check_output(['git', 'describe', 'HEAD~1', '--abbrev=0', '--tags']).decode('utf-8')
+        prepared = Version.GetPreparedState().get('previousTag')
+        if (prepared != None):
+            return prepared
+        Version.EnsureHistory('HEAD~1', True)
+        output = Git.Run(['describe', 'HEAD~1', '--abbrev=0', '--tags'])
         return str(output).replace('\r','').replace('\n','')
     @staticmethod
     def GetCurrentHash() -> str:
@@ -100,7 +407,10 @@ class Version:
         Returns:
             The hash of the current commit.
         """
-        output = subprocess.check_output(['git', 'rev-parse', '--verify', 'HEAD']).decode('utf-8')
+        prepared = Version.GetPreparedState().get('currentHash')
+        if (prepared != None):
+            return prepared
+        output = Git.Run(['rev-parse', '--verify', 'HEAD'])
         return str(output).replace('\r','').replace('\n','')
     @staticmethod
     def GetPreviousHash() -> str:
@@ -110,64 +420,322 @@ class Version:
         Returns:
             The hash of the previous commit.
         """
-        output = subprocess.check_output(['git', 'rev-parse', '--verify', 'HEAD~1']).decode('utf-8')
+        prepared = Version.GetPreparedState().get('previousHash')
+        if (prepared != None):
+            return prepared
+        Version.EnsureHistory('HEAD~1')
+        output = Git.Run(['rev-parse', '--verify', 'HEAD~1'])
         return str(output).replace('\r','').replace('\n','')
     @staticmethod
-    def GetCommitsBetweenIds(newer: str, older: str) -> list:
+    def GetGitDirectories() -> tuple:
+        """
+        Get the Git directory of the current repository and the common
+        Git directory which holds its refs (they differ for worktrees).
+
+        Returns:
+            A tuple of the absolute Git directory and the absolute common Git directory.
+        """
+        return Cache.GetGitDirectories()
+    @staticmethod
+    def GetRefsFingerprint(gitDirectory: str, commonDirectory: str, allRefs: bool = False) -> str:
+        """
+        Get a fingerprint of HEAD and the tag refs by reading the
+        Git directory directly, without running Git. The fingerprint
+        changes whenever a commit, checkout or tag changes the version state.
+
+        Args:
+            gitDirectory (str): The Git directory of the repository.
+            commonDirectory (str): The common Git directory of the repository.
+            allRefs (bool): Whether to fingerprint all of the refs, e.g. the branches, instead of only the tags.
+
+        Returns:
+            The fingerprint as a hex string.
+        """
+        fingerprint = hashlib.sha1()
+        def AddFile(path: str, withContent: bool):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return
+            fingerprint.update('{0}:{1}:{2}\n'.format(path, stat.st_mtime_ns, stat.st_size).encode('utf-8'))
+            if (withContent):
+                with open(path, 'rb') as refFile:
+                    fingerprint.update(refFile.read())
+        headPath = os.path.join(gitDirectory, 'HEAD')
+        AddFile(headPath, True)
+        try:
+            with open(headPath, 'r') as headFile:
+                head = headFile.read().strip()
+            if (head.startswith('ref:')):
+                AddFile(os.path.join(commonDirectory, head.split(':', 1)[1].strip()), True)
+        except IOError:
+            pass
+        AddFile(os.path.join(commonDirectory, 'packed-refs'), False)
+        refsDirectory = os.path.join(commonDirectory, 'refs') if allRefs else os.path.join(commonDirectory, 'refs', 'tags')
+        for directory, _, fileNames in sorted(os.walk(refsDirectory)):
+            for fileName in sorted(fileNames):
+                AddFile(os.path.join(directory, fileName), True)
+        return fingerprint.hexdigest()
+    @staticmethod
+    def GetPreparedState() -> dict:
+        """
+        Get the Git state prepared by the hooks, if it is still up to date
+        with HEAD and the tags. The state is loaded once per process.
+
+        Returns:
+            A dict of the prepared values, empty if there is no up to date state.
+            The state of a loaded snapshot is always up to date.
+        """
+        if (Version.snapshot != None):
+            return Version.snapshot['state']
+        with Version.preparedLock:
+            if (Version.preparedState == None):
+                try:
+                    # Without the hooks there is no state, and the refs are not fingerprinted
+                    state = Cache.Load(Version.PREPARED_STATE_CACHE)
+                    if (state != None and state.get('fingerprint') != Version.GetRefsFingerprint(*Version.GetGitDirectories())):
+                        state = None
+                except (subprocess.CalledProcessError, OSError):
+                    state = None
+                Version.preparedState = state or dict()
+            return Version.preparedState
+    @staticmethod
+    def PrepareState() -> dict:
+        """
+        Resolve the current and the previous tag and hash, and save them for
+        the later processes to read instead of running Git. The fingerprint is
+        taken before resolving, so a state resolved while the refs changed is
+        never taken as up to date.
+
+        Returns:
+            The prepared state.
+
+        Raises:
+            subprocess.CalledProcessError: If the Git directories could not be resolved.
+        """
+        fingerprint = Version.GetRefsFingerprint(*Version.GetGitDirectories())
+        cached = Cache.Load(Version.PREPARED_STATE_CACHE)
+        if (cached != None and cached.get('fingerprint') == fingerprint):
+            Logger.Debug(LOG_TAG, 'Prepared state is up to date')
+            return cached
+        with Version.preparedLock:
+            Version.preparedState = dict()
+        state = {'fingerprint': fingerprint}
+        resolvers = {
+            'currentTag': Version.GetCurrentTag,
+            'previousTag': Version.GetPreviousTag,
+            'currentHash': Version.GetCurrentHash,
+            'previousHash': Version.GetPreviousHash
+        }
+        for key, resolver in resolvers.items():
+            try:
+                state[key] = resolver()
+            except subprocess.CalledProcessError:
+                # E.g. no tags or no previous commit, left for the readers to resolve and report
+                pass
+        Cache.Save(Version.PREPARED_STATE_CACHE, state)
+        return state
+    @staticmethod
+    def ParseTrailers(message: str) -> list:
+        """
+        Parse the trailers of a commit message, e.g. 'Co-authored-by: Name <email>'.
+        The trailers are the last paragraph of the message, if all of its lines
+        are 'Key: value' lines or their indented continuation lines.
+
+        Args:
+            message (str): The commit message, without the title.
+
+        Returns:
+            A list of (key, value) tuples in the order of the message.
+        """
+        paragraph = message.rstrip().rsplit('\n\n', 1)[-1]
+        trailers = list()
+        for line in paragraph.split('\n'):
+            line = line.rstrip('\r')
+            if (len(trailers) and line[:1] in (' ', '\t')):
+                key, value = trailers[-1]
+                trailers[-1] = (key, value + ' ' + line.strip())
+                continue
+            match = Version.TRAILER_PATTERN.match(line)
+            if (match == None):
+                return list()
+            trailers.append((match.group(1), match.group(2).strip()))
+        return trailers
+    @staticmethod
+    def ParseCommitRecord(record: str, withPaths: bool = False) -> Commit:
+        """
+        Parse one commit record in the Version.LOG_FORMAT machine format.
+
+        Args:
+            record (str): The record, without its record separator.
+            withPaths (bool): Whether the record is in the Version.LOG_PATHS_FORMAT format.
+
+        Returns:
+            The commit, or None if the record is empty.
+        """
+        record = record.lstrip('\r\n')
+        if (len(record) < 1):
+            return None
+        if (withPaths):
+            fields = record.split(Version.LOG_FIELD_SEPARATOR, 6)
+        else:
+            fields = record.split(Version.LOG_FIELD_SEPARATOR, 5)
+        commit = Commit()
+        commit.hash = fields[0]
+        user = User()
+        user.name = fields[1]
+        user.email = fields[2]
+        commit.author = user
+        commit.date = Date.ConvertGitStringToDate(fields[3])
+        commit.title = fields[4].strip()
+        commit.message = fields[5].strip()
+        commit.trailers = Version.ParseTrailers(commit.message)
+        if (withPaths):
+            commit.paths = list(filter(None, fields[6].replace('\r', '').split('\n')))
+        return commit
+    @staticmethod
+    def ParseCommitLog(output: str, withPaths: bool = False) -> list:
+        """
+        Parse the output of 'git log' in the Version.LOG_FORMAT machine format.
+
+        Args:
+            output (str): The log output.
+            withPaths (bool): Whether the output is in the Version.LOG_PATHS_FORMAT format.
+
+        Returns:
+            A list of commits.
+        """
+        commits = list(filter(None, map(
+            lambda record: Version.ParseCommitRecord(record, withPaths),
+            output.split(Version.LOG_RECORD_SEPARATOR)
+        )))
+        Metrics.Add('commits_parsed_total', len(commits))
+        return commits
+    @staticmethod
+    def ExportCommitLog(newer: str, older: str, logFilePath: str):
+        """
+        Export the commits between two Git commits to a log file in the
+        Version.LOG_FORMAT machine format, for reading without Git with
+        Version.ReadCommitLogFile. The log is streamed straight to the file.
+
+        Args:
+            newer (str): The newer Git commit id for the comparison.
+            older (str): The older Git commit id for the comparison.
+            logFilePath (str): The path to the log file to write.
+
+        Raises:
+            subprocess.CalledProcessError: If Git failed.
+        """
+        with open(logFilePath, 'wb') as logFile:
+            process = Git.StartProcess([
+                'log', '--date=default', '--format=' + Version.LOG_FORMAT,
+                '{newer}...{older}'.format(newer=newer, older=older)
+            ], stdout=logFile)
+            if (process.wait()):
+                raise subprocess.CalledProcessError(process.returncode, process.args)
+    @staticmethod
+    def ReadCommitLogFile(logFilePath: str):
+        """
+        Read the commits of a log file in the Version.LOG_FORMAT machine format,
+        e.g. from Version.ExportCommitLog. The file is memory-mapped and
+        decoded one record at a time, so it is never loaded into memory whole.
+
+        Args:
+            logFilePath (str): The path to the log file.
+
+        Returns:
+            A generator of commits, in the order of the log file.
+
+        Raises:
+            OSError: If the log file could not be read.
+        """
+        separator = Version.LOG_RECORD_SEPARATOR.encode('utf-8')
+        with open(logFilePath, 'rb') as logFile:
+            if (os.fstat(logFile.fileno()).st_size == 0):
+                return
+            with mmap.mmap(logFile.fileno(), 0, access=mmap.ACCESS_READ) as logMap:
+                view = memoryview(logMap)
+                try:
+                    start = 0
+                    while (start < len(logMap)):
+                        end = logMap.find(separator, start)
+                        if (end < 0):
+                            end = len(logMap)
+                        commit = Version.ParseCommitRecord(str(view[start:end], 'utf-8'))
+                        start = end + len(separator)
+                        if (commit != None):
+                            Metrics.Add('commits_parsed_total')
+                            yield commit
+                finally:
+                    view.release()
+    @staticmethod
+    def GetRangeRevisions(newer: str, older: str, mode = RangeMode.SYMMETRIC) -> list:
+        """
+        Get the revisions which select a range of commits in 'git log' and 'git rev-list'.
+
+        Args:
+            newer (str): The newer Git commit id of the range.
+            older (str): The older Git commit id of the range.
+            mode (Version.RangeMode): The commits the range selects.
+
+        Returns:
+            A list of revisions.
+        """
+        if (mode == Version.RangeMode.EXCLUSIVE):
+            return ['{older}..{newer}'.format(newer=newer, older=older)]
+        if (mode == Version.RangeMode.FIRST_PARENT):
+            return ['--first-parent', '{older}..{newer}'.format(newer=newer, older=older)]
+        return ['{newer}...{older}'.format(newer=newer, older=older)]
+    @staticmethod
+    def GetCommitsBetweenIds(newer: str, older: str, withPaths: bool = False, mode = RangeMode.SYMMETRIC) -> list:
         """
         Get a list of commits between two Git commits.
         
         Args:
             newer (str): The newer Git commit id for the comparison.
             older (str): The older Git commit id for the comparison.
+            withPaths (bool): Whether to read the paths the commits changed, too.
+            mode (Version.RangeMode): The commits the range selects, by default
+                                      the commits of either side but not of both.
         
         Returns:
             A list of commits.
+
+        Raises:
+            subprocess.CalledProcessError: If the Git command failed.
+            GitUnavailableError: If a snapshot is loaded and the range is not in it.
         """
-        commits = list()
-        output = subprocess.check_output(['git', 'log', '{newer}...{older}'.format(newer=newer, older=older)]).decode('utf-8')
-        if (len(output) < 1):
-            return commits
-        commitLog = str(output).split('\n')
-        lineIndex = 0
-        while (lineIndex < len(commitLog)):
-            commitLogLine = str(commitLog[lineIndex])
-            if (commitLogLine.startswith('commit')):
-                # Commit log item startsexpression
-                commit = Commit()
-                # Get commit hash from the commit
-                commit.hash = str(commitLog[lineIndex]).split(' ')[1]
-                lineIndex = lineIndex + 1
-                # Get "Author:", "{author's name} <{author's email}>"
-                logLine = str(commitLog[lineIndex]).split(':', 1)[1].lstrip()
-                user = User()
-                user.name = logLine.split('<', 1)[0].rstrip(' ')
-                user.email = logLine.split('<', 1)[1].lstrip().replace('\r','').replace('\n','')
-                commit.author = user
-                lineIndex = lineIndex + 1
-                # Split "Date:   ", "{actual date}"
-                logLine = str(commitLog[lineIndex]).split('Date:')[1]
-                dateString = logLine = logLine.lstrip().replace('\r','').replace('\n','')
-                commit.date = Date.ConvertGitStringToDate(dateString)
-                # Skip extra line between date and commit title
-                lineIndex = lineIndex + 2
-                # Add the title to the commit but remove leading whitespace and trailing linefeed
-                commit.title = str(commitLog[lineIndex]).lstrip().replace('\r','').replace('\n','')
-                lineIndex = lineIndex + 1
-                # Skip extra line between title and commit message
-                lineIndex = lineIndex + 1
-                # Commit message lasts until another commit message starts or the log ends
-                commit.message = ""
-                while (lineIndex < len(commitLog)):
-                    if (str(commitLog[lineIndex]).startswith('commit')):
-                        break
-                    commit.message = commit.message + commitLog[lineIndex].lstrip()
-                    lineIndex = lineIndex + 1
-                commits.append(commit)
-                break
-            else:
-                lineIndex = lineIndex + 1
-        return commits
+        revisions = Version.GetRangeRevisions(newer, older, mode)
+        if (Version.snapshot != None):
+            commits = Version.snapshot['ranges'].get((newer, older, Version.RangeMode(mode).name, withPaths))
+            if (commits == None):
+                raise GitUnavailableError(
+                    ['log'] + revisions,
+                    'with a snapshot which has not got the commits{0} of the range'.format(' and paths' if withPaths else '')
+                )
+            return list(commits)
+        return Version.GetCommits(revisions, withPaths)
+    @staticmethod
+    def GetCommits(revisions: list, withPaths: bool = False) -> list:
+        """
+        Get a list of the commits selected by Git revisions,
+        e.g. ['1.0.0..1.1.0'] or ['1.0.0'] for all of the history up to 1.0.0.
+
+        Args:
+            revisions (list): The revisions and revision ranges to pass to 'git log'.
+            withPaths (bool): Whether to read the paths the commits changed, too.
+
+        Returns:
+            A list of commits.
+        """
+        if (withPaths):
+            output = Git.Run(
+                ['-c', 'core.quotePath=off', 'log', '--date=default', '--name-only', '--format=' + Version.LOG_PATHS_FORMAT]
+                + revisions + ['--']
+            )
+        else:
+            output = Git.Run(['log', '--date=default', '--format=' + Version.LOG_FORMAT] + revisions + ['--'])
+        return Version.ParseCommitLog(output, withPaths)
     @staticmethod
     def GenerateVersionFromString(versionString: str):
         """Create an instance of the Version class based on the tag string.
@@ -211,13 +779,919 @@ class Version:
         """
         Push existing Git tags to 'origin'.
         """
-        output = subprocess.run(['git', 'push', 'origin', '--tags'], capture_output=True)
+        output = Git.RunProcess(['push', 'origin', '--tags'])
         if (output.returncode):
             Logger.Error(LOG_TAG, output.stdout)
             Logger.Error(LOG_TAG, output.stderr)
             return (ErrorCode.COMMAND_FAILED)
         return ErrorCode.OK
 
+    @staticmethod
+    def GetLocalTagRefs() -> dict:
+        """
+        Get the local tag refs.
+
+        Returns:
+            A dict of tag ref names (e.g. 'refs/tags/1.2.1') to object hashes.
+        """
+        output = Git.Run(['for-each-ref', 'refs/tags', '--format=%(refname) %(objectname)'])
+        return dict(line.split(' ', 1) for line in output.splitlines() if line)
+    @staticmethod
+    def GetRemoteTagRefs(remote: str = 'origin', refresh: bool = False) -> dict:
+        """
+        Get the tag refs of a remote from the cached snapshot, or
+        from the remote itself when there is no snapshot or a refresh is requested.
+
+        Args:
+            remote (str): The name or URL of the remote.
+            refresh (bool): Whether to ignore the cached snapshot.
+
+        Returns:
+            A dict of tag ref names to object hashes.
+        """
+        cacheName = Version.REMOTE_TAGS_CACHE.format(remote=hashlib.sha1(remote.encode('utf-8')).hexdigest()[:12])
+        if not refresh:
+            remoteTagRefs = Cache.Load(cacheName)
+            if (remoteTagRefs != None):
+                return remoteTagRefs
+        output = Git.Run(['ls-remote', '--tags', remote])
+        remoteTagRefs = dict()
+        for line in output.splitlines():
+            objectName, refName = line.split('\t', 1)
+            # Skip the peeled commits of annotated tags
+            if not refName.endswith('^{}'):
+                remoteTagRefs[refName] = objectName
+        Cache.Save(cacheName, remoteTagRefs)
+        return remoteTagRefs
+    @staticmethod
+    def PushChangedTags(remote: str = 'origin', refresh: bool = False) -> tuple:
+        """
+        Push only the tags which are missing from the remote or point to
+        a different object there, compared to a cached snapshot of the
+        remote's tag refs. All the tags are pushed with one 'git push'.
+
+        Args:
+            remote (str): The name or URL of the remote.
+            refresh (bool): Whether to refresh the snapshot of the remote's tag refs first.
+
+        Returns:
+            A tuple of an ErrorCode and a dict of tag names to Version.TagPushStatus values.
+        """
+        outcomes = dict()
+        try:
+            localTagRefs = Version.GetLocalTagRefs()
+            remoteTagRefs = Version.GetRemoteTagRefs(remote, refresh)
+        except subprocess.CalledProcessError as err:
+            Logger.Error(LOG_TAG, err)
+            return (ErrorCode.COMMAND_FAILED, outcomes)
+
+        changedTagRefs = sorted(
+            refName for refName, objectName in localTagRefs.items()
+            if remoteTagRefs.get(refName) != objectName
+        )
+        if (len(changedTagRefs) == 0):
+            return (ErrorCode.OK, outcomes)
+
+        refSpecs = list(map(lambda refName: '{0}:{0}'.format(refName), changedTagRefs))
+        output = Git.RunProcess(['push', '--porcelain', remote] + refSpecs)
+        # Porcelain lines are '<flag>\t<from>:<to>\t<summary>'
+        for line in output.stdout.decode('utf-8').splitlines():
+            fields = line.split('\t')
+            if (len(fields) < 3 or ':' not in fields[1]):
+                continue
+            refName = fields[1].split(':', 1)[1]
+            status = Version.PushFlagsToTagPushStatuses.get(fields[0], Version.TagPushStatus.FAILED)
+            outcomes[refName[len('refs/tags/'):]] = status
+            if (status in (Version.TagPushStatus.PUSHED, Version.TagPushStatus.UP_TO_DATE)):
+                remoteTagRefs[refName] = localTagRefs[refName]
+        for refName in changedTagRefs:
+            outcomes.setdefault(refName[len('refs/tags/'):], Version.TagPushStatus.FAILED)
+        cacheName = Version.REMOTE_TAGS_CACHE.format(remote=hashlib.sha1(remote.encode('utf-8')).hexdigest()[:12])
+        Cache.Save(cacheName, remoteTagRefs)
+
+        if (output.returncode):
+            Logger.Error(LOG_TAG, output.stderr.decode('utf-8'))
+            return (ErrorCode.COMMAND_FAILED, outcomes)
+        return (ErrorCode.OK, outcomes)
+
+class VersionConstraint:
+    """
+    A parsed version constraint, e.g. '>=1.4.0-rc.1 <2.0.0 !alpha'.
+
+    A constraint is a list of alternatives separated by '||'. Every
+    alternative is the intersection of its terms, which reduces to one
+    range of sort keys plus a set of allowed stages. A version without
+    a stage stands for every stage of its version line, so '<2.0.0' also
+    excludes the pre-releases of 2.0.0.
+
+    Attributes:
+        alternatives (list):
+            A list of (lower key, lower inclusive, upper key, upper inclusive, allowed stages) tuples.
+    """
+    LOWEST_KEY = (-1, -1, -1, -1, -1)
+    HIGHEST_KEY = (float('inf'),) * 5
+    LOWEST_STAGE = (-1, -1)
+    HIGHEST_STAGE = (float('inf'), float('inf'))
+    def __init__(self):
+        self.alternatives = list()
+    @staticmethod
+    def ParseVersion(versionString: str) -> tuple:
+        """
+        Parse a version of a constraint term.
+
+        Args:
+            versionString (str): A full or partial version, e.g. '1.2.3-rc.1' or '1.2'.
+
+        Returns:
+            A tuple of the numbers (major, minor, bug), how many of them were given,
+            and the stage key (precedence, stage revision) or None if no stage was given.
+
+        Raises:
+            ValueError: If the version is malformed.
+        """
+        numbers, _, stageString = versionString.partition('-')
+        numbers = numbers.split('.')
+        if (len(numbers) > 3):
+            raise ValueError('Too many numbers in {0}'.format(versionString))
+        given = len(numbers)
+        numbers = tuple(map(int, numbers)) + (0,) * (3 - given)
+        if (len(stageString) < 1):
+            return (numbers, given, None)
+        stageName, _, stageRev = stageString.partition('.')
+        if (stageName not in Version.StageStringsToStages):
+            raise ValueError('Unknown stage {0}'.format(stageName))
+        stage = Version.StageStringsToStages[stageName]
+        return (numbers, given, (Version.StagesToPrecedences[stage], int(stageRev or 0)))
+    @staticmethod
+    def GetNextLine(numbers: tuple, position: int) -> tuple:
+        """
+        Get the first version of the next version line, e.g. the next
+        minor line (position 1) after 1.2.3 is 1.3.0.
+        """
+        numbers = list(numbers[:position + 1]) + [0] * (2 - position)
+        numbers[position] += 1
+        return tuple(numbers)
+    @staticmethod
+    def GetStages(stageName: str) -> set:
+        """
+        Get the stages a stage name of a stage filter stands for.
+        Versions without a stage count as releases.
+        """
+        stage = Version.StageStringsToStages[stageName]
+        if (stage == Version.Stage.RELEASE):
+            return {stage, Version.Stage.UNKNOWN}
+        return {stage}
+    @staticmethod
+    def ParseAlternative(alternativeString: str) -> tuple:
+        """
+        Parse the terms of one alternative of a constraint.
+
+        Returns:
+            A (lower key, lower inclusive, upper key, upper inclusive, allowed stages) tuple.
+
+        Raises:
+            ValueError: If a term is malformed, or there are no terms.
+        """
+        if (len(alternativeString.split()) == 0):
+            # An empty alternative would match every version
+            raise ValueError('Empty alternative')
+        lower, lowerInclusive = (VersionConstraint.LOWEST_KEY, True)
+        upper, upperInclusive = (VersionConstraint.HIGHEST_KEY, True)
+        stages = set(Version.Stage)
+        def Intersect(newLower, newLowerInclusive, newUpper, newUpperInclusive):
+            nonlocal lower, lowerInclusive, upper, upperInclusive
+            if (newLower > lower or (newLower == lower and not newLowerInclusive)):
+                lower, lowerInclusive = (newLower, newLowerInclusive)
+            if (newUpper < upper or (newUpper == upper and not newUpperInclusive)):
+                upper, upperInclusive = (newUpper, newUpperInclusive)
+        for term in alternativeString.split():
+            if term.startswith('!'):
+                stages -= VersionConstraint.GetStages(term[1:])
+                continue
+            if term.startswith('stage:'):
+                stages &= set().union(*map(VersionConstraint.GetStages, term[len('stage:'):].split(',')))
+                continue
+            operator = ''
+            for candidate in ('>=', '<=', '>', '<', '=', '^', '~'):
+                if term.startswith(candidate):
+                    operator = candidate
+                    break
+            numbers, given, stageKey = VersionConstraint.ParseVersion(term[len(operator):])
+            lineLowest = numbers + (stageKey or VersionConstraint.LOWEST_STAGE)
+            lineHighest = numbers + (stageKey or VersionConstraint.HIGHEST_STAGE)
+            if (operator == '>='):
+                Intersect(lineLowest, True, VersionConstraint.HIGHEST_KEY, True)
+            elif (operator == '>'):
+                Intersect(lineHighest, False, VersionConstraint.HIGHEST_KEY, True)
+            elif (operator == '<='):
+                Intersect(VersionConstraint.LOWEST_KEY, True, lineHighest, True)
+            elif (operator == '<'):
+                Intersect(VersionConstraint.LOWEST_KEY, True, lineLowest, False)
+            elif (operator == '^'):
+                # Up to the next line of the first non-zero number given
+                position = next((index for index in range(given) if numbers[index] != 0), given - 1)
+                upperNumbers = VersionConstraint.GetNextLine(numbers, position)
+                Intersect(lineLowest, True, upperNumbers + VersionConstraint.LOWEST_STAGE, False)
+            elif (operator == '~'):
+                upperNumbers = VersionConstraint.GetNextLine(numbers, min(given - 1, 1))
+                Intersect(lineLowest, True, upperNumbers + VersionConstraint.LOWEST_STAGE, False)
+            elif (stageKey == None and given < 3):
+                # A partial version stands for its whole version line
+                upperNumbers = VersionConstraint.GetNextLine(numbers, given - 1)
+                Intersect(lineLowest, True, upperNumbers + VersionConstraint.LOWEST_STAGE, False)
+            else:
+                Intersect(lineLowest, True, lineHighest, True)
+        return (lower, lowerInclusive, upper, upperInclusive, stages)
+    @staticmethod
+    def Parse(constraintString: str):
+        """
+        Parse a version constraint.
+
+        Args:
+            constraintString (str): The constraint, e.g. '>=1.4.0-rc.1 <2.0.0 !alpha'.
+
+        Returns:
+            The parsed VersionConstraint.
+
+        Raises:
+            ValueError: If the constraint is malformed.
+        """
+        constraint = VersionConstraint()
+        try:
+            for alternativeString in constraintString.split('||'):
+                constraint.alternatives.append(VersionConstraint.ParseAlternative(alternativeString))
+        except KeyError as err:
+            raise ValueError('Unknown stage {0}'.format(err))
+        return constraint
+
+class VersionResolver:
+    """
+    Find the tags which match version constraints. The tags are parsed
+    and sorted once, so every lookup bisects to the range of matching
+    versions instead of scanning all the tags.
+
+    Attributes:
+        keys (list): The sort keys of the tags, from the oldest to the newest.
+        tags (list): The tags, in the same order as the keys.
+        stages (list): The stages of the tags, in the same order as the keys.
+    """
+    def __init__(self, tags: list):
+        versions = list()
+        for tag in tags:
+            try:
+                version = Version.GenerateVersionFromString(tag)
+            except ValueError:
+                # Not a version tag
+                continue
+            versions.append((version.GetSortKey(), tag, version.stage))
+        versions.sort(key=lambda version: version[0])
+        self.keys = list(map(lambda version: version[0], versions))
+        self.tags = list(map(lambda version: version[1], versions))
+        self.stages = list(map(lambda version: version[2], versions))
+    def GetRange(self, alternative: tuple) -> range:
+        """
+        Get the indices of the tags within the key range of a constraint alternative.
+        """
+        lower, lowerInclusive, upper, upperInclusive, _ = alternative
+        start = bisect_left(self.keys, lower) if lowerInclusive else bisect_right(self.keys, lower)
+        stop = bisect_right(self.keys, upper) if upperInclusive else bisect_left(self.keys, upper)
+        return range(start, stop)
+    def Match(self, constraint: VersionConstraint) -> str:
+        """
+        Get the newest tag matching a constraint.
+
+        Args:
+            constraint (VersionConstraint): The constraint to match.
+
+        Returns:
+            The newest matching tag, or None if no tag matches.
+        """
+        bestIndex = -1
+        for alternative in constraint.alternatives:
+            stages = alternative[4]
+            for index in reversed(self.GetRange(alternative)):
+                if (index <= bestIndex):
+                    break
+                if (self.stages[index] in stages):
+                    bestIndex = index
+                    break
+        if (bestIndex < 0):
+            return None
+        return self.tags[bestIndex]
+    def MatchAll(self, constraint: VersionConstraint) -> list:
+        """
+        Get all the tags matching a constraint.
+
+        Args:
+            constraint (VersionConstraint): The constraint to match.
+
+        Returns:
+            The matching tags, from the oldest to the newest.
+        """
+        indices = set()
+        for alternative in constraint.alternatives:
+            stages = alternative[4]
+            indices.update(index for index in self.GetRange(alternative) if self.stages[index] in stages)
+        return list(map(lambda index: self.tags[index], sorted(indices)))
+
+class GitObjectReader:
+    """
+    Read Git objects through one long-lived 'git cat-file --batch'
+    process, instead of starting a new Git process per object.
+
+    Use as a context manager:
+        with GitObjectReader() as reader:
+            commits = reader.ReadCommits(hashes)
+    """
+    def __init__(self):
+        self.process = Git.StartProcess(
+            ['cat-file', '--batch'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE
+        )
+        self.lock = threading.Lock()
+    def __enter__(self):
+        return self
+    def __exit__(self, excType, excValue, traceback):
+        self.Close()
+    def Close(self):
+        """
+        Stop the 'git cat-file' process.
+        """
+        if (self.process == None):
+            return
+        self.process.stdin.close()
+        self.process.wait()
+        self.process.stdout.close()
+        self.process = None
+    def ReadResponse(self) -> tuple:
+        """
+        Read one framed response of 'git cat-file --batch'.
+        A response is '<hash> <type> <size>\\n<content>\\n',
+        or '<object id> missing\\n' for an unknown object.
+
+        Returns:
+            A tuple of the object hash, type and content, or None if the object is missing.
+        """
+        header = self.process.stdout.readline().decode('utf-8').rstrip('\n').split(' ')
+        if (len(header) != 3):
+            return None
+        size = int(header[2])
+        content = self.process.stdout.read(size)
+        # Skip the linefeed after the content
+        self.process.stdout.read(1)
+        return (header[0], header[1], content)
+    def ReadObjects(self, objectIds: list) -> list:
+        """
+        Read many objects over the one pipe. The requests are written
+        from a separate thread while the responses are read, so
+        neither side of the pipe can fill up and block the other.
+
+        Args:
+            objectIds (list): The ids (hashes or other revisions) of the objects.
+
+        Returns:
+            A list of (hash, type, content) tuples, or None for missing objects, in the order of the ids.
+        """
+        with self.lock:
+            def WriteRequests():
+                for objectId in objectIds:
+                    self.process.stdin.write('{0}\n'.format(objectId).encode('utf-8'))
+                self.process.stdin.flush()
+            writer = threading.Thread(target=WriteRequests)
+            writer.start()
+            responses = list(map(lambda _: self.ReadResponse(), objectIds))
+            writer.join()
+            return responses
+    @staticmethod
+    def ParseCommit(commitHash: str, content: bytes) -> Commit:
+        """
+        Parse the raw content of a commit object.
+
+        Args:
+            commitHash (str): The hash of the commit.
+            content (bytes): The raw content of the commit object.
+
+        Returns:
+            The parsed commit.
+        """
+        commit = Commit()
+        commit.hash = commitHash
+        headers, _, message = content.decode('utf-8', 'replace').partition('\n\n')
+        for header in headers.split('\n'):
+            if header.startswith('author '):
+                # 'author <name> <<email>> <unix time> <offset>'
+                nameAndEmail, timestamp, offset = header[len('author '):].rsplit(' ', 2)
+                user = User()
+                user.name = nameAndEmail.split('<', 1)[0].rstrip(' ')
+                user.email = nameAndEmail.split('<', 1)[1].rstrip('>')
+                commit.author = user
+                offsetMinutes = int(offset[1:3]) * 60 + int(offset[3:5])
+                if (offset[0] == '-'):
+                    offsetMinutes = -offsetMinutes
+                commit.date = datetime.fromtimestamp(int(timestamp), timezone(timedelta(minutes=offsetMinutes)))
+        title, _, body = message.partition('\n\n')
+        commit.title = ' '.join(title.split('\n')).strip()
+        commit.message = body.strip()
+        commit.trailers = Version.ParseTrailers(commit.message)
+        Metrics.Add('commits_parsed_total')
+        return commit
+    def ReadCommits(self, commitIds: list) -> list:
+        """
+        Read many commits over the one pipe.
+
+        Args:
+            commitIds (list): The ids (hashes or other revisions) of the commits.
+
+        Returns:
+            A list of commits, or None for ids which are not commits, in the order of the ids.
+        """
+        commits = list()
+        for response in self.ReadObjects(commitIds):
+            if (response == None or response[1] != 'commit'):
+                commits.append(None)
+                continue
+            commitHash, _, content = response
+            commits.append(GitObjectReader.ParseCommit(commitHash, content))
+        return commits
+    def ReadCommit(self, commitId: str) -> Commit:
+        """
+        Read one commit.
+
+        Args:
+            commitId (str): The id (hash or other revision) of the commit.
+
+        Returns:
+            The commit, or None if the id is not a commit.
+        """
+        return self.ReadCommits([commitId])[0]
+
+class GitQuery:
+    """
+    Resolve several facts about the Git repository at once.
+    The Git commands behind the facts are independent, so
+    they are run concurrently instead of one after another.
+    """
+    @unique
+    class Fact(IntEnum):
+        """The facts which can be resolved.
+        """
+        CURRENT_TAG = 0,
+        PREVIOUS_TAG = 1,
+        CURRENT_HASH = 2,
+        PREVIOUS_HASH = 3,
+        COMMITS = 4
+    @staticmethod
+    def Resolve(facts: list, newer: str = 'HEAD', older: str = 'HEAD~1', withPaths: bool = False, mode = Version.RangeMode.SYMMETRIC) -> dict:
+        """
+        Resolve the given facts concurrently.
+
+        Args:
+            facts (list): The GitQuery.Fact values to resolve.
+            newer (str): The newer Git commit id of the commit range, for GitQuery.Fact.COMMITS.
+            older (str): The older Git commit id of the commit range, for GitQuery.Fact.COMMITS.
+            withPaths (bool): Whether to read the changed paths of the commits, for GitQuery.Fact.COMMITS.
+            mode (Version.RangeMode): The commits the range selects, for GitQuery.Fact.COMMITS.
+
+        Returns:
+            A dict of the GitQuery.Fact values to their values.
+
+        Raises:
+            subprocess.CalledProcessError: If a Git command failed.
+        """
+        resolvers = {
+            GitQuery.Fact.CURRENT_TAG: Version.GetCurrentTag,
+            GitQuery.Fact.PREVIOUS_TAG: Version.GetPreviousTag,
+            GitQuery.Fact.CURRENT_HASH: Version.GetCurrentHash,
+            GitQuery.Fact.PREVIOUS_HASH: Version.GetPreviousHash,
+            GitQuery.Fact.COMMITS: lambda: Version.GetCommitsBetweenIds(newer, older, withPaths, mode)
+        }
+        facts = list(dict.fromkeys(facts))
+        if (len(facts) == 1):
+            return {facts[0]: resolvers[facts[0]]()}
+        with ThreadPoolExecutor(max_workers=len(facts)) as executor:
+            futures = dict((fact, executor.submit(resolvers[fact])) for fact in facts)
+            return dict((fact, future.result()) for fact, future in futures.items())
+
+class ShardedHistory:
+    """
+    Walk the whole history in shards, which are disjoint ranges of it split
+    at version tags, with one 'git log' reader and parser per shard in a
+    process pool. The partial results of the shards are reduced in the
+    order of the shards, so the result does not depend on which shard
+    finished first.
+
+    A partial result is a dict of:
+        'commits': The count of commits in the shard.
+        'authors': The author emails to dicts of their 'name', count of
+                   'commits', and the Unix times of their 'first' and 'last' commit.
+    """
+    # Shards per process, so that a slow shard does not leave the other processes idle
+    SHARDS_PER_WORKER = 4
+    @staticmethod
+    def GetShards(revision: str = 'HEAD', shardCount: int = None) -> list:
+        """
+        Split the history of a revision into disjoint ranges at version tags.
+        A shard has all the commits of its boundary tag which are not in the
+        boundary tags of the earlier shards, and the last shard the rest of
+        the commits of the revision.
+
+        Args:
+            revision (str): The revision whose history is split.
+            shardCount (int): The maximum count of shards.
+
+        Returns:
+            A list of the revision lists to pass to 'git log', one per shard.
+        """
+        if (shardCount == None):
+            shardCount = (os.cpu_count() or 1) * ShardedHistory.SHARDS_PER_WORKER
+        tags = VersionResolver(Git.Run(['tag', '--merged', revision]).split()).tags
+        # Evenly spaced tags, oldest first, as the boundaries
+        boundaries = list(map(
+            lambda index: tags[index],
+            sorted(set(len(tags) * (shard + 1) // shardCount - 1 for shard in range(shardCount - 1)) - {-1})
+        ))
+        shards = list()
+        for position, boundary in enumerate(boundaries + [revision]):
+            shards.append([boundary] + list(map(lambda excluded: '^' + excluded, boundaries[:position])))
+        return shards
+    @staticmethod
+    def WalkShard(revisions: list) -> dict:
+        """
+        Read and summarize the commits of one shard. Run in a worker process.
+
+        Args:
+            revisions (list): The revisions of the shard.
+
+        Returns:
+            The partial result of the shard.
+        """
+        authors = dict()
+        commits = Version.GetCommits(revisions)
+        for commit in commits:
+            timestamp = int(commit.date.timestamp())
+            author = authors.get(commit.author.email)
+            if (author == None):
+                # The log is newest first, so the first commit seen has the latest name
+                authors[commit.author.email] = {
+                    'name': commit.author.name, 'commits': 1, 'first': timestamp, 'last': timestamp
+                }
+                continue
+            author['commits'] += 1
+            author['first'] = min(author['first'], timestamp)
+            author['last'] = max(author['last'], timestamp)
+        return {'commits': len(commits), 'authors': authors}
+    @staticmethod
+    def Reduce(partials: list) -> dict:
+        """
+        Merge the partial results of the shards, in the order of the shards.
+
+        Args:
+            partials (list): The partial results, from the oldest to the newest shard.
+
+        Returns:
+            The merged result, in the same form as a partial result.
+        """
+        result = {'commits': 0, 'authors': dict()}
+        for partial in partials:
+            result['commits'] += partial['commits']
+            for email, partialAuthor in sorted(partial['authors'].items()):
+                author = result['authors'].get(email)
+                if (author == None):
+                    result['authors'][email] = dict(partialAuthor)
+                    continue
+                author['commits'] += partialAuthor['commits']
+                author['first'] = min(author['first'], partialAuthor['first'])
+                if (partialAuthor['last'] >= author['last']):
+                    author['name'] = partialAuthor['name']
+                author['last'] = max(author['last'], partialAuthor['last'])
+        return result
+    @staticmethod
+    def Walk(revision: str = 'HEAD', workers: int = None) -> dict:
+        """
+        Walk and summarize the whole history of a revision.
+
+        Args:
+            revision (str): The revision whose history is walked.
+            workers (int): The count of worker processes, by default one per CPU.
+
+        Returns:
+            The merged result.
+
+        Raises:
+            subprocess.CalledProcessError: If a Git command failed.
+        """
+        if (workers == None):
+            workers = os.cpu_count() or 1
+        shards = ShardedHistory.GetShards(revision, workers * ShardedHistory.SHARDS_PER_WORKER)
+        Logger.Debug(LOG_TAG, 'Walking the history of {0} in {1} shards'.format(revision, len(shards)))
+        if (workers == 1 or len(shards) == 1):
+            return ShardedHistory.Reduce(list(map(ShardedHistory.WalkShard, shards)))
+        with ProcessPoolExecutor(max_workers=min(workers, len(shards))) as executor:
+            # map() returns the partial results in the order of the shards
+            return ShardedHistory.Reduce(list(executor.map(ShardedHistory.WalkShard, shards)))
+
+class Reachability:
+    """
+    A cache of the ancestry of the commits, for answering whether a commit is
+    in a release or in a range without Git walking the history for every query.
+
+    The commits of the history of HEAD and the tags are indexed in an order
+    where the parents come before their children, and every commit has a
+    generation number, one more than the largest generation of its parents.
+    A commit can only be an ancestor of commits of a larger generation, which
+    bounds every walk. Every tagged commit has a bitmap of the indices of its
+    ancestors, so whether a commit is in a release is one bit test, and the
+    walks from other commits stop at the first tagged commits.
+
+    The cache is updated with only the new commits and the new or moved
+    tags, as the ancestry of the existing commits never changes. Only
+    deepening a shallow clone changes it, by adding the parents of the old
+    shallow boundary, so the cache is rebuilt when the boundary changes.
+    """
+    CACHE_NAME = 'reachability'
+    def __init__(self):
+        self.fingerprint = None
+        self.shallow = None
+        self.commits = list()
+        self.indices = dict()
+        self.parents = list()
+        self.generations = list()
+        # The indices of the commits whose first parent is not in a shallow clone
+        self.boundaries = set()
+        self.tips = set()
+        # The commit indices of the tagged commits to their compressed ancestry bitmaps
+        self.packedBitmaps = dict()
+        self.bitmaps = dict()
+    @staticmethod
+    def Load():
+        """
+        Load the cache of the repository.
+
+        Returns:
+            The Reachability, empty if there is no usable cache.
+        """
+        reachability = Reachability()
+        cached = Cache.Load(Reachability.CACHE_NAME)
+        if (cached == None):
+            return reachability
+        try:
+            reachability.fingerprint = cached['fingerprint']
+            reachability.shallow = cached['shallow']
+            reachability.commits = cached['commits']
+            reachability.parents = cached['parents']
+            reachability.generations = cached['generations']
+            reachability.boundaries = set(cached['boundaries'])
+            reachability.tips = set(cached['tips'])
+            reachability.packedBitmaps = dict((int(index), bitmap) for index, bitmap in cached['bitmaps'].items())
+        except (KeyError, TypeError, ValueError):
+            Logger.Warning(LOG_TAG, 'Rebuilding the unusable reachability cache')
+            return Reachability()
+        reachability.indices = dict((commit, index) for index, commit in enumerate(reachability.commits))
+        return reachability
+    def Save(self):
+        """
+        Save the cache of the repository.
+        """
+        Cache.Save(Reachability.CACHE_NAME, {
+            'fingerprint': self.fingerprint,
+            'shallow': self.shallow,
+            'commits': self.commits,
+            'parents': self.parents,
+            'generations': self.generations,
+            'boundaries': sorted(self.boundaries),
+            'tips': sorted(self.tips),
+            'bitmaps': dict((str(index), bitmap) for index, bitmap in self.packedBitmaps.items())
+        })
+    def GetBitmap(self, index: int) -> bytes:
+        """
+        Get the ancestry bitmap of a tagged commit, unpacking it on the first use.
+
+        Returns:
+            The bitmap, or None if the commit is not tagged.
+        """
+        bitmap = self.bitmaps.get(index)
+        if (bitmap == None and index in self.packedBitmaps):
+            bitmap = zlib.decompress(base64.b64decode(self.packedBitmaps[index]))
+            self.bitmaps[index] = bitmap
+        return bitmap
+    def AddCommits(self, tips: list):
+        """
+        Index the commits of the history of the tips which are not indexed yet.
+
+        Args:
+            tips (list): The commit hashes whose history to index.
+
+        Raises:
+            subprocess.CalledProcessError: If the Git walk failed.
+        """
+        newTips = list(filter(lambda tip: tip not in self.indices, tips))
+        if (len(newTips) == 0):
+            return
+        revisions = newTips + list(map(lambda tip: '^' + tip, sorted(self.tips)))
+        process = Git.StartProcess(
+            ['rev-list', '--topo-order', '--reverse', '--parents', '--stdin'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        output, errors = process.communicate('\n'.join(revisions).encode('utf-8'))
+        if (process.returncode):
+            if (len(self.tips) == 0):
+                raise subprocess.CalledProcessError(process.returncode, process.args, output, errors)
+            # A walked tip is gone, e.g. pruned after a rewrite, so index from scratch
+            Logger.Warning(LOG_TAG, 'Rebuilding the reachability cache: {0}'.format(errors.decode('utf-8').strip()))
+            self.__init__()
+            self.AddCommits(tips)
+            return
+        for line in output.decode('utf-8').splitlines():
+            hashes = line.split()
+            # The parents of a shallow clone's oldest commits are not in the repository
+            parents = list(map(self.indices.get, filter(lambda parent: parent in self.indices, hashes[1:])))
+            if (len(hashes) > 1 and hashes[1] not in self.indices):
+                # Without its first parent, the first parent chain of the commit ends
+                self.boundaries.add(len(self.commits))
+            self.indices[hashes[0]] = len(self.commits)
+            self.commits.append(hashes[0])
+            self.parents.append(parents)
+            self.generations.append(1 + max(map(self.generations.__getitem__, parents), default=0))
+        self.tips.update(newTips)
+    def BuildBitmap(self, index: int) -> bytes:
+        """
+        Build the ancestry bitmap of a commit. The walk stops at the tagged
+        commits whose bitmaps are built, and takes their bitmaps as they are.
+
+        Args:
+            index (int): The index of the commit.
+
+        Returns:
+            The bitmap, with the bit of every ancestor, and of the commit itself, set.
+        """
+        size = (len(self.commits) + 7) // 8
+        marks = bytearray(size)
+        stack = [index]
+        while len(stack):
+            current = stack.pop()
+            if ((marks[current >> 3] >> (current & 7)) & 1):
+                continue
+            known = self.GetBitmap(current) if current != index else None
+            if (known != None):
+                marks = bytearray((int.from_bytes(marks, 'little') | int.from_bytes(known, 'little')).to_bytes(size, 'little'))
+                continue
+            marks[current >> 3] |= 1 << (current & 7)
+            stack.extend(self.parents[current])
+        return bytes(marks)
+    def Update(self, extraTips: list = None) -> bool:
+        """
+        Bring the cache up to date with HEAD, the tags and the extra tips, and save it.
+
+        Args:
+            extraTips (list): Commit hashes outside the history of HEAD and the tags to index too.
+
+        Returns:
+            True if the cache changed.
+
+        Raises:
+            subprocess.CalledProcessError: If a Git command failed.
+        """
+        extraTips = list(extraTips or list())
+        gitDirectory, commonDirectory = Version.GetGitDirectories()
+        fingerprint = Version.GetRefsFingerprint(gitDirectory, commonDirectory)
+        # The commits of the shallow boundary, empty for a complete clone
+        try:
+            with open(os.path.join(commonDirectory, 'shallow'), 'rb') as shallowFile:
+                shallow = hashlib.sha1(shallowFile.read()).hexdigest()
+        except FileNotFoundError:
+            shallow = ''
+        if (fingerprint == self.fingerprint and shallow == self.shallow and all(map(lambda tip: tip in self.indices, extraTips))):
+            return False
+        if (shallow != self.shallow and self.shallow != None):
+            Logger.Info(LOG_TAG, 'The shallow boundary changed, rebuilding the reachability cache')
+            self.__init__()
+        tagCommits = Version.GetTagCommits()
+        head = Git.RunProcess(['rev-parse', '--verify', '--quiet', 'HEAD^{commit}'])
+        tips = list(tagCommits.values()) + extraTips
+        if (head.returncode == 0):
+            tips.append(head.stdout.decode('utf-8').strip())
+        # Tags of trees and blobs are left out by the walk, as they have no history
+        self.AddCommits(list(dict.fromkeys(tips)))
+        tagged = set(self.indices[commit] for commit in tagCommits.values() if commit in self.indices)
+        for index in list(self.packedBitmaps.keys()):
+            if index not in tagged:
+                del self.packedBitmaps[index]
+                self.bitmaps.pop(index, None)
+        # The oldest first, so that the bitmaps of the older tags are there for the newer ones
+        for index in sorted(tagged - set(self.packedBitmaps.keys()), key=self.generations.__getitem__):
+            bitmap = self.BuildBitmap(index)
+            self.bitmaps[index] = bitmap
+            self.packedBitmaps[index] = base64.b64encode(zlib.compress(bitmap)).decode('ascii')
+        Logger.Debug(LOG_TAG, 'Reachability of {0} commits and {1} tagged commits'.format(len(self.commits), len(tagged)))
+        self.fingerprint = fingerprint
+        self.shallow = shallow
+        self.Save()
+        return True
+    def IsAncestor(self, ancestor: int, descendant: int) -> bool:
+        """
+        Check whether a commit is an ancestor of another commit, or the commit itself.
+        The walk from the descendant skips the commits of a generation too small
+        to reach the ancestor, and stops at the tagged commits.
+
+        Args:
+            ancestor (int): The index of the possible ancestor.
+            descendant (int): The index of the descendant.
+
+        Returns:
+            True if the ancestor is in the history of the descendant.
+        """
+        if (ancestor == descendant):
+            return True
+        if (self.generations[ancestor] >= self.generations[descendant]):
+            return False
+        visited = set()
+        stack = [descendant]
+        while len(stack):
+            current = stack.pop()
+            bitmap = self.GetBitmap(current)
+            if (bitmap != None):
+                if ((ancestor >> 3) < len(bitmap) and (bitmap[ancestor >> 3] >> (ancestor & 7)) & 1):
+                    return True
+                continue
+            for parent in self.parents[current]:
+                if (parent == ancestor):
+                    return True
+                if (parent not in visited and self.generations[parent] > self.generations[ancestor]):
+                    visited.add(parent)
+                    stack.append(parent)
+        return False
+    def IsOnFirstParentChain(self, commit: int, tip: int) -> bool:
+        """
+        Check whether a commit is on the first parent chain of another commit.
+        The chain ends at a commit whose first parent is not in a shallow clone.
+        """
+        current = tip
+        while (self.generations[current] > self.generations[commit] and len(self.parents[current])
+               and current not in self.boundaries):
+            current = self.parents[current][0]
+        return (current == commit)
+    def IsInRange(self, commit: int, newer: int, older: int, mode = Version.RangeMode.SYMMETRIC) -> bool:
+        """
+        Check whether a commit is in a range, as Version.GetCommitsBetweenIds would select it.
+
+        Args:
+            commit (int): The index of the commit.
+            newer (int): The index of the newer commit of the range.
+            older (int): The index of the older commit of the range.
+            mode (Version.RangeMode): The commits the range selects.
+
+        Returns:
+            True if the commit is in the range.
+        """
+        inOlder = self.IsAncestor(commit, older)
+        if (mode == Version.RangeMode.FIRST_PARENT):
+            return (not inOlder and self.IsOnFirstParentChain(commit, newer))
+        inNewer = self.IsAncestor(commit, newer)
+        if (mode == Version.RangeMode.EXCLUSIVE):
+            return (inNewer and not inOlder)
+        return (inNewer != inOlder)
+    @staticmethod
+    def Resolve(revisions: list) -> tuple:
+        """
+        Load the cache, bring it up to date and find the commits of revisions in it.
+
+        Args:
+            revisions (list): The revisions, e.g. tags, branches or hashes.
+
+        Returns:
+            A tuple of the Reachability and a list of the indices of the revisions.
+
+        Raises:
+            subprocess.CalledProcessError: If a revision is not a commit, or a Git command failed.
+        """
+        hashes = Git.Run(['rev-parse'] + list(map(lambda revision: revision + '^{commit}', revisions))).split()
+        reachability = Reachability.Load()
+        reachability.Update(hashes)
+        return (reachability, list(map(reachability.indices.__getitem__, hashes)))
+
+def HandlePushChangedCommand(argv: list, argc: int) -> ErrorCode:
+    refresh = (argc > 1 and argv[1] == 'refresh')
+    result, outcomes = Version.PushChangedTags('origin', refresh)
+    if (len(outcomes) == 0 and result == ErrorCode.OK):
+        print('All tags up to date on origin')
+    for tag, status in sorted(outcomes.items()):
+        print('{0}: {1}'.format(tag, status.name))
+    return result
+
+def FormatCommits(commits) -> str:
+    return ''.join(list(map(
+        lambda commit:
+"""
+=========================================
+Author: {0}
+Date: {1}
+Title: {2}
+Message: {3}
+=========================================
+""".format(commit.author.name, Date.ConvertDateToString(commit.date), commit.title, commit.message),
+        commits
+    )))
+
 def HandleDiffCommand(argv: list, argc: int) -> ErrorCode:
     result = ErrorCode.OK
 
@@ -226,19 +1700,31 @@ def HandleDiffCommand(argv: list, argc: int) -> ErrorCode:
     Get difference between Git versions.
 
     Usage:
-    version_manager.py version get diff [optional] <from> <to>
+    version_manager.py version get diff [optional] <from> <to> [mode]
+    version_manager.py version get diff log <log file>
 
     Required:
     from    The Git version to compare from
     to      The Git versionn to compare to
 
     Optional:
+    mode    The commits to get, one of:
+                symmetric     The commits of either version but not
+                              of both (the default)
+                exclusive     The commits of <from> which are not in <to>
+                first-parent  The commits along the first parents of
+                              <from> which are not in <to>
     help    Print this message
+    log     Read the commits from a log file made with 'version get export'
+            instead of Git
     """
 
     argv = argv[1:]
     argc = len(argv)
 
+    if (argc < 1):
+        Logger.Error(LOG_TAG, 'Missing arguments')
+        return ErrorCode.TOO_FEW_ARGUMENTS
     fromArg = argv[0]
     if (fromArg == 'help'):
         print(HELP_MESSAGE)
@@ -248,6 +1734,16 @@ def HandleDiffCommand(argv: list, argc: int) -> ErrorCode:
         Logger.Error(LOG_TAG, 'Missing arguments')
         return ErrorCode.TOO_FEW_ARGUMENTS
     toArg = argv[1]
+
+    if (fromArg == 'log'):
+        try:
+            print('\n    Commits in {0}:'.format(toArg))
+            for commit in Version.ReadCommitLogFile(toArg):
+                print(FormatCommits([commit]), end='')
+        except (IOError, ValueError, IndexError) as err:
+            Logger.Error(LOG_TAG, 'Could not read log file: {0}'.format(err))
+            return ErrorCode.FILE_ERROR
+        return result
     
     responseTemplate = \
     """
@@ -255,22 +1751,46 @@ def HandleDiffCommand(argv: list, argc: int) -> ErrorCode:
     {2}
     """
     
-    difference = Version.GetCommitsBetweenIds(fromArg, toArg)
-    difference = ''.join(list(map(
-        lambda commit:
-"""
-=========================================
-Author: {0}
-Date: {1}
-Title: {2}
-Message: {3}
-=========================================
-""".format(commit.author.name, Date.ConvertDateToString(commit.date), commit.title, commit.message),
-        difference
-    )))
+    mode = Version.RangeMode.SYMMETRIC
+    if (argc > 2):
+        mode = Version.RangeModeStringsToRangeModes.get(argv[2], None)
+        if (mode == None):
+            Logger.Error(LOG_TAG, 'Unknown range mode: {0}'.format(argv[2]))
+            return ErrorCode.INVALID_ARGUMENT
+    difference = FormatCommits(Version.GetCommitsBetweenIds(fromArg, toArg, False, mode))
     print(responseTemplate.format(fromArg, toArg, difference))
 
     return result
+
+def HandleExportCommand(argv: list, argc: int) -> ErrorCode:
+    HELP_MESSAGE = \
+    """
+    Export the commits between Git versions to a log file, which
+    'version get diff log' and 'email send log' can read without Git.
+
+    Usage:
+    version_manager.py version get export [optional] <from> <to> <log file>
+
+    Optional:
+    help    Print this message
+    """
+    argv = argv[1:]
+    argc = len(argv)
+    if (argc > 0 and argv[0] == 'help'):
+        print(HELP_MESSAGE)
+        return ErrorCode.OK
+    if (argc < 3):
+        Logger.Error(LOG_TAG, 'Missing arguments')
+        return ErrorCode.TOO_FEW_ARGUMENTS
+    try:
+        Version.ExportCommitLog(argv[0], argv[1], argv[2])
+    except IOError as err:
+        Logger.Error(LOG_TAG, 'Could not write log file: {0}'.format(err))
+        return ErrorCode.FILE_ERROR
+    except subprocess.CalledProcessError as err:
+        Logger.Error(LOG_TAG, err)
+        return ErrorCode.COMMAND_FAILED
+    return ErrorCode.OK
     
 def HandleHashCommand(argv: list, argc: int) -> ErrorCode:
     result = ErrorCode.OK
@@ -284,6 +1804,174 @@ def HandleTagCommand(argv: list, argc: int) -> ErrorCode:
     print('Latest tag: {0}'.format(latestTag))
     return result
 
+def HandleMatchCommand(argv: list, argc: int) -> ErrorCode:
+    HELP_MESSAGE = \
+    """
+    Get the newest tag matching a version constraint.
+
+    Usage:
+    version_manager.py version get match [optional] <constraint>
+
+    Required:
+    constraint  Space separated terms which all have to match, with
+                alternatives separated by '||'. Available terms:
+                    1.2.3-rc.1   Exactly this version
+                    1.2.3, 1.2   Any stage of this version line
+                    >=, >, <=, < Compare to a version, e.g. '<2.0.0'
+                    ^1.2.3       Compatible with 1.2.3 (same major)
+                    ~1.2.3       Close to 1.2.3 (same major and minor)
+                    !alpha       Exclude a stage
+                    stage:rc,rel Only allow these stages
+
+    Optional:
+    help    Print this message
+    """
+    argv = argv[1:]
+    argc = len(argv)
+    if (argc < 1):
+        Logger.Error(LOG_TAG, 'Missing arguments')
+        return ErrorCode.TOO_FEW_ARGUMENTS
+    if (argv[0] == 'help'):
+        print(HELP_MESSAGE)
+        return ErrorCode.OK
+
+    try:
+        constraint = VersionConstraint.Parse(' '.join(argv))
+    except ValueError as err:
+        Logger.Error(LOG_TAG, 'Invalid constraint: {0}'.format(err))
+        return ErrorCode.INVALID_ARGUMENT
+    tag = VersionResolver(Version.GetTags()).Match(constraint)
+    if (tag == None):
+        Logger.Warning(LOG_TAG, 'No tag matches: {0}'.format(' '.join(argv)))
+        return ErrorCode.NOT_FOUND
+    print(tag)
+    return ErrorCode.OK
+
+def HandleReleasedInCommand(argv: list, argc: int) -> ErrorCode:
+    HELP_MESSAGE = \
+    """
+    Get the oldest version tag which contains each of the given commits.
+
+    Usage:
+    version_manager.py version get released-in [optional] <commit> [commit...]
+
+    Optional:
+    help    Print this message
+    """
+    argv = argv[1:]
+    argc = len(argv)
+    if (argc < 1):
+        Logger.Error(LOG_TAG, 'Missing arguments')
+        return ErrorCode.TOO_FEW_ARGUMENTS
+    if (argv[0] == 'help'):
+        print(HELP_MESSAGE)
+        return ErrorCode.OK
+    output = Git.RunProcess(['rev-parse'] + list(map(lambda commit: commit + '^{commit}', argv)))
+    if (output.returncode):
+        Logger.Error(LOG_TAG, 'Unknown commit: {0}'.format(output.stderr.decode('utf-8').strip()))
+        return ErrorCode.NOT_FOUND
+    releaseTags = Version.GetReleaseTags()
+    for commit, commitHash in zip(argv, output.stdout.decode('utf-8').split()):
+        print('{0}: {1}'.format(commit, releaseTags.get(commitHash, 'unreleased')))
+    return ErrorCode.OK
+
+def HandleStatsCommand(argv: list, argc: int) -> ErrorCode:
+    HELP_MESSAGE = \
+    """
+    Get the commit counts of the authors in the whole history,
+    walked in parallel over ranges between version tags.
+
+    Usage:
+    version_manager.py version get stats [optional] [revision]
+
+    Optional:
+    revision  The revision whose history to walk, HEAD by default.
+    help      Print this message
+    """
+    argv = argv[1:]
+    argc = len(argv)
+    if (argc > 0 and argv[0] == 'help'):
+        print(HELP_MESSAGE)
+        return ErrorCode.OK
+    try:
+        stats = ShardedHistory.Walk(argv[0] if argc > 0 else 'HEAD')
+    except subprocess.CalledProcessError as err:
+        Logger.Error(LOG_TAG, err)
+        return ErrorCode.COMMAND_FAILED
+    print('Commits: {0}'.format(stats['commits']))
+    print('Authors: {0}'.format(len(stats['authors'])))
+    for email, author in sorted(stats['authors'].items(), key=lambda author: (-author[1]['commits'], author[0])):
+        print('{0:>8} {1} <{2}> {3} - {4}'.format(
+            author['commits'], author['name'], email,
+            datetime.fromtimestamp(author['first'], timezone.utc).strftime('%Y-%m-%d'),
+            datetime.fromtimestamp(author['last'], timezone.utc).strftime('%Y-%m-%d')
+        ))
+    return ErrorCode.OK
+
+def HandleContainsCommand(argv: list, argc: int) -> ErrorCode:
+    HELP_MESSAGE = \
+    """
+    Check whether commits are in the history of a version, e.g. in a release.
+
+    Usage:
+    version_manager.py version get contains [optional] <version> <commit> [commit...]
+
+    Optional:
+    help    Print this message
+    """
+    argv = argv[1:]
+    argc = len(argv)
+    if (argc > 0 and argv[0] == 'help'):
+        print(HELP_MESSAGE)
+        return ErrorCode.OK
+    if (argc < 2):
+        Logger.Error(LOG_TAG, 'Missing arguments')
+        return ErrorCode.TOO_FEW_ARGUMENTS
+    try:
+        reachability, indices = Reachability.Resolve(argv)
+    except subprocess.CalledProcessError as err:
+        Logger.Error(LOG_TAG, err)
+        return ErrorCode.NOT_FOUND
+    for commit, index in zip(argv[1:], indices[1:]):
+        print('{0}: {1}'.format(commit, 'yes' if reachability.IsAncestor(index, indices[0]) else 'no'))
+    return ErrorCode.OK
+
+def HandleInRangeCommand(argv: list, argc: int) -> ErrorCode:
+    HELP_MESSAGE = \
+    """
+    Check whether commits are in the commits between two versions,
+    as 'version get diff' would list them.
+
+    Usage:
+    version_manager.py version get in-range [optional] <from> <to> <mode> <commit> [commit...]
+
+    Required:
+    mode    symmetric, exclusive or first-parent, see 'version get diff help'
+
+    Optional:
+    help    Print this message
+    """
+    argv = argv[1:]
+    argc = len(argv)
+    if (argc > 0 and argv[0] == 'help'):
+        print(HELP_MESSAGE)
+        return ErrorCode.OK
+    if (argc < 4):
+        Logger.Error(LOG_TAG, 'Missing arguments')
+        return ErrorCode.TOO_FEW_ARGUMENTS
+    mode = Version.RangeModeStringsToRangeModes.get(argv[2], None)
+    if (mode == None):
+        Logger.Error(LOG_TAG, 'Unknown range mode: {0}'.format(argv[2]))
+        return ErrorCode.INVALID_ARGUMENT
+    try:
+        reachability, indices = Reachability.Resolve(argv[:2] + argv[3:])
+    except subprocess.CalledProcessError as err:
+        Logger.Error(LOG_TAG, err)
+        return ErrorCode.NOT_FOUND
+    for commit, index in zip(argv[3:], indices[2:]):
+        print('{0}: {1}'.format(commit, 'yes' if reachability.IsInRange(index, indices[0], indices[1], mode) else 'no'))
+    return ErrorCode.OK
+
 def PrintHelpMessageGet(argv: list, argc: int) -> ErrorCode:
     result = ErrorCode.OK
     HELP_MESSAGE = \
@@ -296,8 +1984,14 @@ def PrintHelpMessageGet(argv: list, argc: int) -> ErrorCode:
     Required:
     info  What kind of information you wish to get. Available info:
             diff    Get commits between two versions
+            export  Export commits between two versions to a log file
             hash    Get current commit hash
             tag     Get latest tag
+            match   Get the newest tag matching a version constraint
+            released-in  Get the oldest version tag containing commits
+            stats   Get the commit counts of the authors in the whole history
+            contains  Check whether commits are in the history of a version
+            in-range  Check whether commits are between two versions
 
     Optional:
     help    Print this message. (Only available for diff)
@@ -320,8 +2014,14 @@ def HandleGetCommand(argv: list, argc: int) -> ErrorCode:
         commandSwitcher = {
             'help': PrintHelpMessageGet,
             'diff': HandleDiffCommand,
+            'export': HandleExportCommand,
             'hash': HandleHashCommand,
-            'tag': HandleTagCommand
+            'tag': HandleTagCommand,
+            'match': HandleMatchCommand,
+            'released-in': HandleReleasedInCommand,
+            'stats': HandleStatsCommand,
+            'contains': HandleContainsCommand,
+            'in-range': HandleInRangeCommand
         }
         chosenCommand = commandSwitcher.get(chosenInfo, None)
         if (chosenCommand == None):
@@ -346,6 +2046,7 @@ def PrintHelpMessage(argv: list, argc: int) -> ErrorCode:
     Required:
     command  What you want the Git version helper to do. Available commands:
                 push    Push existing tag to origin.
+                        'push changed' pushes only the missing or changed tags.
                 get     Get information regarding the Git repo.
 
     Optional:
@@ -389,6 +2090,9 @@ def HandleCommand(argv: list, argc: int) -> ErrorCode:
             if (argc > 1):
                 if (argv[1] == 'help'):
                     print('Pushes Git tags to origin.')
+                    print("Use 'push changed [refresh]' to push only the tags missing or changed on origin.")
+                elif (argv[1] == 'changed'):
+                    result = HandlePushChangedCommand(argv[1:], argc - 1)
                 else:
                     Logger.Warning(LOG_TAG, 'Unknown argument: {0}'.format(argv[1]))
                     result = ErrorCode.UNKNOWN_COMMAND
@@ -8,18 +8,146 @@ __date__ = "2020-02-02"
 __license__ = "MIT"
 __version__ = "1.0.0"
 
+import os
 import sys
+import time
 from datetime import datetime
 
 from error_code import ErrorCode
+from git import Git, GitUnavailableError
 from config import Config
+from date import Date
 from logger import Logger
+from metrics import Metrics
 LOG_TAG = "Manager"
+import changelog
+import commit_index
+import component
+import hooks
+import snapshot
 import version
 import VersionEmailer.version_emailer as emailer
 import VersionFileGenerator.version_file_generator as versionFileGenerator
+import ReleaseNotes.release_notes as releaseNotes
 
 
+class VersionManager:
+   """
+   An in-process session of the Version Manager, for build tools which
+   would otherwise run 'version_manager.py' for every query.
+
+   The session owns the config, the logger and caches of the Git state.
+   The caches are shared between the calls, and dropped whenever HEAD
+   or any ref changes, which is checked by reading the Git directory
+   instead of running Git.
+
+   Example:
+      session = VersionManager()
+      print(session.CurrentTag())
+      session.Render('version.template', 'build/version.h')
+   """
+   def __init__(self, config: dict = None):
+      """
+      Args:
+         config (dict): The config to use instead of the config.json.
+      """
+      if (config == None):
+         Config.InitConfig()
+      else:
+         Config.config = config
+      Logger.Init()
+      self.gitDirectory, self.commonDirectory = version.Version.GetGitDirectories()
+      self.fingerprint = None
+      self.cache = dict()
+      self.templates = dict()
+   def GetCached(self, key, resolver):
+      """
+      Get a cached value of the Git state, resolving it on a miss.
+
+      Args:
+         key: The cache key.
+         resolver: A function which resolves the value.
+
+      Returns:
+         The value.
+      """
+      fingerprint = version.Version.GetRefsFingerprint(self.gitDirectory, self.commonDirectory, True)
+      if (fingerprint != self.fingerprint):
+         self.cache.clear()
+         # The state prepared by the hooks is checked against the new refs on the next use
+         version.Version.preparedState = None
+         self.fingerprint = fingerprint
+      if key not in self.cache:
+         self.cache[key] = resolver()
+      return self.cache[key]
+   def CurrentTag(self) -> str:
+      """
+      Returns:
+         The current tag.
+      """
+      return self.GetCached('tag', version.Version.GetCurrentTag)
+   def CurrentHash(self) -> str:
+      """
+      Returns:
+         The hash of the current commit.
+      """
+      return self.GetCached('hash', version.Version.GetCurrentHash)
+   def CurrentVersion(self) -> version.Version:
+      """
+      Returns:
+         The current version, parsed from the current tag.
+      """
+      return self.GetCached('version', lambda: version.Version.GenerateVersionFromString(self.CurrentTag()))
+   def Commits(self, newer: str = 'HEAD', older: str = 'HEAD~1') -> list:
+      """
+      Get the commits between two Git commits. The ids are resolved to hashes
+      once until a ref changes, and the commits are cached by the hashes.
+
+      Args:
+         newer (str): The newer Git commit id for the comparison.
+         older (str): The older Git commit id for the comparison.
+
+      Returns:
+         A list of commits.
+      """
+      newerHash, olderHash = self.GetCached(
+         ('hashes', newer, older), lambda: Git.Run(['rev-parse', newer + '^{commit}', older + '^{commit}']).split())
+      return self.GetCached(('commits', newerHash, olderHash), lambda: version.Version.GetCommitsBetweenIds(newerHash, olderHash))
+   def Render(self, templateFilePath: str, outputFilePath: str) -> ErrorCode:
+      """
+      Generate a version file from a template. Parsed templates
+      are kept until their file changes.
+
+      Args:
+         templateFilePath (str): Path to the template file.
+         outputFilePath (str): Path to the file to generate.
+
+      Returns:
+         An ErrorCode object telling what the outcome of calling the function was.
+      """
+      try:
+         templateKey = (os.path.abspath(templateFilePath), os.stat(templateFilePath).st_mtime_ns)
+      except OSError as err:
+         Logger.Error(LOG_TAG, 'Could not read template file: {0}'.format(err))
+         return ErrorCode.FILE_ERROR
+      if templateKey not in self.templates:
+         template = versionFileGenerator.ReadVersionFileTemplate(templateFilePath)
+         if (template == None):
+            return ErrorCode.FILE_ERROR
+         self.templates[templateKey] = template
+      extraFields = dict(hash=self.CurrentHash(), buildDate=Date.NowAsString())
+      versionFileString = versionFileGenerator.RenderVersionFile(
+         self.CurrentVersion(), self.templates[templateKey], extraFields)
+      return versionFileGenerator.WriteVersionFile(outputFilePath, versionFileString)
+   def SendReleaseEmail(self) -> ErrorCode:
+      """
+      Queue the release email of the current commit to the outbox.
+
+      Returns:
+         An ErrorCode object telling what the outcome of calling the function was.
+      """
+      return emailer.QueueReleaseEmail(self.Commits('HEAD', 'HEAD~1'), self.CurrentTag())
+
 def PrintHelp(argv: list, argc: int) -> ErrorCode:
    """
    Print a help message on how to use the Version Manager.
@@ -43,9 +171,17 @@ Required:
             generate    Generate files using Git versioning.
             version     Use the Git versioning.
             email       Send emails using Git versioning.
+            notes       Build release notes pages using Git versioning.
+            components  Get the versions of the components of a monorepo.
+            changelog   Update a CHANGELOG.md using Git versioning.
+            index       Look up the commits by issue keys and trailers.
+            hooks       Install Git hooks which prepare the version state.
+            snapshot    Export the version state for the later stages of a pipeline.
 
 Optional:
    help   Print this message.
+   --snapshot <file>  Given with any command, answer the version state
+                      from a snapshot file made with 'snapshot export'.
    Use '<command> help' to get information about that particular command.
 """
    print(HELP_MESSAGE)
@@ -53,29 +189,52 @@ Optional:
 
 if __name__ == '__main__':
    result = ErrorCode.OK
+   startTime = time.perf_counter()
 
    # Init
    Config.InitConfig()
    Logger.Init()
 
    argv = sys.argv[1:]
-   argc = len(sys.argv)
+   if ('--snapshot' in argv):
+      position = argv.index('--snapshot')
+      if (position + 1 < len(argv)):
+         result = snapshot.Snapshot.Load(argv[position + 1])
+      else:
+         Logger.Error(LOG_TAG, 'No snapshot file given')
+         result = ErrorCode.MISSING_ARGUMENT
+      del argv[position:position + 2]
+   argc = len(argv) + 1
+   commandSwitcher = {
+      'generate': versionFileGenerator.HandleCommand,
+      'version': version.HandleCommand,
+      'email': emailer.HandleCommand,
+      'notes': releaseNotes.HandleCommand,
+      'components': component.HandleCommand,
+      'changelog': changelog.HandleCommand,
+      'index': commit_index.HandleCommand,
+      'hooks': hooks.HandleCommand,
+      'snapshot': snapshot.HandleCommand,
+      'help': PrintHelp
+   }
    
-   if (argc < 1):
+   if (len(argv) == 0):
       Logger.Error(LOG_TAG, "No command given")
       result = ErrorCode.UNKNOWN_COMMAND
-   else:
-      commandSwitcher = {
-         'generate': versionFileGenerator.HandleCommand,
-         'version': version.HandleCommand,
-         'email': emailer.HandleCommand,
-         'help': PrintHelp
-      }
+   elif (result == ErrorCode.OK):
       chosenCommand = commandSwitcher.get(argv[0], None)
       if (chosenCommand == None):
          Logger.Warning(LOG_TAG, 'Unknown command: {0}'.format(argv[0]))
          result = ErrorCode.UNKNOWN_COMMAND
       else:
-         result = chosenCommand(argv, argc)
+         try:
+            result = chosenCommand(argv, argc)
+         except GitUnavailableError as err:
+            Logger.Error(LOG_TAG, err)
+            result = ErrorCode.COMMAND_FAILED
+
+   if (len(argv) > 0):
+      # Only the known commands are labels, so that typos cannot add label values
+      Metrics.Write(argv[0] if argv[0] in commandSwitcher else 'unknown', ErrorCode(result), time.perf_counter() - startTime)
    
    sys.exit(result)